@@ -1,5 +1,10 @@
 from src.helpers import initializeParser
 from src.optimizer import optimizeAllocations
+from src.sweep import sweepParameters, loadParameterGrid
+from src.snapshot import createSnapshot, saveSnapshot, loadSnapshot
+from src.benchmark import runBenchmark
+from src.batch import batchOptimizeAllocations
+import json
 from streamlit import bootstrap
 if __name__ == '__main__':
     """
@@ -7,6 +12,9 @@ if __name__ == '__main__':
     """
     my_parser = initializeParser()
     args = my_parser.parse_args()
+    snapshot = None
+    if args.snapshot and args.app != "snapshot":
+        snapshot = loadSnapshot(args.snapshot)
     if args.app == "script":
         optimizeAllocations(indexer_id=args.indexer_id, blacklist_parameter=args.blacklist,
                         parallel_allocations=args.parallel_allocations, max_percentage=args.max_percentage,
@@ -15,7 +23,49 @@ if __name__ == '__main__':
                         min_allocation=args.min_allocation, min_allocated_grt_subgraph=args.min_allocated_grt_subgraph,
                         min_signalled_grt_subgraph=args.min_signalled_grt_subgraph, app=args.app,
                         slack_alerting=args.slack_alerting, network=args.network, automation=args.automation,
-                        ignore_tx_costs=args.ignore_tx_costs)
+                        ignore_tx_costs=args.ignore_tx_costs, solver=args.solver,
+                        solver_time_limit=args.solver_time_limit, solver_mip_gap=args.solver_mip_gap,
+                        snapshot=snapshot, memoization=args.memoization,
+                        memoization_epsilon=args.memoization_epsilon,
+                        upper_bound_check=args.upper_bound_check, pin_block=args.pin_block)
+    if args.app == "sweep":
+        df_sweep = sweepParameters(indexer_id=args.indexer_id, parameter_grid=loadParameterGrid(args.sweep_grid),
+                                   blacklist_parameter=args.blacklist, parallel_allocations=args.parallel_allocations,
+                                   max_percentage=args.max_percentage, threshold=args.threshold,
+                                   subgraph_list_parameter=args.subgraph_list,
+                                   threshold_interval=args.threshold_interval, reserve_stake=args.reserve_stake,
+                                   min_allocation=args.min_allocation,
+                                   min_allocated_grt_subgraph=args.min_allocated_grt_subgraph,
+                                   min_signalled_grt_subgraph=args.min_signalled_grt_subgraph, network=args.network,
+                                   ignore_tx_costs=args.ignore_tx_costs, solver=args.solver,
+                                   solver_time_limit=args.solver_time_limit, solver_mip_gap=args.solver_mip_gap,
+                                   processes=args.sweep_processes, snapshot=snapshot)
+        df_sweep.to_csv("./data/sweep_results.csv", index=False)
+    if args.app == "snapshot":
+        snapshot_path = args.snapshot or "./data/snapshot.parquet"
+        saveSnapshot(createSnapshot(indexer_id=args.indexer_id, network=args.network, pin_block=args.pin_block),
+                     snapshot_path)
+        print("Snapshot saved to", snapshot_path)
+    if args.app == "benchmark":
+        report = runBenchmark(sizes=args.benchmark_sizes, solvers=args.benchmark_solvers,
+                              baseline_path=args.benchmark_baseline)
+        if args.benchmark_save_baseline:
+            with open(args.benchmark_baseline, mode='w') as f:
+                f.write(json.dumps(report, indent=2))
+    if args.app == "batch":
+        batchOptimizeAllocations(indexer_ids=args.indexer_ids or [args.indexer_id], blacklist_parameter=args.blacklist,
+                                 network=args.network, processes=args.batch_processes,
+                                 parallel_allocations=args.parallel_allocations, max_percentage=args.max_percentage,
+                                 threshold=args.threshold, subgraph_list_parameter=args.subgraph_list,
+                                 threshold_interval=args.threshold_interval, reserve_stake=args.reserve_stake,
+                                 min_allocation=args.min_allocation,
+                                 min_allocated_grt_subgraph=args.min_allocated_grt_subgraph,
+                                 min_signalled_grt_subgraph=args.min_signalled_grt_subgraph, app=args.app,
+                                 slack_alerting=args.slack_alerting, ignore_tx_costs=args.ignore_tx_costs,
+                                 solver=args.solver, solver_time_limit=args.solver_time_limit,
+                                 solver_mip_gap=args.solver_mip_gap, memoization=args.memoization,
+                                 memoization_epsilon=args.memoization_epsilon,
+                                 upper_bound_check=args.upper_bound_check, pin_block=args.pin_block)
     if args.app == "app":
         real_script = 'app.py'
         bootstrap.run(real_script, f'streamlit run {real_script}', [], {})
\ No newline at end of file
@@ -0,0 +1,373 @@
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import aiohttp
+from dotenv import load_dotenv
+from eth_utils import function_signature_to_4byte_selector
+from src.graphql_client import getEndpointConfig, pinGraphqlQuery, splitIdRange, pageRequestJson, nextPageCursor, \
+    RETRY_STATUS_CODES, PAGE_SIZE, PAGE_STREAMS
+from src.timings import countHttpCall
+from src.query_cache import getCachedQuery, setCachedQuery
+from src.rpc_pool import getRpcUrls, markRpcUnhealthy, RPC_ENDPOINTS
+
+# max amount of requests in flight per event loop, shared by all GraphQL and JSON-RPC requests
+ASYNC_CONCURRENCY = 32
+
+# requests per JSON-RPC batch, many providers reject larger batches
+RPC_BATCH_SIZE = 100
+
+# 4 byte selector of RewardsManager.getRewards(address)
+GET_REWARDS_SELECTOR = '0x' + function_signature_to_4byte_selector('getRewards(address)').hex()
+
+# background event loop of the sync wrappers and the shared session (+ semaphore) per event loop.
+# The loop thread is not inherited by forked worker processes, the pid detects a fork
+_async_client = {'pid': None, 'loop': None, 'sessions': {}}
+
+
+def getAsyncLoop():
+    """Get's the event loop of the sync wrappers. The loop runs forever in a daemon thread, so the shared session
+    and its keep-alive connections are reused across the calls of the sync wrappers."""
+    if _async_client['pid'] != os.getpid():
+        _async_client.update(pid=os.getpid(), loop=None, sessions={})
+    if _async_client['loop'] is None:
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name='async_client', daemon=True).start()
+        _async_client['loop'] = loop
+    return _async_client['loop']
+
+
+def runAsync(coroutine):
+    """Runs a coroutine on the event loop of the sync wrappers and waits for the result. Can be called from sync
+    code and from code that runs in another event loop.
+
+    Returns
+    -------
+        result of the coroutine
+    """
+    context = contextvars.copy_context()
+    return asyncio.run_coroutine_threadsafe(_runInContext(coroutine, context), getAsyncLoop()).result()
+
+
+async def _runInContext(coroutine, context):
+    # the loop runs in its own thread, the task gets the context variables of the caller (e.g. the running timing
+    # span that counts the requests)
+    for variable, value in context.items():
+        variable.set(value)
+    return await coroutine
+
+
+def getAsyncSession():
+    """Get's the shared aiohttp session and the semaphore that bounds the concurrent requests of the running
+    event loop. Responses are requested gzip compressed.
+
+    Returns
+    -------
+    aiohttp.ClientSession, asyncio.Semaphore
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _async_client['sessions'] or _async_client['sessions'][loop][0].closed:
+        connector = aiohttp.TCPConnector(limit=ASYNC_CONCURRENCY)
+        session = aiohttp.ClientSession(connector=connector,
+                                        headers={'Content-Type': 'application/json', 'Accept': 'application/json',
+                                                 'Accept-Encoding': 'gzip, deflate', 'Accept-Charset': 'UTF-8'})
+        _async_client['sessions'][loop] = (session, asyncio.Semaphore(ASYNC_CONCURRENCY))
+    return _async_client['sessions'][loop]
+
+
+async def closeAsyncSession():
+    """Closes the shared session of the running event loop. Call before closing an own event loop."""
+    session, _ = _async_client['sessions'].pop(asyncio.get_running_loop(), (None, None))
+    if session is not None:
+        await session.close()
+
+
+async def asyncPostJson(url, request_json, timeout, retries, backoff):
+    """Posts a json request over the shared session. Timeouts, connection errors and the status codes in
+    RETRY_STATUS_CODES are retried with exponential backoff.
+
+    Returns
+    -------
+    dict
+        json response
+    """
+    session, semaphore = getAsyncSession()
+    if isinstance(timeout, tuple):
+        timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+    else:
+        timeout = aiohttp.ClientTimeout(total=timeout)
+    data = json.dumps(request_json).encode()
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                async with session.post(url, data=data, timeout=timeout) as resp:
+                    if resp.status not in RETRY_STATUS_CODES or attempt == retries:
+                        resp.raise_for_status()
+                        content = await resp.read()
+                        countHttpCall(len(data), len(content))
+                        return json.loads(content)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt == retries:
+                raise
+        await asyncio.sleep(backoff * 2 ** attempt)
+
+
+async def asyncPostGraphqlQuery(request_json, endpoint='mainnet', retry=True, cache=True, pin=True):
+    """Async version of postGraphqlQuery.
+
+    Parameters
+    -------
+        request_json (dict): {'query': ..., 'variables': ...}
+        endpoint (str): name of the endpoint in GRAPHQL_ENDPOINTS (e.g. 'mainnet', 'testnet') or url
+        retry (bool): retry failed requests, disable for requests that must not be sent twice
+        cache (bool): look the response up in the query cache and cache it
+        pin (bool): pin the query to the block of the endpoint's block pin
+
+    Returns
+    -------
+    dict
+        json response of the endpoint
+    """
+    request_json, pinned = pinGraphqlQuery(request_json, endpoint) if pin else (request_json, False)
+    if cache:
+        response = getCachedQuery(request_json, endpoint, pinned=pinned)
+        if response is not None:
+            return response
+    config = getEndpointConfig(endpoint)
+    response = await asyncPostJson(config['url'], request_json, timeout=config['timeout'],
+                                   retries=config['retries'] if retry else 0, backoff=config['backoff'])
+    if cache:
+        setCachedQuery(request_json, endpoint, response, pinned=pinned)
+    return response
+
+
+async def asyncPaginateGraphqlQuery(query, field, variables=None, endpoint='mainnet', page_size=PAGE_SIZE,
+                                    streams=PAGE_STREAMS):
+    """Fetches all rows of a list field with id_gt cursor pagination. The id space is split into ranges that
+    are paged concurrently, the rows are yielded as the pages arrive (not in id order).
+
+    The query has to order the field by id and declare the variables $first, $id_gt and $id_lt, e.g.
+        query subgraphs($first: Int, $id_gt: String, $id_lt: String) {
+          subgraphDeployments(first: $first, orderBy: id, orderDirection: asc,
+                              where: {id_gt: $id_gt, id_lt: $id_lt}) { id ... }
+        }
+
+    Parameters
+    -------
+        query (str): GraphQL query of the field
+        field (str): name of the paginated field in the response data
+        variables (dict): additional variables of the query
+        endpoint (str): name of the endpoint in GRAPHQL_ENDPOINTS or url
+        page_size (int): rows per page
+        streams (int): amount of concurrent page streams
+
+    Returns
+    -------
+    async generator
+        rows of the field
+    """
+    # pages of the streams, an exception if a stream failed and None if a stream is done
+    pages = asyncio.Queue()
+
+    async def fetchRange(id_gt, id_lt):
+        try:
+            while id_gt is not None:
+                request_json = pageRequestJson(query, variables, page_size, id_gt, id_lt)
+                rows = (await asyncPostGraphqlQuery(request_json, endpoint=endpoint))['data'][field]
+                await pages.put(rows)
+                id_gt = nextPageCursor(rows, page_size)
+        except Exception as error:
+            await pages.put(error)
+        else:
+            await pages.put(None)
+
+    tasks = [asyncio.ensure_future(fetchRange(id_gt, id_lt)) for id_gt, id_lt in splitIdRange(streams)]
+    try:
+        running = len(tasks)
+        while running:
+            page = await pages.get()
+            if page is None:
+                running -= 1
+            elif isinstance(page, Exception):
+                # raise the error of a failed page stream right away
+                raise page
+            else:
+                for row in page:
+                    yield row
+    finally:
+        # also runs if the consumer stops iterating early, the other streams stop without paging to the end
+        for task in tasks:
+            task.cancel()
+
+
+async def asyncPostRpc(request_json, network='mainnet'):
+    """Posts a JSON-RPC request (or batch) to the first healthy endpoint of the network (see rpc_pool.getRpcUrls)
+    and fails over to the next endpoint if the retries of an endpoint are exhausted.
+
+    Returns
+    -------
+    dict, list
+        json response
+    """
+    urls = getRpcUrls(network)
+    if not urls:
+        raise ValueError(f"{RPC_ENDPOINTS[network]} is not set")
+    for url in urls:
+        try:
+            return await asyncPostJson(url, request_json, timeout=(5, 60), retries=3, backoff=0.5)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            markRpcUnhealthy(network, url)
+            if url == urls[-1]:
+                raise
+
+
+async def asyncPostJsonRpc(method, params, network='mainnet'):
+    """Sends a JSON-RPC request to the rpc of the network (RPC_URL, RPC_URL_TESTNET of the .env).
+
+    Returns
+    -------
+        result of the request
+    """
+    request_json = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params}
+    response = await asyncPostRpc(request_json, network=network)
+    if 'error' in response:
+        raise ValueError(f"{method} failed: {response['error']}")
+    return response['result']
+
+
+async def asyncPostJsonRpcBatch(calls, network='mainnet', batch_size=RPC_BATCH_SIZE):
+    """Sends JSON-RPC requests as batches of batch_size requests. The batches are sent concurrently, bounded by
+    the requests in flight of the shared session.
+
+    Parameters
+    -------
+        calls (list): (method, params) per request
+        network (str): "mainnet" or "testnet"
+        batch_size (int): requests per batch
+
+    Returns
+    -------
+    list
+        result per request in the order of calls, None for requests that returned an error
+    """
+    async def postBatch(start):
+        request_json = [{'jsonrpc': '2.0', 'id': start + index, 'method': method, 'params': params}
+                        for index, (method, params) in enumerate(calls[start:start + batch_size])]
+        response = await asyncPostRpc(request_json, network=network)
+        if not isinstance(response, list):
+            raise ValueError(f"JSON-RPC batch failed: {response.get('error', response)}")
+        return response
+
+    batches = await asyncio.gather(*[postBatch(start) for start in range(0, len(calls), batch_size)])
+    # the responses of a batch can be in any order
+    results = [None] * len(calls)
+    for response in (response for batch in batches for response in batch):
+        if 'error' not in response:
+            results[response['id']] = response['result']
+    return results
+
+
+def toBlockParameter(block_identifier):
+    """Converts a block number to the hex block parameter of JSON-RPC, tags ('latest', ...) are kept."""
+    return block_identifier if isinstance(block_identifier, str) else hex(int(block_identifier))
+
+
+async def asyncGetCurrentBlock(network='mainnet'):
+    """Async version of getCurrentBlock.
+
+    Returns
+    -------
+    int
+        Current Active block
+    """
+    return int(await asyncPostJsonRpc('eth_blockNumber', [], network=network), 16)
+
+
+def getRewardsCallData(allocation_id):
+    """Encodes the call data of RewardsManager.getRewards of an allocation.
+
+    Returns
+    -------
+    str
+        hex call data (0x...)
+    """
+    return GET_REWARDS_SELECTOR + str(allocation_id).lower()[2:].zfill(64)
+
+
+async def asyncGetRewards(allocation_id, block_identifier='latest', reward_manager=None):
+    """Calls RewardsManager.getRewards of an allocation with eth_call.
+
+    Parameters
+    -------
+        allocation_id (str): allocation id
+        block_identifier (int, str): block number or tag
+        reward_manager (str): address of the RewardsManager, defaults to REWARD_MANAGER of the .env
+
+    Returns
+    -------
+    int
+        pending rewards of the allocation in wei
+    """
+    load_dotenv()
+    call = {'to': reward_manager or os.getenv('REWARD_MANAGER'), 'data': getRewardsCallData(allocation_id)}
+    return int(await asyncPostJsonRpc('eth_call', [call, toBlockParameter(block_identifier)]), 16)
+
+
+async def asyncGetPendingRewards(allocation_ids, block_identifier='latest', reward_manager=None):
+    """Get's the pending rewards of the allocations concurrently.
+
+    Returns
+    -------
+    list
+        pending rewards in GRT, in the order of allocation_ids
+    """
+    rewards = await asyncio.gather(*[asyncGetRewards(allocation_id, block_identifier, reward_manager)
+                                     for allocation_id in allocation_ids])
+    return [reward / 10 ** 18 for reward in rewards]
+
+
+async def asyncGetPendingRewardsAtBlocks(allocation_ids, block_identifiers, reward_manager=None):
+    """Get's the pending rewards of the allocations at several blocks, all calls are sent concurrently.
+
+    Returns
+    -------
+    list
+        per block the pending rewards in GRT, in the order of allocation_ids
+    """
+    return list(await asyncio.gather(*[asyncGetPendingRewards(allocation_ids, block_identifier, reward_manager)
+                                       for block_identifier in block_identifiers]))
+
+
+async def asyncGetRewardsAtBlocks(allocation_id, blocks, reward_manager=None, network='mainnet'):
+    """Get's the pending rewards of one allocation at many blocks with JSON-RPC batches.
+
+    Returns
+    -------
+    list
+        pending rewards in GRT per block, 0 for calls that reverted (e.g. before the allocation was created)
+    """
+    load_dotenv()
+    call = {'to': reward_manager or os.getenv('REWARD_MANAGER'), 'data': getRewardsCallData(allocation_id)}
+    results = await asyncPostJsonRpcBatch([('eth_call', [call, toBlockParameter(block)]) for block in blocks],
+                                          network=network)
+    return [int(result, 16) / 10 ** 18 if result not in (None, '0x') else 0 for result in results]
+
+
+async def asyncGetBlockHeaders(blocks, network='mainnet'):
+    """Get's the headers of the blocks with JSON-RPC batches.
+
+    Returns
+    -------
+    list
+        {'number': int, 'timestamp': int, 'hash': str} per block
+    """
+    results = await asyncPostJsonRpcBatch([('eth_getBlockByNumber', [toBlockParameter(block), False])
+                                           for block in blocks], network=network)
+    headers = []
+    for block, result in zip(blocks, results):
+        if result is None:
+            raise ValueError(f"Block {block} not found")
+        headers.append({'number': int(result['number'], 16), 'timestamp': int(result['timestamp'], 16),
+                        'hash': result['hash']})
+    return headers
@@ -1,10 +1,9 @@
-import requests
-import base58
+from src.deployment_registry import getIpfsHash, getHexId
+from src.graphql_client import postGraphqlQuery
 import json
-import os
-from dotenv import load_dotenv
-from src.queries import getActiveAllocations
+from src.queries import getActiveAllocations, getSubgraphDeploymentsData
 from src.filter_events import asyncFilterAllocationEvents
+from src.config import CONFIG_PATH
 
 def setIndexingRuleQuery(deployment, decision_basis = "never",
                          allocation_amount = 0, parallel_allocations = 0):
@@ -12,10 +11,6 @@ def setIndexingRuleQuery(deployment, decision_basis = "never",
     Make Query against Indexer Management Endpoint to set Indexingrules
     """
 
-    # Get Indexer Management Endpoint from .env file
-    load_dotenv()
-    url = os.getenv('INDEXER_MANAGEMENT_ENDPOINT')
-
     query = """
         mutation setIndexingRule($rule: IndexingRuleInput!){
             setIndexingRule(rule: $rule){
@@ -49,11 +44,10 @@ def setIndexingRuleQuery(deployment, decision_basis = "never",
 
     variables = {'rule' : allocation_input}
 
-    request = requests.post(url, json = {'query': query, 'variables': variables})
-    if request.status_code == 200:
-        return request.json()
-    else:
-        raise Exception("Query failed to run by returning code of {}. {}".format(request.status_code,query))
+    # Indexer Management Endpoint from the .env file. A mutation is sent once, its response is not cached and it
+    # is not pinned to a block
+    return postGraphqlQuery({'query': query, 'variables': variables}, endpoint='indexer_management', retry=False,
+                            cache=False, pin=False)
 
 def setIndexingRules(fixed_allocations, indexer_id,blacklist_parameter = True, parallel_allocations = 0 , network = "mainnet"):
     """
@@ -70,14 +64,11 @@ def setIndexingRules(fixed_allocations, indexer_id,blacklist_parameter = True, p
     indexer_id = indexer_id.lower()
 
     # get relevant gateway for mainnet or testnet
-    if network == 'mainnet':
-        API_GATEWAY = os.getenv('API_GATEWAY')
-    else:
-        API_GATEWAY = os.getenv('TESTNET_GATEWAY')
+    endpoint = 'mainnet' if network == 'mainnet' else 'testnet'
     # get blacklisted subgraphs if wanted
 
     if blacklist_parameter:
-        with open("./config.json", "r") as jsonfile:
+        with open(CONFIG_PATH, "r") as jsonfile:
             INVALID_SUBGRAPHS = json.load(jsonfile).get('blacklist')
     else:
         INVALID_SUBGRAPHS = False
@@ -89,11 +80,11 @@ def setIndexingRules(fixed_allocations, indexer_id,blacklist_parameter = True, p
     fixed_allocation_sum = sum(list(fixed_allocations.values())) * parallel_allocations
 
     # get relevant indexer data
-    indexer_data = requests.post(
-            API_GATEWAY,
-            data='{"query":"{ indexer(id:\\"' + indexer_id + '\\") { account { defaultName { name } } stakedTokens delegatedTokens allocatedTokens tokenCapacity } }"}',
-            headers={'content-type': 'application/json', 'Accept-Charset': 'UTF-8'}
-        ).json()['data']['indexer']
+    indexer_data = postGraphqlQuery(
+            {'query': 'query indexer($input: ID!) { indexer(id: $input) { account { defaultName { name } } '
+                      'stakedTokens delegatedTokens allocatedTokens tokenCapacity } }',
+             'variables': {'input': indexer_id}},
+            endpoint=endpoint)['data']['indexer']
 
     remaining_stake = int(indexer_data['tokenCapacity']) - int(fixed_allocation_sum)
     print(
@@ -110,11 +101,7 @@ def setIndexingRules(fixed_allocations, indexer_id,blacklist_parameter = True, p
         print("Not enough free stake for fixed allocation. Free to stake first")
         # sys.exit()
 
-    subgraph_data = requests.post(
-        API_GATEWAY,
-        data='{"query":"{ subgraphDeployments(first: 1000) { id originalName stakedTokens signalledTokens } }"}',
-        headers={'content-type': 'application/json', 'Accept-Charset': 'UTF-8'}
-    ).json()['data']['subgraphDeployments']
+    subgraph_data = getSubgraphDeploymentsData(network=endpoint)
 
     subgraphs = set()
     invalid_subgraphs = set()
@@ -123,7 +110,7 @@ def setIndexingRules(fixed_allocations, indexer_id,blacklist_parameter = True, p
     dynamic_allocation = 0
 
     for subgraph_deployment in subgraph_data:
-        subgraph = base58.b58encode(bytearray.fromhex('1220' + subgraph_deployment['id'][2:])).decode("utf-8")
+        subgraph = getIpfsHash(subgraph_deployment['id'], name=subgraph_deployment['originalName'])
         if INVALID_SUBGRAPHS:
             if subgraph in INVALID_SUBGRAPHS:
                 #print(f"    Skipping invalid Subgraph: {subgraph_deployment['originalName']} ({subgraph})")
@@ -182,10 +169,10 @@ def setIndexingRules(fixed_allocations, indexer_id,blacklist_parameter = True, p
     for subgraph in subgraphs:
         if subgraph in fixed_allocations.keys():
             if fixed_allocations[subgraph] != 0:
-                subgraph_hash = "0x"+base58.b58decode(subgraph).hex()[4:]
+                subgraph_hash = getHexId(subgraph)
                 subgraph_deployment_ids.append(subgraph_hash)
                 allocation_amount = fixed_allocations[subgraph] / 10 ** 18
-                print("ALLOCATING SUBGRAPH: " + "0x"+base58.b58decode(subgraph).hex()[4:])
+                print("ALLOCATING SUBGRAPH: " + subgraph_hash)
                 print("Allocation Amount: " + str(allocation_amount))
                 print("")
                 setIndexingRuleQuery(deployment = subgraph_hash, decision_basis = "always", parallel_allocations = parallel_allocations,
@@ -0,0 +1,132 @@
+from src.optimizer import optimizeAllocations, getPriceData
+from src.queries import getDataAllocationOptimizerBatch
+from src.subgraph_health_checks import createBlacklist
+from src.timings import timingSpan, printTimings
+from src.graphql_client import blockPin
+from src.deployment_registry import internDeployment, getChangedDeployments, saveDeploymentRegistry
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+import os
+
+# directory of the allocation scripts, every indexer gets a sub directory named by its id
+BATCH_SCRIPT_DIRECTORY = "./scripts"
+
+# data shared with the worker processes, set once per process by initializeBatchWorker
+_batch_data = {}
+
+
+def createIndexerData(batch_data, indexer_id, network='mainnet'):
+    """Creates the result of getDataAllocationOptimizer for one indexer from the batched data.
+
+    Returns
+    -------
+    dict
+        same structure as getDataAllocationOptimizer for the network
+    """
+    indexer_data = batch_data['indexers'].get(indexer_id.lower())
+    if indexer_data is None:
+        raise ValueError(f"Indexer {indexer_id} not found on {network}")
+    data = {'subgraphDeployments': batch_data['subgraphDeployments'],
+            'graphNetworks': batch_data['graphNetworks'],
+            '_meta': batch_data.get('_meta')}
+    if network == 'mainnet':
+        data['indexer'] = indexer_data
+    else:
+        data['indexers'] = [indexer_data]
+    return data
+
+
+def initializeBatchWorker(batch_data, price_data, network):
+    """Stores the batched data in the worker process, so it is only transferred once per process."""
+    _batch_data['batch_data'] = batch_data
+    _batch_data['price_data'] = price_data
+    _batch_data['network'] = network
+
+
+def runBatchOptimization(arguments):
+    """Runs the optimization of one indexer of the batch on the prefetched data of the worker process. The
+    output of the run is captured, so the logs of the parallel runs do not interleave.
+
+    Returns
+    -------
+    str, dict, str, list
+        indexer id, optimizer_results of the run (None if the run failed), captured output, deployments interned
+        by the run (saved once by the parent process, the workers would overwrite the registry of each other)
+    """
+    indexer_id, parameters = arguments
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            data = createIndexerData(_batch_data['batch_data'], indexer_id, network=_batch_data['network'])
+            optimizer_results = optimizeAllocations(indexer_id=indexer_id, data=data,
+                                                    price_data=_batch_data['price_data'],
+                                                    script_directory=os.path.join(BATCH_SCRIPT_DIRECTORY,
+                                                                                  indexer_id.lower()),
+                                                    save_registry=False, **parameters)
+        except Exception as e:
+            print(f"Optimization of indexer {indexer_id} failed: {e!r}")
+            optimizer_results = None
+    deployments = getChangedDeployments()
+    return indexer_id, optimizer_results, output.getvalue(), deployments
+
+
+def batchOptimizeAllocations(indexer_ids, blacklist_parameter=True, network='mainnet', processes=None,
+                             **parameters):
+    """ Runs the optimization for several indexers. The blacklist, the price data and the network data
+    (subgraph deployments, graph network) are fetched once and the stake and allocations of all indexers in one
+    batched query. The indexers are optimized in a process pool, every indexer gets its own optimizer results
+    and its own allocation scripts in ./scripts/<indexer_id>/. Indexing rules are not set (automation), the
+    indexer agent of the .env file only belongs to one indexer.
+
+    Parameters
+    -------
+        indexer_ids (list): The Graph Indexer Addresses
+        blacklist_parameter (bool): update the blacklist once and filter blacklisted subgraphs
+        network (str): "mainnet" or "testnet"
+        processes (int): amount of worker processes. Defaults to the amount of cpus
+        parameters: remaining parameters of optimizeAllocations
+
+    Returns
+    -------
+    dict
+        optimizer_results per indexer id (None if the optimization of the indexer failed)
+    """
+    parameters['automation'] = False
+    timings = {}
+
+    # fetch the shared data once for all indexers
+    if blacklist_parameter:
+        with timingSpan(timings, 'blacklist'):
+            createBlacklist(network='mainnet')
+    price_data = getPriceData(timings=timings)
+    with timingSpan(timings, 'data_fetch'), blockPin(network, enabled=parameters.get('pin_block', True)):
+        batch_data = getDataAllocationOptimizerBatch(indexer_ids, network=network)
+
+    print(f"Optimize {len(indexer_ids)} indexers over {len(batch_data['subgraphDeployments'])} subgraphs")
+    printTimings(timings)
+
+    results = {indexer_id: None for indexer_id in indexer_ids}
+    runs = []
+    for indexer_id in indexer_ids:
+        if indexer_id.lower() not in batch_data['indexers']:
+            print(f"Indexer {indexer_id} not found on {network}, skipped")
+            continue
+        runs.append((indexer_id, dict(parameters, blacklist_parameter=blacklist_parameter, network=network)))
+
+    # the network data is passed once per worker process, the tasks only carry the indexer and its parameters
+    with ProcessPoolExecutor(max_workers=processes, initializer=initializeBatchWorker,
+                             initargs=(batch_data, price_data, network)) as executor:
+        for indexer_id, optimizer_results, output, deployments in executor.map(runBatchOptimization, runs):
+            print()
+            print(70 * "=")
+            print("Indexer: ", indexer_id)
+            print(70 * "=")
+            print(output)
+            results[indexer_id] = optimizer_results
+            for subgraph_id, _, name in deployments:
+                internDeployment(subgraph_id=subgraph_id, name=name)
+
+    # persist the deployments interned by the workers once
+    saveDeploymentRegistry()
+    return results
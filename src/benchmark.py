@@ -0,0 +1,215 @@
+from src.optimizer import getNetworkData, getIndexerData, createAllocationDataFrames, processOptimizedAllocations
+from src.model_input import createModelInput
+from src.solvers import SOLVER_ENGINES, solveAllocations, getPersistentModel, getPersistentSolver, \
+    clearPersistentModel
+from src.config import loadConfig
+import contextlib
+import io
+import json
+import os
+import platform
+import time
+from datetime import datetime
+import numpy as np
+
+# network sizes (amount of subgraph deployments) of the benchmark
+BENCHMARK_SIZES = [100, 1000, 10000, 50000]
+
+# timed phases of an optimization run
+BENCHMARK_PHASES = ['ingestion', 'model_build', 'solve', 'post_processing']
+
+
+def createSyntheticNetwork(size, seed=0, allocations=50, indexer_stake=10 ** 7):
+    """Creates a synthetic result of getDataAllocationOptimizer with a seeded random network.
+    Signal is heavy tailed (lognormal, ~10% of the deployments without signal), the stake of a deployment
+    follows its signal with a lognormal stake/signal ratio.
+
+    Parameters
+    -------
+        size (int): amount of subgraph deployments
+        seed (int): seed of the random generator
+        allocations (int): amount of current allocations of the indexer
+        indexer_stake (int): token capacity of the indexer in GRT
+
+    Returns
+    -------
+    dict
+        same structure as getDataAllocationOptimizer for mainnet
+    """
+    rng = np.random.default_rng(seed)
+    signal = rng.lognormal(mean=8, sigma=2.5, size=size) * (rng.random(size) > 0.1)
+    stake = signal * rng.lognormal(mean=3, sigma=1.5, size=size) + rng.lognormal(mean=6, sigma=2, size=size)
+    ids = ['0x' + row.tobytes().hex() for row in rng.integers(0, 256, size=(size, 32), dtype=np.uint8)]
+    names = [f"Synthetic Subgraph {index}" if unnamed else None
+             for index, unnamed in enumerate(rng.random(size) > 0.05)]
+
+    subgraphs = [{'originalName': name, 'signalledTokens': str(int(s * 10 ** 18)),
+                  'stakedTokens': str(int(t * 10 ** 18)), 'id': subgraph_id}
+                 for name, s, t, subgraph_id in zip(names, signal, stake, ids)]
+
+    allocated = rng.choice(size, size=min(allocations, size), replace=False)
+    allocation_amount = indexer_stake / (2 * len(allocated))
+    indexer_allocations = [{'allocatedTokens': str(int(allocation_amount * 10 ** 18)),
+                            'id': '0x' + rng.integers(0, 256, size=20, dtype=np.uint8).tobytes().hex(),
+                            'subgraphDeployment': {'originalName': names[index], 'id': ids[index]},
+                            'indexingRewards': '0'} for index in allocated]
+
+    return {'subgraphDeployments': subgraphs,
+            'indexer': {'tokenCapacity': str(indexer_stake * 10 ** 18),
+                        'allocatedTokens': str(int(allocation_amount * len(allocated) * 10 ** 18)),
+                        'stakedTokens': str(indexer_stake * 10 ** 18),
+                        'allocations': indexer_allocations},
+            'graphNetworks': [{'totalTokensAllocated': str(int(stake.sum() * 10 ** 18)),
+                               'totalTokensStaked': str(int(stake.sum() * 2 * 10 ** 18)),
+                               'totalIndexingRewards': str(10 ** 26),
+                               'totalTokensSignalled': str(int(signal.sum() * 10 ** 18)),
+                               'totalSupply': str(10 ** 28),
+                               'networkGRTIssuance': str(10 ** 18 + 10 ** 9)}]}
+
+
+def isSolverAvailable(solver):
+    """Checks if the binary / package of a solver engine is installed."""
+    if solver in ['fast', 'exact']:
+        return True
+    if solver == 'linprog':
+        try:
+            import scipy.optimize
+        except ImportError:
+            return False
+        return True
+    if solver == 'highs':
+        return getPersistentSolver(getPersistentModel(1)) is not None
+    import pyomo.environ as pyomo
+    return bool(pyomo.SolverFactory(solver).available(exception_flag=False))
+
+
+def timeOptimization(data, solver, max_percentage=0.2, min_allocation=0):
+    """Runs the optimization on the data and times each phase. The persistent Pyomo Model and Solver of glpk
+    and highs are dropped before the run, so model_build and solve include building them.
+
+    Returns
+    -------
+    dict
+        seconds per phase and the optimized daily rewards
+    """
+    timings = {}
+    clearPersistentModel()
+    # the config.json is read outside of the timed phases
+    config = loadConfig()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        network_data = getNetworkData(data)
+        indexer_data, indexer = getIndexerData(data)
+        df, df_log = createAllocationDataFrames(data, indexer_data, network_data, blacklist_parameter=False)
+        timings['ingestion'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        model_input = createModelInput(df, network_data, indexer['indexer_total_stake'],
+                                       max_percentage=max_percentage, config=config)
+        if solver in ['glpk', 'highs']:
+            getPersistentModel(len(model_input['data']))
+        timings['model_build'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        allocations, rewards = solveAllocations(model_input['data'], model_input['reward_intervals'],
+                                                sliced_stake=model_input['sliced_stake'],
+                                                budget=model_input['budget'], lower=min_allocation,
+                                                upper=model_input['max_allocations'], solver=solver,
+                                                group_limits=model_input['group_limits'])
+        timings['solve'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        optimizer, FIXED_ALLOCATION = processOptimizedAllocations(model_input, allocations, rewards,
+                                                                  max_percentage=max_percentage)
+        timings['post_processing'] = time.perf_counter() - start
+    timings['optimized_reward_daily'] = optimizer['optimized_allocations']['indexingRewardDay']
+    return timings
+
+
+def findRegressions(report, baseline, tolerance=0.25, min_seconds=0.005):
+    """Compares the timings of the report with the baseline report. A phase regressed if it is slower than
+    the baseline by more than the tolerance and min_seconds.
+
+    Returns
+    -------
+    list
+        regressions with size, solver, phase, baseline and current seconds
+    """
+    baseline_results = {(result['size'], result['solver']): result for result in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        baseline_result = baseline_results.get((result['size'], result['solver']))
+        if baseline_result is None:
+            continue
+        for phase in BENCHMARK_PHASES + ['total']:
+            current, before = result[phase], baseline_result.get(phase)
+            if before is not None and current > before * (1 + tolerance) and current - before > min_seconds:
+                regressions.append({'size': result['size'], 'solver': result['solver'], 'phase': phase,
+                                    'baseline_seconds': before, 'seconds': current,
+                                    'slowdown': round(current / before, 2)})
+    return regressions
+
+
+def runBenchmark(sizes=None, solvers=None, repeat=3, seed=0, baseline_path=None, tolerance=0.25,
+                 report_path="./data/benchmark_report.json"):
+    """ Benchmarks the optimization on seeded synthetic networks for every size and solver engine. Every phase
+    (ingestion, model build, solve, post processing) is timed separately, the best of repeat runs is reported.
+
+    Parameters
+    -------
+        sizes (list): amounts of subgraph deployments, defaults to BENCHMARK_SIZES
+        solvers (list): solver engines, defaults to all installed SOLVER_ENGINES
+        repeat (int): runs per size and solver
+        seed (int): seed of the synthetic networks
+        baseline_path (str): report of a previous benchmark to check for regressions
+        tolerance (float): relative slowdown against the baseline that is flagged as regression
+        report_path (str): path of the json report
+
+    Returns
+    -------
+    dict
+        report with the environment, results per size and solver and the regressions
+    """
+    sizes = sizes or BENCHMARK_SIZES
+    solvers = solvers or SOLVER_ENGINES
+
+    report = {'datetime': datetime.now().strftime("%Y-%m-%d-%H:%M"),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'seed': seed,
+              'repeat': repeat,
+              'results': [],
+              'skipped_solvers': [solver for solver in solvers if not isSolverAvailable(solver)]}
+
+    for size in sizes:
+        data = createSyntheticNetwork(size, seed=seed)
+        for solver in solvers:
+            if solver in report['skipped_solvers']:
+                continue
+            runs = [timeOptimization(data, solver) for _ in range(repeat)]
+            result = {'size': size, 'solver': solver}
+            for phase in BENCHMARK_PHASES:
+                result[phase] = min(run[phase] for run in runs)
+            result['total'] = min(sum(run[phase] for phase in BENCHMARK_PHASES) for run in runs)
+            result['optimized_reward_daily'] = runs[-1]['optimized_reward_daily']
+            report['results'].append(result)
+            print(f"{size:>6} subgraphs {solver:>8}: " +
+                  " ".join(f"{phase} {result[phase]:.4f}s" for phase in BENCHMARK_PHASES + ['total']))
+
+    if report['skipped_solvers']:
+        print("Skipped solvers (not installed): ", report['skipped_solvers'])
+
+    report['regressions'] = []
+    if baseline_path and os.path.isfile(baseline_path):
+        with open(baseline_path) as jsonfile:
+            report['regressions'] = findRegressions(report, json.load(jsonfile), tolerance=tolerance)
+        for regression in report['regressions']:
+            print("REGRESSION: {size} subgraphs {solver} {phase}: {baseline_seconds:.4f}s -> {seconds:.4f}s "
+                  "({slowdown}x)".format(**regression))
+        if not report['regressions']:
+            print("No regressions against baseline ", baseline_path)
+
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, mode='w') as f:
+        f.write(json.dumps(report, indent=2))
+    return report
@@ -0,0 +1,242 @@
+import asyncio
+import bisect
+import calendar
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from src.async_client import asyncGetBlockHeaders, runAsync
+
+# path of the persisted headers per network
+BLOCK_HEADERS_PATH = "./data/block_headers_{network}.npz"
+
+# headers older than this (seconds) are final and cached forever, younger blocks can still be reorganized
+BLOCK_FINALITY_SECONDS = 1800
+
+# cached headers per network ({number: (timestamp, hash)}), loaded once per process. The index (sorted numbers and
+# timestamps of the cached headers) is rebuilt on the next timestamp search after headers were added
+_block_headers = {'networks': {}, 'lock': threading.Lock()}
+
+
+def _getHeaders(network):
+    if network not in _block_headers['networks']:
+        _block_headers['networks'][network] = {'headers': {}, 'changed': False, 'index': None}
+        loadBlockHeaders(network)
+    return _block_headers['networks'][network]
+
+
+def loadBlockHeaders(network='mainnet', path=None):
+    """Loads the persisted headers of the network. Headers cached before loading are kept."""
+    path = path or BLOCK_HEADERS_PATH.format(network=network)
+    cache = _block_headers['networks'].setdefault(network, {'headers': {}, 'changed': False, 'index': None})
+    cache['index'] = None
+    if not os.path.isfile(path):
+        return
+    with np.load(path) as headers:
+        numbers = headers['number'].tolist()
+        timestamps = headers['timestamp'].tolist()
+        hashes = ["0x" + row.tobytes().hex() for row in headers['hash']]
+    for number, timestamp, block_hash in zip(numbers, timestamps, hashes):
+        cache['headers'].setdefault(number, (timestamp, block_hash))
+
+
+def saveBlockHeaders(network='mainnet', path=None):
+    """Persists the headers of the network as compact arrays (number, timestamp, 32 byte hash) if they changed."""
+    cache = _block_headers['networks'].get(network)
+    if cache is None or not cache['changed']:
+        return
+    path = path or BLOCK_HEADERS_PATH.format(network=network)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _block_headers['lock']:
+        numbers = sorted(cache['headers'])
+        timestamps = [cache['headers'][number][0] for number in numbers]
+        hashes = np.frombuffer(b''.join(bytes.fromhex(cache['headers'][number][1][2:]) for number in numbers),
+                               dtype=np.uint8).reshape(-1, 32)
+        cache['changed'] = False
+    # write to a temporary file and replace the headers, parallel runs never read a partial file
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as f:
+        np.savez_compressed(f, number=np.array(numbers, dtype=np.int64),
+                            timestamp=np.array(timestamps, dtype=np.int64), hash=hashes)
+    os.replace(temporary_path, path)
+
+
+async def asyncGetCachedBlockHeaders(blocks, network='mainnet'):
+    """Get's the headers of the blocks, only the blocks that are not cached are fetched (in JSON-RPC batches).
+    Final headers are added to the cache.
+
+    Parameters
+    -------
+        blocks (list): block numbers
+        network (str): "mainnet" or "testnet"
+
+    Returns
+    -------
+    list
+        {'number': int, 'timestamp': int, 'hash': str} per block
+    """
+    cache = _getHeaders(network)
+    blocks = [int(block) for block in blocks]
+    missing = sorted(set(block for block in blocks if block not in cache['headers']))
+    fetched = {}
+    if missing:
+        final_timestamp = time.time() - BLOCK_FINALITY_SECONDS
+        fetched_headers = await asyncGetBlockHeaders(missing, network=network)
+        with _block_headers['lock']:
+            for header in fetched_headers:
+                fetched[header['number']] = (header['timestamp'], header['hash'])
+                if header['timestamp'] < final_timestamp:
+                    cache['headers'][header['number']] = (header['timestamp'], header['hash'])
+                    cache['changed'] = True
+                    cache['index'] = None
+    headers = []
+    for block in blocks:
+        timestamp, block_hash = cache['headers'].get(block) or fetched[block]
+        headers.append({'number': block, 'timestamp': timestamp, 'hash': block_hash})
+    return headers
+
+
+def getBlockHeaders(blocks, network='mainnet', save=True):
+    """Sync wrapper of asyncGetCachedBlockHeaders, persists the new headers if save is True."""
+    headers = runAsync(asyncGetCachedBlockHeaders(blocks, network=network))
+    if save:
+        saveBlockHeaders(network)
+    return headers
+
+
+def getBlockTimestamp(block, network='mainnet'):
+    """Get's the unix timestamp of a block."""
+    return getBlockHeaders([block], network=network)[0]['timestamp']
+
+
+def getBlockHash(block, network='mainnet'):
+    """Get's the hash (0x...) of a block."""
+    return getBlockHeaders([block], network=network)[0]['hash']
+
+
+def _getIndex(cache):
+    with _block_headers['lock']:
+        if cache['index'] is None:
+            numbers = sorted(cache['headers'])
+            cache['index'] = (numbers, [cache['headers'][number][0] for number in numbers])
+        return cache['index']
+
+
+async def asyncGetBlockByTimestamp(timestamp, network='mainnet'):
+    """Get's the first block with a timestamp at or after the timestamp. The search starts from the closest cached
+    headers and interpolates the block between them, every step fetches two neighbouring headers in one JSON-RPC
+    batch. Takes O(log n) calls, none if the block and its parent are cached.
+
+    Parameters
+    -------
+        timestamp (int): unix timestamp
+        network (str): "mainnet" or "testnet"
+
+    Returns
+    -------
+    int
+        block number
+    """
+    cache = _getHeaders(network)
+    numbers, timestamps = _getIndex(cache)
+    # lower bound before the timestamp, upper bound at or after the timestamp, as (number, timestamp)
+    position = bisect.bisect_left(timestamps, timestamp)
+    if position > 0:
+        lower = (numbers[position - 1], timestamps[position - 1])
+    else:
+        genesis = (await asyncGetCachedBlockHeaders([0], network=network))[0]
+        if genesis['timestamp'] >= timestamp:
+            return 0
+        lower = (0, genesis['timestamp'])
+    if position < len(numbers):
+        upper = (numbers[position], timestamps[position])
+    else:
+        latest = (await asyncGetBlockHeaders(['latest'], network=network))[0]
+        if latest['timestamp'] < timestamp:
+            raise ValueError(f"No block at or after timestamp {timestamp} yet")
+        upper = (latest['number'], latest['timestamp'])
+
+    interpolate = True
+    while upper[0] - lower[0] > 1:
+        width = upper[0] - lower[0]
+        if interpolate:
+            fraction = (timestamp - lower[1]) / (upper[1] - lower[1])
+            guess = lower[0] + int(np.ceil(fraction * width))
+        else:
+            guess = (lower[0] + upper[0]) // 2
+        guess = min(max(guess, lower[0] + 1), upper[0] - 1)
+        probes = [guess - 1, guess] if guess - 1 > lower[0] else [guess]
+        for header in await asyncGetCachedBlockHeaders(probes, network=network):
+            if header['timestamp'] < timestamp:
+                lower = max(lower, (header['number'], header['timestamp']))
+            else:
+                upper = min(upper, (header['number'], header['timestamp']))
+        # an interpolation step that did not halve the range is followed by a bisection step
+        interpolate = not interpolate or upper[0] - lower[0] <= width // 2
+    return upper[0]
+
+
+def getBlockByTimestamp(timestamp, network='mainnet', save=True):
+    """Sync wrapper of asyncGetBlockByTimestamp, persists the new headers if save is True."""
+    block = runAsync(asyncGetBlockByTimestamp(timestamp, network=network))
+    if save:
+        saveBlockHeaders(network)
+    return block
+
+
+def getBlocksByTimestamps(timestamps, network='mainnet', save=True):
+    """Get's the first block at or after each timestamp, the searches run concurrently.
+
+    Returns
+    -------
+    list
+        block number per timestamp
+    """
+    async def searchBlocks():
+        return await asyncio.gather(*[asyncGetBlockByTimestamp(timestamp, network=network)
+                                      for timestamp in timestamps])
+
+    blocks = list(runAsync(searchBlocks()))
+    if save:
+        saveBlockHeaders(network)
+    return blocks
+
+
+def getBlockBefore(block, seconds=3600, network='mainnet'):
+    """Get's the first block at or after the timestamp of the block minus seconds, e.g. the block one hour before.
+
+    Returns
+    -------
+    int
+        block number
+    """
+    return getBlockByTimestamp(getBlockTimestamp(block, network=network) - seconds, network=network)
+
+
+def getDailyBlocks(start_block, end_block, network='mainnet', include_end=False):
+    """Get's the start block and the first block of every following UTC day up to the end block.
+
+    Parameters
+    -------
+        start_block (int): first block, e.g. the creation block of an allocation
+        end_block (int): last block, e.g. the current block
+        include_end (bool): add the end block as last block, so the accrual of the last day is sampled
+
+    Returns
+    -------
+    list, list
+        block numbers and their unix timestamps in ascending order
+    """
+    start_timestamp, end_timestamp = [header['timestamp'] for header in
+                                      getBlockHeaders([start_block, end_block], network=network)]
+    day = datetime.utcfromtimestamp(start_timestamp).date() + timedelta(days=1)
+    midnights = []
+    while calendar.timegm(day.timetuple()) <= end_timestamp:
+        midnights.append(calendar.timegm(day.timetuple()))
+        day += timedelta(days=1)
+    blocks = [start_block] + getBlocksByTimestamps(midnights, network=network)
+    if include_end and blocks[-1] != end_block:
+        blocks.append(end_block)
+    headers = getBlockHeaders(blocks, network=network)
+    return blocks, [header['timestamp'] for header in headers]
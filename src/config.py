@@ -0,0 +1,18 @@
+import json
+import os
+
+# config.json in the repository root, resolved from the location of this module, so every module reads and writes
+# the same file independent of the working directory
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.json")
+
+
+def loadConfig():
+    """Get's the content of the config.json (blacklist, indexed subgraphs, subgraph caps, group limits, ...).
+
+    Returns
+    -------
+    dict
+        config
+    """
+    with open(CONFIG_PATH, "r") as jsonfile:
+        return json.load(jsonfile)
@@ -0,0 +1,135 @@
+import os
+import base58
+import numpy as np
+
+# path of the persisted registry
+DEPLOYMENT_REGISTRY_PATH = "./data/deployment_registry.npz"
+
+# capacity of the registry arrays when the first deployment is interned, the capacity doubles when they are full
+REGISTRY_INITIAL_CAPACITY = 256
+
+# interned subgraph deployments. Every deployment is stored once at the same position of the compact arrays of the
+# hex ids (32 bytes per id) and ipfs hashes (46 bytes per hash) and of the list of names, the first size positions
+# are used. The index maps both ids (0x... and Qm...) to the position for O(1) lookups. changed holds the positions
+# of the deployments added or renamed since the registry was saved
+_registry = {'hex': np.zeros((0, 32), dtype=np.uint8), 'ipfs': np.zeros(0, dtype='S46'), 'name': [], 'size': 0,
+             'index': {}, 'loaded': False, 'changed': set()}
+
+
+def hexToIpfsHash(subgraph_id):
+    """Converts the hex id of a subgraph deployment (0x...) to the ipfs hash (Qm...)."""
+    return base58.b58encode(bytearray.fromhex('1220' + subgraph_id[2:])).decode("utf-8")
+
+
+def ipfsHashToHex(ipfs_hash):
+    """Converts the ipfs hash of a subgraph deployment (Qm...) to the hex id (0x...)."""
+    return "0x" + base58.b58decode(ipfs_hash).hex()[4:]
+
+
+def loadDeploymentRegistry(path=DEPLOYMENT_REGISTRY_PATH):
+    """Loads the persisted registry once per process. Deployments interned before loading are kept."""
+    _registry['loaded'] = True
+    if not os.path.isfile(path):
+        return
+    with np.load(path) as registry:
+        hex_ids = ["0x" + row.tobytes().hex() for row in registry['hex']]
+        ipfs_hashes = registry['ipfs'].astype(str).tolist()
+        names = registry['name'].tolist()
+    for subgraph_id, ipfs_hash, name in zip(hex_ids, ipfs_hashes, names):
+        if subgraph_id not in _registry['index']:
+            _addDeployment(subgraph_id, ipfs_hash, name or None)
+
+
+def saveDeploymentRegistry(path=DEPLOYMENT_REGISTRY_PATH):
+    """Persists the registry as compact arrays (32 byte ids, fixed width ipfs hashes, names) if it changed."""
+    if not _registry['changed']:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    size = _registry['size']
+    # write to a temporary file and replace the registry, parallel runs never read a partial file
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as f:
+        np.savez_compressed(f, hex=_registry['hex'][:size], ipfs=_registry['ipfs'][:size],
+                            name=np.array([name or '' for name in _registry['name']], dtype=str))
+    os.replace(temporary_path, path)
+    _registry['changed'] = set()
+
+
+def getChangedDeployments():
+    """Get's the deployments added or renamed since the registry was saved, e.g. to save the deployments of the
+    worker processes of src.batch once in the parent process.
+
+    Returns
+    -------
+    list
+        (hex id, ipfs hash, name) per deployment
+    """
+    return [(_hexId(index), _ipfsHash(index), _registry['name'][index]) for index in sorted(_registry['changed'])]
+
+
+def _addDeployment(subgraph_id, ipfs_hash, name):
+    index = _registry['size']
+    if index == len(_registry['ipfs']):
+        # grow the arrays, doubling keeps the amortized cost of an insert constant
+        capacity = max(REGISTRY_INITIAL_CAPACITY, 2 * index)
+        _registry['hex'] = np.concatenate([_registry['hex'], np.zeros((capacity - index, 32), dtype=np.uint8)])
+        _registry['ipfs'] = np.concatenate([_registry['ipfs'], np.zeros(capacity - index, dtype='S46')])
+    _registry['hex'][index] = np.frombuffer(bytes.fromhex(subgraph_id[2:]), dtype=np.uint8)
+    _registry['ipfs'][index] = ipfs_hash.encode()
+    _registry['name'].append(name)
+    _registry['index'][subgraph_id] = index
+    _registry['index'][ipfs_hash] = index
+    _registry['size'] = index + 1
+    return index
+
+
+def _hexId(index):
+    return "0x" + _registry['hex'][index].tobytes().hex()
+
+
+def _ipfsHash(index):
+    return _registry['ipfs'][index].decode()
+
+
+def internDeployment(subgraph_id=None, ipfs_hash=None, name=None):
+    """Interns a subgraph deployment by its hex id or ipfs hash and stores the name if supplied.
+
+    Returns
+    -------
+    int
+        position of the deployment in the registry
+    """
+    if not _registry['loaded']:
+        loadDeploymentRegistry()
+    if subgraph_id is not None:
+        subgraph_id = subgraph_id.lower()
+        index = _registry['index'].get(subgraph_id)
+    else:
+        index = _registry['index'].get(ipfs_hash)
+
+    if index is None:
+        if subgraph_id is None:
+            subgraph_id = ipfsHashToHex(ipfs_hash)
+        else:
+            ipfs_hash = hexToIpfsHash(subgraph_id)
+        index = _addDeployment(subgraph_id, ipfs_hash, name)
+        _registry['changed'].add(index)
+    elif name is not None and _registry['name'][index] != name:
+        _registry['name'][index] = name
+        _registry['changed'].add(index)
+    return index
+
+
+def getIpfsHash(subgraph_id, name=None):
+    """Get's the ipfs hash (Qm...) of a subgraph deployment hex id (0x...)."""
+    return _ipfsHash(internDeployment(subgraph_id=subgraph_id, name=name))
+
+
+def getHexId(ipfs_hash):
+    """Get's the hex id (0x...) of a subgraph deployment ipfs hash (Qm...)."""
+    return _hexId(internDeployment(ipfs_hash=ipfs_hash))
+
+
+def getDeploymentName(subgraph_id=None, ipfs_hash=None):
+    """Get's the name of a subgraph deployment, None if the name is unknown."""
+    return _registry['name'][internDeployment(subgraph_id=subgraph_id, ipfs_hash=ipfs_hash)]
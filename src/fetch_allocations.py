@@ -1,7 +1,9 @@
 import json
-import base58
+from src.deployment_registry import getIpfsHash
+from src.graphql_client import postGraphqlQuery
+from src.block_headers import getBlockHash, getBlockBefore
+from src.rpc_pool import getWeb3, getContract
 from eth_typing.evm import BlockNumber
-import requests
 import argparse
 from datetime import datetime, timedelta
 import datetime as dt
@@ -60,8 +62,7 @@ def getGraphQuery(subgraph_url, indexer_id, variables=None, ):
     request_json = {'query': ALLOCATION_DATA}
     if indexer_id:
         request_json['variables'] = variables
-    resp = requests.post(subgraph_url, json=request_json)
-    response = json.loads(resp.text)
+    response = postGraphqlQuery(request_json, endpoint=subgraph_url)
     response = response['data']
 
     return response
@@ -74,12 +75,7 @@ def initialize_rpc():
     object
         web3 instance
     """
-    web3 = Web3(Web3.HTTPProvider(RPC_URL))
-
-    logging.getLogger("web3.RequestManager").setLevel(logging.WARNING)
-    logging.getLogger("web3.providers.HTTPProvider").setLevel(logging.WARNING)
-
-    return web3
+    return getWeb3('mainnet')
 
 def get_poi_data(subgraph_url):
     epoch_count = 219
@@ -98,8 +94,7 @@ def get_poi_data(subgraph_url):
     request_json = {'query': query}
     if indexer_id:
         request_json['variables'] = variables
-    resp = requests.post(subgraph_url, json=request_json)
-    response = json.loads(resp.text)
+    response = postGraphqlQuery(request_json, endpoint=subgraph_url)
 
     # epoch_count = response['data']['graphNetwork']['epochCount']
     epoch_count = 214
@@ -108,12 +103,11 @@ def get_poi_data(subgraph_url):
     request_json = {'query': query}
     if indexer_id:
         request_json['variables'] = variables
-    resp = requests.post(subgraph_url, json=request_json)
-    response = json.loads(resp.text)
+    response = postGraphqlQuery(request_json, endpoint=subgraph_url)
 
     start_block = response['data']['epoch']['startBlock']
 
-    start_block_hash = web3.eth.getBlock(start_block)['hash'].hex()
+    start_block_hash = getBlockHash(start_block)
 
     return start_block, start_block_hash
 
@@ -129,8 +123,7 @@ if __name__ == '__main__':
 
     print(f"RPC initialized at: {RPC_URL}")
     web3 = initialize_rpc()
-    abi = json.loads(ABI_JSON)
-    contract = web3.eth.contract(address=REWARD_MANAGER, abi=abi)
+    contract = getContract(REWARD_MANAGER, ABI_JSON)
 
     # initialize argument parser
     my_parser = argparse.ArgumentParser(description='The Graph Allocation script for determining the optimal Allocations \
@@ -180,14 +173,16 @@ if __name__ == '__main__':
     rewards_at_stake_from_broken_subgraphs = 0
 
     current_block = web3.eth.blockNumber
+    block_minus_1_hour = getBlockBefore(current_block, 3600)
+    block_minus_5_minutes = getBlockBefore(current_block, 300)
 
     for allocation in allocations:
         allocation_id = to_checksum_address(allocation['id'])
         subgraph_id = allocation['subgraphDeployment']['id']
         print(allocations.index(allocation), allocation_id)
         pending_rewards = contract.functions.getRewards(allocation_id).call() / 10**18
-        pending_rewards_minus_1_hour = contract.functions.getRewards(allocation_id).call(block_identifier = current_block - 277) / 10**18
-        pending_rewards_minus_5_minutes = contract.functions.getRewards(allocation_id).call(block_identifier = current_block - 23) / 10**18
+        pending_rewards_minus_1_hour = contract.functions.getRewards(allocation_id).call(block_identifier = block_minus_1_hour) / 10**18
+        pending_rewards_minus_5_minutes = contract.functions.getRewards(allocation_id).call(block_identifier = block_minus_5_minutes) / 10**18
 
         name = allocation['subgraphDeployment']['originalName']
         if name is None:
@@ -213,7 +208,7 @@ if __name__ == '__main__':
 
         current_rate_all_indexers = current_rate / allocated_tokens * subgraph_stake
 
-        b58 = base58.b58encode(bytearray.fromhex('1220' + subgraph_id[2:])).decode("utf-8")
+        b58 = getIpfsHash(subgraph_id, name=allocation['subgraphDeployment']['originalName'])
         data = {
             'name': name,
             'subgraph_id': subgraph_id,
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 from src.helpers import initialize_rpc_testnet, initialize_rpc, ALLOCATION_MANAGER_MAINNET, ALLOCATION_MANAGER_TESTNET, \
     ALLOCATION_MANAGER_ABI, ALLOCATION_MANAGER_ABI_TESTNET
+from src.rpc_pool import getContract
 import json
 from web3.middleware import geth_poa_middleware
 from web3 import Web3
@@ -55,17 +56,12 @@ def asyncFilterAllocationEvents(indexer_id, allocation_ids = ["0xFE282240De71e36
     # Initialize web3 client, set network for allocation manager contract
     if network == "mainnet":
         web3 = initialize_rpc()
-        allocation_manager = Web3.toChecksumAddress(ALLOCATION_MANAGER_MAINNET)
-        # initialize contract with abi
-        contract = web3.eth.contract(address=allocation_manager, abi=json.loads(ALLOCATION_MANAGER_ABI))
+        # shared contract, the abi is parsed once
+        contract = getContract(ALLOCATION_MANAGER_MAINNET, ALLOCATION_MANAGER_ABI, network="mainnet")
     if network == "testnet":
+        # the shared testnet client has the geth_poa_middleware
         web3 = initialize_rpc_testnet()
-        allocation_manager = Web3.toChecksumAddress(ALLOCATION_MANAGER_TESTNET)
-
-        web3.middleware_onion.inject(geth_poa_middleware, layer=0)
-
-        # initialize contract with abi
-        contract = web3.eth.contract(address=allocation_manager, abi=json.loads(ALLOCATION_MANAGER_ABI_TESTNET))
+        contract = getContract(ALLOCATION_MANAGER_TESTNET, ALLOCATION_MANAGER_ABI_TESTNET, network="testnet")
 
     # Initialize empty list where all relevant events will be added to
     events_found = []
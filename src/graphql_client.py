@@ -0,0 +1,234 @@
+import contextlib
+import json
+import os
+import time
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from src.query_cache import getCachedQuery, setCachedQuery, topLevelFields
+from src.config import CONFIG_PATH
+from src.timings import countHttpResponse
+
+# endpoints of the GraphQL client, url from the environment variable (.env) or a fixed url
+GRAPHQL_ENDPOINTS = {'mainnet': {'env': 'API_GATEWAY'},
+                     'testnet': {'env': 'TESTNET_GATEWAY'},
+                     'indexer_management': {'env': 'INDEXER_MANAGEMENT_ENDPOINT'},
+                     'index_node': {'url': "https://api.thegraph.com/index-node/graphql"},
+                     'hosted_mainnet': {'url': "https://api.thegraph.com/subgraphs/name/graphprotocol/graph-network-mainnet"}}
+
+# default (connect, read) timeout in seconds, retries and backoff of an endpoint. Can be overwritten per endpoint
+# in the config.json, e.g. {"graphql_endpoints": {"mainnet": {"timeout": [5, 120], "retries": 5}}}
+GRAPHQL_TIMEOUT = (5, 60)
+GRAPHQL_RETRIES = 3
+GRAPHQL_BACKOFF = 0.5
+
+# http status codes of the gateway that are retried
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# max page size of the gateway and amount of concurrent page streams of the paginator
+PAGE_SIZE = 1000
+PAGE_STREAMS = 4
+
+# upper bound of the last page stream, greater than every hex id (0x...) of the network subgraph
+ID_RANGE_END = "0xg"
+
+# endpoints of the network subgraph, their queries can be pinned to a block
+PINNABLE_ENDPOINTS = ['mainnet', 'testnet', 'hosted_mainnet']
+
+# pooled keep-alive session and the endpoint configuration, created once per process, and the blocks the
+# queries of the endpoints are pinned to ({endpoint: block number}, see blockPin)
+_client = {'session': None, 'endpoints': {}, 'block_pins': {}}
+
+
+def getGraphqlSession():
+    """Get's the pooled keep-alive session of the GraphQL client. Responses are requested gzip compressed."""
+    if _client['session'] is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Content-Type': 'application/json', 'Accept': 'application/json',
+                                'Accept-Encoding': 'gzip, deflate', 'Accept-Charset': 'UTF-8'})
+        session.hooks['response'].append(countHttpResponse)
+        _client['session'] = session
+    return _client['session']
+
+
+def getEndpointConfig(endpoint):
+    """Get's the configuration (url, timeout, retries, backoff) of an endpoint, loaded once from the .env and the
+    config.json. An endpoint that is not in GRAPHQL_ENDPOINTS is used as url.
+
+    Returns
+    -------
+    dict
+        url, timeout, retries and backoff of the endpoint
+    """
+    if endpoint in _client['endpoints']:
+        return _client['endpoints'][endpoint]
+
+    load_dotenv()
+    overrides = {}
+    if os.path.isfile(CONFIG_PATH):
+        with open(CONFIG_PATH, "r") as jsonfile:
+            overrides = json.load(jsonfile).get('graphql_endpoints', {}).get(endpoint, {})
+
+    definition = GRAPHQL_ENDPOINTS.get(endpoint, {'url': endpoint})
+    url = os.getenv(definition['env']) if 'env' in definition else definition['url']
+    timeout = overrides.get('timeout', GRAPHQL_TIMEOUT)
+    config = {'url': overrides.get('url', url),
+              'timeout': tuple(timeout) if isinstance(timeout, list) else timeout,
+              'retries': overrides.get('retries', GRAPHQL_RETRIES),
+              'backoff': overrides.get('backoff', GRAPHQL_BACKOFF)}
+    _client['endpoints'][endpoint] = config
+    return config
+
+
+def postGraphqlQuery(request_json, endpoint='mainnet', retry=True, cache=True, pin=True):
+    """Posts a GraphQL request over the pooled session. Timeouts, connection errors and the status codes in
+    RETRY_STATUS_CODES are retried with exponential backoff.
+
+    Parameters
+    -------
+        request_json (dict): {'query': ..., 'variables': ...}
+        endpoint (str): name of the endpoint in GRAPHQL_ENDPOINTS (e.g. 'mainnet', 'testnet') or url
+        retry (bool): retry failed requests, disable for requests that must not be sent twice
+        cache (bool): look the response up in the query cache and cache it
+        pin (bool): pin the query to the block of the endpoint's block pin
+
+    Returns
+    -------
+    dict
+        json response of the endpoint
+    """
+    request_json, pinned = pinGraphqlQuery(request_json, endpoint) if pin else (request_json, False)
+    if cache:
+        response = getCachedQuery(request_json, endpoint, pinned=pinned)
+        if response is not None:
+            return response
+    config = getEndpointConfig(endpoint)
+    session = getGraphqlSession()
+    retries = config['retries'] if retry else 0
+    for attempt in range(retries + 1):
+        try:
+            resp = session.post(config['url'], json=request_json, timeout=config['timeout'])
+            if resp.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                resp.raise_for_status()
+                response = resp.json()
+                if cache:
+                    setCachedQuery(request_json, endpoint, response, pinned=pinned)
+                return response
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+        time.sleep(config['backoff'] * 2 ** attempt)
+
+
+def getGatewayBlock(endpoint='mainnet'):
+    """Get's the latest block the network subgraph of the endpoint has indexed.
+
+    Returns
+    -------
+    int
+        block number
+    """
+    response = postGraphqlQuery({'query': "{ _meta { block { number } } }"}, endpoint=endpoint, cache=False, pin=False)
+    return response['data']['_meta']['block']['number']
+
+
+@contextlib.contextmanager
+def blockPin(endpoint='mainnet', block=None, enabled=True):
+    """Pins all queries of the endpoint to one block while the context is active, so all data of a run describe
+    the same chain state. The queries get the argument block: {number: N} on their top-level fields and are
+    cached forever. Does nothing if enabled is False or the endpoint is not in PINNABLE_ENDPOINTS.
+
+    Parameters
+    -------
+        endpoint (str): name of the endpoint in GRAPHQL_ENDPOINTS
+        block (int): block number, defaults to the latest block indexed by the endpoint
+        enabled (bool): pin the block
+
+    Returns
+    -------
+    int
+        pinned block number, None if not pinned
+    """
+    if not enabled or endpoint not in PINNABLE_ENDPOINTS:
+        yield None
+        return
+    previous = _client['block_pins'].get(endpoint)
+    _client['block_pins'][endpoint] = getGatewayBlock(endpoint) if block is None else int(block)
+    try:
+        yield _client['block_pins'][endpoint]
+    finally:
+        if previous is None:
+            _client['block_pins'].pop(endpoint, None)
+        else:
+            _client['block_pins'][endpoint] = previous
+
+
+def getPinnedBlock(endpoint='mainnet'):
+    """Get's the block the queries of the endpoint are pinned to, None if not pinned."""
+    return _client['block_pins'].get(endpoint)
+
+
+def pinGraphqlQuery(request_json, endpoint='mainnet'):
+    """Adds the argument block: {number: N} of the endpoint's block pin to the top-level fields of a query.
+
+    Returns
+    -------
+    dict, bool
+        request json, True if the query was pinned
+    """
+    block = _client['block_pins'].get(endpoint)
+    if block is None:
+        return request_json, False
+    query = request_json['query']
+    operation, fields = topLevelFields(query)
+    if operation == 'mutation':
+        return request_json, False
+    argument = "block: {number: %d}" % block
+    # insert from the last field, so the positions of the previous fields stay valid
+    for name, index in reversed(fields):
+        following = query[index:].lstrip()
+        if following.startswith('('):
+            position = query.index('(', index) + 1
+            query = query[:position] + argument + ", " + query[position:]
+        else:
+            query = query[:index] + "(" + argument + ")" + query[index:]
+    return dict(request_json, query=query), True
+
+
+def splitIdRange(streams):
+    """Splits the hex id space (0x...) into ranges of about equal size, one per page stream.
+
+    Returns
+    -------
+    list
+        (id_gt, id_lt) per page stream
+    """
+    boundaries = ["0x" + format(index * 256 // streams, '02x') for index in range(1, streams)]
+    return list(zip([""] + boundaries, boundaries + [ID_RANGE_END]))
+
+
+def pageRequestJson(query, variables, page_size, id_gt, id_lt):
+    """Get's the request of the page after the cursor id_gt in the id range of a page stream.
+
+    Returns
+    -------
+    dict
+        {'query': ..., 'variables': ...}
+    """
+    return {'query': query, 'variables': dict(variables or {}, first=page_size, id_gt=id_gt, id_lt=id_lt)}
+
+
+def nextPageCursor(rows, page_size):
+    """Get's the cursor (id_gt) of the next page of a page stream.
+
+    Returns
+    -------
+    str
+        id of the last row, None if the page is the last page of the stream
+    """
+    if len(rows) < page_size:
+        return None
+    return rows[-1]['id']
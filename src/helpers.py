@@ -7,7 +7,9 @@ import redis
 import sys
 import datetime as dt
 import argparse
-import base58
+from src.deployment_registry import getIpfsHash
+from src.model_input import percentageIncrease
+from src.rpc_pool import getWeb3, getContract
 from itertools import zip_longest
 import requests
 import os
@@ -29,41 +31,26 @@ ALLOCATION_MANAGER_ABI_TESTNET = """[{"anonymous":false,"inputs":[{"indexed":tru
 
 
 def initialize_rpc():
-    """Initializes RPC client.
+    """Initializes RPC client. The client is shared by the process (see rpc_pool.getWeb3).
 
     Returns
     -------
     object
         web3 instance
     """
-    load_dotenv()
-    RPC_URL = os.getenv('RPC_URL')
-
-    web3 = Web3(Web3.HTTPProvider(RPC_URL))
-
-    logging.getLogger("web3.RequestManager").setLevel(logging.WARNING)
-    logging.getLogger("web3.providers.HTTPProvider").setLevel(logging.WARNING)
-
-    return web3
+    return getWeb3('mainnet')
 
 
 def initialize_rpc_testnet():
-    """Initializes RPC client.
+    """Initializes RPC client, with the geth_poa_middleware. The client is shared by the process (see
+    rpc_pool.getWeb3).
 
     Returns
     -------
     object
         web3 instance
     """
-    load_dotenv()
-    RPC_URL = os.getenv('RPC_URL_TESTNET')
-
-    web3 = Web3(Web3.HTTPProvider(RPC_URL))
-
-    logging.getLogger("web3.RequestManager").setLevel(logging.WARNING)
-    logging.getLogger("web3.providers.HTTPProvider").setLevel(logging.WARNING)
-
-    return web3
+    return getWeb3('testnet')
 
 
 def connectIndexerDatabase():
@@ -104,7 +91,7 @@ def connectIndexerDatabase():
 
 
 def initializeRewardManagerContract():
-    """Initializes RPC client and create Object for Reward Manager Contract
+    """Initializes RPC client and create Object for Reward Manager Contract, created once per process
 
     Returns
     -------
@@ -113,10 +100,7 @@ def initializeRewardManagerContract():
     """
 
     load_dotenv()
-    web3 = initialize_rpc()
-    contract = web3.eth.contract(address=os.getenv(
-        'REWARD_MANAGER'), abi=json.loads(REWARD_MANAGER_ABI))
-    return contract
+    return getContract(os.getenv('REWARD_MANAGER'), REWARD_MANAGER_ABI)
 
 
 # REDIS Functions
@@ -194,22 +178,6 @@ def getLastKeyFromDate(subgraph_ipfs_hash, date, allocation_id):
     return key
 
 
-# MATH Functions
-
-def percentageIncrease(start_value, final_value):
-    """ Helper Function: Calculates the Percentage Increase between two values
-
-    returns
-    --------
-        int : percentage increase rounded to two decimals
-
-    """
-    if start_value == 0:
-        start_value = 1
-    increase = ((final_value - start_value) / start_value) * 100
-    return round(increase, 2)
-
-
 def initializeParser():
     # initialize argument parser
     my_parser = argparse.ArgumentParser(description='The Graph Allocation script for determining the optimal Allocations \
@@ -297,7 +265,7 @@ def initializeParser():
     my_parser.add_argument('--app',
                            metavar='app',
                            type=str,
-                           help='Set the app execution (Either "script", or "web")',
+                           help='Set the app execution (Either "script", "web", "sweep", "snapshot", "benchmark" or "batch")',
                            default="script")
     my_parser.add_argument('--network',
                            metavar='network',
@@ -315,12 +283,118 @@ def initializeParser():
                            dest='ignore_tx_costs',
                            action='store_true')
     my_parser.set_defaults(ignore_tx_costs=False)
+
+    # solver engine for the optimization
+    my_parser.add_argument('--solver',
+                           metavar='solver',
+                           type=str,
+                           help='Set the solver engine for the optimization (Either "glpk", "fast", "exact", "highs" \
+                                or "linprog"). \
+                                "fast" solves the linear model in closed form and falls back to glpk if the problem does \
+                                not fit. "exact" maximizes the true diminishing indexing rewards without a solver binary. \
+                                "highs" solves the model in memory with the persistent APPSI HiGHS interface. \
+                                "linprog" solves the model as a sparse matrix LP with scipy.',
+                           default="glpk")
+    my_parser.add_argument('--solver_time_limit',
+                           metavar='solver_time_limit',
+                           type=float,
+                           help='Time limit of the solver in seconds. Defaults to no limit.',
+                           default=None)
+    my_parser.add_argument('--solver_mip_gap',
+                           metavar='solver_mip_gap',
+                           type=float,
+                           help='Relative MIP gap of the solver. Defaults to the solver default.',
+                           default=None)
+
+    # parameter sweep (--app sweep)
+    my_parser.add_argument('--sweep_grid',
+                           metavar='sweep_grid',
+                           type=str,
+                           help='Path to a json file with the parameter grid of the sweep, e.g. \
+                                {"max_percentage": [0.1, 0.2], "reserve_stake": [0, 500]}',
+                           default="./sweep_grid.json")
+    my_parser.add_argument('--sweep_processes',
+                           metavar='sweep_processes',
+                           type=int,
+                           help='Amount of worker processes for the sweep. Defaults to the amount of cpus.',
+                           default=None)
+
+    # batch optimization of several indexers (--app batch)
+    my_parser.add_argument('--indexer_ids',
+                           metavar='indexer_ids',
+                           type=str,
+                           nargs='+',
+                           help='The Graph Indexer Addresses of the batch optimization',
+                           default=None)
+    my_parser.add_argument('--batch_processes',
+                           metavar='batch_processes',
+                           type=int,
+                           help='Amount of worker processes for the batch optimization. Defaults to the amount of cpus.',
+                           default=None)
+
+    # network snapshot (--app snapshot creates it, "script" and "sweep" run offline on it)
+    my_parser.add_argument('--snapshot',
+                           metavar='snapshot',
+                           type=str,
+                           help='Path to a parquet snapshot of the network data. Created with --app snapshot, \
+                                "script" and "sweep" run offline on the snapshot if supplied.',
+                           default=None)
+
+    # reuse the optimized allocations of the latest run with the same inputs
+    my_parser.add_argument(
+        '--memoization', dest='memoization', action='store_true')
+    my_parser.add_argument(
+        '--no-memoization', dest='memoization', action='store_false')
+    my_parser.set_defaults(memoization=True)
+    my_parser.add_argument('--memoization_epsilon',
+                           metavar='memoization_epsilon',
+                           type=float,
+                           help='Max relative drift of the price and gas data to reuse the threshold decision of a \
+                                memoized run. Defaults to 0.05.',
+                           default=0.05)
+
+    # skip the model build and solve if the threshold is not reachable
+    my_parser.add_argument(
+        '--upper_bound_check', dest='upper_bound_check', action='store_true')
+    my_parser.add_argument(
+        '--no-upper_bound_check', dest='upper_bound_check', action='store_false')
+    my_parser.set_defaults(upper_bound_check=True)
+
+    # pin the queries and contract calls of a run to one block
+    my_parser.add_argument(
+        '--pin_block', dest='pin_block', action='store_true')
+    my_parser.add_argument(
+        '--no-pin_block', dest='pin_block', action='store_false')
+    my_parser.set_defaults(pin_block=True)
+
+    # benchmark on synthetic networks (--app benchmark)
+    my_parser.add_argument('--benchmark_sizes',
+                           metavar='benchmark_sizes',
+                           type=int,
+                           nargs='+',
+                           help='Amounts of subgraph deployments of the synthetic networks. Defaults to 100 1000 10000 50000.',
+                           default=None)
+    my_parser.add_argument('--benchmark_solvers',
+                           metavar='benchmark_solvers',
+                           type=str,
+                           nargs='+',
+                           help='Solver engines to benchmark. Defaults to all installed solver engines.',
+                           default=None)
+    my_parser.add_argument('--benchmark_baseline',
+                           metavar='benchmark_baseline',
+                           type=str,
+                           help='Path of the baseline benchmark report to check for regressions.',
+                           default="./benchmark_baseline.json")
+    my_parser.add_argument('--benchmark_save_baseline',
+                           help="Saves the benchmark report as new baseline",
+                           dest='benchmark_save_baseline',
+                           action='store_true')
+    my_parser.set_defaults(benchmark_save_baseline=False)
     return my_parser
 
 
 def getSubgraphIpfsHash(subgraph_id):
-    subgraph_ipfs_hash = base58.b58encode(
-        bytearray.fromhex('1220' + subgraph_id[2:])).decode("utf-8")
+    subgraph_ipfs_hash = getIpfsHash(subgraph_id)
     return subgraph_ipfs_hash
 
 
@@ -0,0 +1,86 @@
+import copy
+import hashlib
+import json
+import pandas as pd
+from src.config import loadConfig
+
+# price data that may drift between a run and the memoized run
+PRICE_DATA_KEYS = ['gas_price_gwei', 'ETH-USD', 'GRT-USD', 'GRT-ETH']
+
+
+def hashOptimizerInputs(df, df_log, network_data, indexer_total_stake, parameters, config=None):
+    """Hashes the normalized inputs of the optimization: the subgraphs of the model (signal, stake, current
+    allocation), the current allocations, the network data the rewards depend on, the indexer stake, the
+    parameters of the solve and the allocation constraints of the config.json. Price and gas data are not
+    part of the hash, their drift is checked with isPriceDriftMaterial.
+
+    Parameters
+    -------
+        df (pd.DataFrame): subgraphs for the optimization
+        df_log (pd.DataFrame): current allocations
+        network_data (dict): network data of the run
+        indexer_total_stake (float): total stake of the indexer
+        parameters (dict): parameters the solve depends on
+        config (dict): content of the config.json of the run, read if None
+
+    Returns
+    -------
+    str
+        sha256 hex digest of the inputs
+    """
+    if config is None:
+        config = loadConfig()
+
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(
+        df[['id', 'Allocation', 'signalledTokensTotal', 'stakedTokensTotal']], index=False).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(
+        df_log[['allocation_id', 'Address', 'Allocation']].astype(str), index=False).values.tobytes())
+    digest.update(json.dumps({'total_tokens_signalled': network_data['total_tokens_signalled'],
+                              'total_supply': network_data['total_supply'],
+                              'indexer_total_stake': indexer_total_stake,
+                              'parameters': parameters,
+                              'subgraph_caps': config.get('subgraph_caps', {}),
+                              'group_limits': config.get('group_limits', [])},
+                             sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def isPriceDriftMaterial(price_data, memoized_price_data, epsilon=0.05):
+    """Checks if the price or gas data drifted by more than the relative epsilon since the memoized run.
+
+    Returns
+    -------
+    bool
+        True if any price drifted by more than epsilon
+    """
+    for key in PRICE_DATA_KEYS:
+        current, memoized = price_data.get(key), memoized_price_data.get(key)
+        if current is None or memoized is None or memoized == 0:
+            if current != memoized:
+                return True
+        elif abs(current - memoized) / abs(memoized) > epsilon:
+            return True
+    return False
+
+
+def restoreOptimizedAllocations(memoized_run, subgraph_ids, parallel_allocations=1):
+    """Restores the optimizer data and the allocations for the allocation script from a memoized run.
+    The threshold data is removed, it is recalculated by calculateThreshold.
+
+    Returns
+    -------
+    dict, dict
+        optimizer data, FIXED_ALLOCATION (key: subgraph ipfs hash, value: allocation amount / parallel_allocations * 10 ** 18)
+    """
+    optimizer = copy.deepcopy(memoized_run['optimizer'])
+    for key in ['gas_costs_allocating_eth', 'gas_costs_parallel_allocation_new_close_eth',
+                'gas_costs_parallel_allocation_new_close_usd', 'gas_costs_parallel_allocation_new_close_grt',
+                'increase_rewards_percentage', 'increase_rewards_fiat', 'increase_rewards_grt', 'threshold_reached']:
+        optimizer.pop(key, None)
+
+    FIXED_ALLOCATION = {subgraph_id: 0 for subgraph_id in subgraph_ids}
+    for subgraph_id, allocation in optimizer['optimized_allocations'].items():
+        if isinstance(allocation, dict):
+            FIXED_ALLOCATION[subgraph_id] = allocation['allocation_amount'] / parallel_allocations * 10 ** 18
+    return optimizer, FIXED_ALLOCATION
@@ -0,0 +1,193 @@
+import numpy as np
+from src.solvers import rewardUpperBounds, UPPER_BOUND_TOLERANCE
+from src.config import loadConfig
+
+# inputs of the optimization model and the bound of its rewards. Only needs numpy and the solvers, not web3 or the
+# database clients of the optimizer, so the model can be built and checked without the network dependencies
+
+
+def getIndexingRewardIntervals(network_data):
+    """Calculates the allocated indexing rewards of the network per interval.
+
+    Returns
+    -------
+    dict
+        {'indexingRewardHour': ..., 'indexingRewardDay': ..., 'indexingRewardWeek': ..., 'indexingRewardYear': ...}
+    """
+    indexing_reward_year = 0.03 * network_data['total_supply']  # Calculate Allocated Indexing Reward Yearly
+    indexing_reward_day = indexing_reward_year / 365  # Daily
+    indexing_reward_week = indexing_reward_year / 52.1429  # Weekly
+    indexing_reward_hour = indexing_reward_year / 8760  # hourly
+
+    return {'indexingRewardHour': indexing_reward_hour,
+            'indexingRewardDay': indexing_reward_day,
+            'indexingRewardWeek': indexing_reward_week,
+            'indexingRewardYear': indexing_reward_year}
+
+
+def getAllocationLimits(subgraph_ids, indexer_total_stake, max_percentage=0.2, config=None):
+    """Get's the max allocation per subgraph (max_percentage of the stake or the subgraph cap of the config) and
+    the group limits of the config (the config.json if None).
+
+    Returns
+    -------
+    np.array, list
+        max allocation per subgraph, group limits as list of (subgraph indices, max allocation of the group)
+    """
+    # get per subgraph caps {ipfsHash: max GRT} and group limits [{"subgraphs": [ipfsHash, ...], "max_allocation": GRT}]
+    if config is None:
+        config = loadConfig()
+    subgraph_caps = config.get('subgraph_caps', {})
+    subgraph_index = {subgraph_id: index for index, subgraph_id in enumerate(subgraph_ids)}
+
+    # max allocation per subgraph is max_percentage of the stake or the configured cap
+    max_allocations = np.full(len(subgraph_ids), max_percentage * indexer_total_stake)
+    for subgraph, cap in subgraph_caps.items():
+        if subgraph in subgraph_index:
+            max_allocations[subgraph_index[subgraph]] = min(cap, max_allocations[subgraph_index[subgraph]])
+
+    group_limits = [([subgraph_index[subgraph] for subgraph in group['subgraphs'] if subgraph in subgraph_index],
+                     group['max_allocation']) for group in config.get('group_limits', [])]
+    return max_allocations, group_limits
+
+
+def createModelInput(df, network_data, indexer_total_stake, max_percentage=0.2, reserve_stake=0, config=None):
+    """Creates the input of the optimization model from the subgraphs in df, with the subgraph caps and group
+    limits of config (the config.json if None).
+
+    Returns
+    -------
+    dict
+        data (nested dictionary with the subgraph data, key is SubgraphName,Address,ID), reward_intervals,
+        sliced_stake, budget, max_allocations (per subgraph) and group_limits
+    """
+    # indexing rewards of the network per interval. The objectives of the intervals only differ by this scalar,
+    # so the optimization is solved once and the rewards are scaled to every interval
+    reward_intervals = getIndexingRewardIntervals(network_data)
+    total_tokens_signalled = network_data['total_tokens_signalled']
+
+    # Start of Optimization, create nested Dictionary from obtained data in one pass over the columns
+    columns = zip(df.index.get_level_values('Name_y'), df.index.get_level_values('Address'), df['id'].values,
+                  df['Allocation'].values, df['signalledTokensTotal'].values, df['stakedTokensTotal'].values)
+
+    # nested dictionary stored in data, key is SubgraphName,Address,ID
+    data = {(name, address, ipfs_hash): {
+        'Allocation': allocation,
+        'signalledTokensTotal': signalled_tokens,
+        'stakedTokensTotal': staked_tokens,
+        'SignalledNetwork': int(total_tokens_signalled) / 10 ** 18,
+        'indexingRewardYear': reward_intervals['indexingRewardYear'],
+        'indexingRewardWeek': reward_intervals['indexingRewardWeek'],
+        'indexingRewardDay': reward_intervals['indexingRewardDay'],
+        'indexingRewardHour': reward_intervals['indexingRewardHour'],
+        'id': ipfs_hash} for name, address, ipfs_hash, allocation, signalled_tokens, staked_tokens in columns}
+
+    """
+    Possibility to add random/test Subgraph Data
+    data['test_subgraph'] = {'Allocation': 2322000.0,
+                                             'signalledTokensTotal': 108735.55395641184,
+                                             'stakedTokensTotal': 2772706893.400638,
+                                             'SignalledNetwork': int(total_tokens_signalled) / 10 ** 18,
+                                             'indexingRewardYear': indexing_reward_year,
+                                             'indexingRewardWeek': indexing_reward_week,
+                                             'indexingRewardDay': indexing_reward_day,
+                                             'indexingRewardHour': indexing_reward_hour,
+
+    """
+    # set sliced stake (how many allocations there should be) -> grt per allocation max
+    sliced_stake = (indexer_total_stake - reserve_stake) * max_percentage
+
+    max_allocations, group_limits = getAllocationLimits([c[-1] for c in data.keys()], indexer_total_stake,
+                                                        max_percentage=max_percentage, config=config)
+
+    model_input = {}
+    model_input['data'] = data
+    model_input['reward_intervals'] = reward_intervals
+    model_input['sliced_stake'] = sliced_stake
+    model_input['budget'] = indexer_total_stake - reserve_stake
+    model_input['max_allocations'] = max_allocations
+    model_input['group_limits'] = group_limits
+    return model_input
+
+
+def calculateRewardUpperBound(df, network_data, indexer_total_stake, current_rewards, price_data,
+                              parallel_allocations=1, max_percentage=0.2, reserve_stake=0, min_allocation=0,
+                              solver='glpk', threshold=20, threshold_interval='daily', ignore_tx_costs=False,
+                              config=None):
+    """Calculates an upper bound of the rewards after the optimization minus the transaction costs, without building
+    or solving the model: the subgraphs with the highest reward per allocated GRT filled to their max allocation,
+    for the amount of allocations with the best rewards after transaction costs. If the increase of the bound is
+    below the threshold, the optimization can not reach the threshold.
+
+    Returns
+    -------
+    dict
+        bound of the rewards before and after transaction costs, amount of allocations and transaction costs of
+        the bound, increase in percent and if the threshold is reachable
+    """
+    reward_interval = 'indexingRewardWeek' if threshold_interval == 'weekly' else 'indexingRewardDay'
+    starting_value = current_rewards['indexing_reward_weekly' if threshold_interval == 'weekly'
+                                     else 'indexing_reward_daily']
+
+    # same objective as the model, see createModelInput and solveAllocations
+    budget = indexer_total_stake - reserve_stake
+    sliced_stake = budget * max_percentage
+    max_allocations, group_limits = getAllocationLimits(df['id'].values, indexer_total_stake,
+                                                        max_percentage=max_percentage, config=config)
+    max_allocations = np.clip(np.minimum(max_allocations, budget), 0, None)
+    signal_share = df['signalledTokensTotal'].values / (int(network_data['total_tokens_signalled']) / 10 ** 18)
+    stake = df['stakedTokensTotal'].values.astype(float)
+    # with group limits every solver engine solves the linear objective with linprog, see solveAllocations
+    if solver == 'exact' and not group_limits:
+        # x / (stake + x) is concave, its tangent x / stake bounds it from above
+        with np.errstate(divide='ignore', invalid='ignore'):
+            coefficients = np.where(stake > 0, signal_share / stake, np.inf)
+        max_rewards = signal_share * max_allocations / (stake + max_allocations)
+    else:
+        coefficients = signal_share / (stake + sliced_stake)
+        max_rewards = coefficients * max_allocations
+    max_rewards = np.nan_to_num(max_rewards)
+
+    interval_reward = getIndexingRewardIntervals(network_data)[reward_interval]
+    rewards = rewardUpperBounds(coefficients, max_rewards, budget, max_allocations) * interval_reward / 10 ** 18
+    rewards = rewards * (1 + UPPER_BOUND_TOLERANCE)
+
+    # transaction costs per allocation (close and new allocation)
+    gas_costs_eth = (price_data['gas_price_gwei'] * price_data['allocation_gas_usage']) / 1000000000
+    allocation_costs_grt = gas_costs_eth * parallel_allocations * 2 * (1 / price_data['GRT-ETH'])
+    if ignore_tx_costs:
+        allocation_costs_grt = 0
+
+    # with min allocations every subgraph is allocated, else the best amount of allocations (or none)
+    amount_allocations = np.arange(1, len(rewards) + 1)
+    final_values = rewards - amount_allocations * allocation_costs_grt
+    if min_allocation > 0 and len(rewards):
+        best = len(rewards) - 1
+    else:
+        best = int(np.argmax(final_values)) if len(rewards) else -1
+        if best >= 0 and final_values[best] < 0:
+            best = -1
+
+    upper_bound = {}
+    upper_bound['reward_interval'] = reward_interval
+    upper_bound['rewards'] = float(rewards[best]) if best >= 0 else 0.0
+    upper_bound['allocations'] = best + 1
+    upper_bound['gas_costs_grt'] = float((best + 1) * allocation_costs_grt)
+    upper_bound['final_value'] = float(final_values[best]) if best >= 0 else 0.0
+    upper_bound['increase_rewards_percentage'] = percentageIncrease(starting_value, upper_bound['final_value'])
+    upper_bound['threshold_reachable'] = bool(upper_bound['increase_rewards_percentage'] >= threshold)
+    return upper_bound
+
+
+def percentageIncrease(start_value, final_value):
+    """ Helper Function: Calculates the Percentage Increase between two values
+
+    returns
+    --------
+        int : percentage increase rounded to two decimals
+
+    """
+    if start_value == 0:
+        start_value = 1
+    increase = ((final_value - start_value) / start_value) * 100
+    return round(increase, 2)
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import numpy as np
+from dotenv import load_dotenv
+from eth_utils import function_signature_to_4byte_selector
+from src.async_client import asyncPostJsonRpc, getRewardsCallData, toBlockParameter, runAsync
+
+# eth-abi >= 4 renamed encode_abi / decode_abi
+try:
+    from eth_abi import encode as encode_abi, decode as decode_abi
+except ImportError:
+    from eth_abi import encode_abi, decode_abi
+
+# Multicall3, deployed at the same address on mainnet and most other chains
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+# aggregate3 executes the calls one by one and returns (success, return data) per call, a reverting call
+# does not revert the whole batch
+AGGREGATE3_SELECTOR = function_signature_to_4byte_selector('aggregate3((address,bool,bytes)[])')
+
+# calls per aggregate3 call, getRewards needs about 30k gas, so a chunk stays far below the gas cap of eth_call
+MULTICALL_CHUNK_SIZE = 500
+
+
+async def asyncMulticall(calls, block_identifier='latest', network='mainnet'):
+    """Executes calls in one eth_call of Multicall3.aggregate3.
+
+    Parameters
+    -------
+        calls (list): (target address, call data hex)
+        block_identifier (int, str): block number or tag
+        network (str): "mainnet" or "testnet"
+
+    Returns
+    -------
+    list
+        (success, return data bytes) per call
+    """
+    encoded = encode_abi(['(address,bool,bytes)[]'],
+                         [[(target, True, bytes.fromhex(data[2:])) for target, data in calls]])
+    call = {'to': MULTICALL3_ADDRESS, 'data': '0x' + (AGGREGATE3_SELECTOR + encoded).hex()}
+    result = await asyncPostJsonRpc('eth_call', [call, toBlockParameter(block_identifier)], network=network)
+    return decode_abi(['(bool,bytes)[]'], bytes.fromhex(result[2:]))[0]
+
+
+async def asyncGetRewardsArray(allocation_ids, block_identifier='latest', reward_manager=None,
+                               chunk_size=MULTICALL_CHUNK_SIZE):
+    """Get's the pending rewards of the allocations with Multicall3, the chunks are sent concurrently.
+
+    Parameters
+    -------
+        allocation_ids (list): allocation ids
+        block_identifier (int, str): block number or tag
+        reward_manager (str): address of the RewardsManager, defaults to REWARD_MANAGER of the .env
+        chunk_size (int): calls per aggregate3 call
+
+    Returns
+    -------
+    np.ndarray
+        pending rewards in GRT, aligned with allocation_ids. NaN for calls that reverted or returned no reward
+    """
+    load_dotenv()
+    reward_manager = reward_manager or os.getenv('REWARD_MANAGER')
+    calls = [(reward_manager, getRewardsCallData(allocation_id)) for allocation_id in allocation_ids]
+    chunks = await asyncio.gather(*[asyncMulticall(calls[start:start + chunk_size], block_identifier)
+                                    for start in range(0, len(calls), chunk_size)])
+    # a failed call is not a reward of 0, NaN keeps it apart from allocations that really earn nothing
+    rewards = np.full(len(calls), np.nan)
+    for index, (success, data) in enumerate(result for chunk in chunks for result in chunk):
+        if success and len(data) >= 32:
+            rewards[index] = int.from_bytes(data[:32], 'big') / 10 ** 18
+    return rewards
+
+
+def getRewardsArrays(allocation_ids, block_identifiers, reward_manager=None, chunk_size=MULTICALL_CHUNK_SIZE):
+    """Get's the pending rewards of the allocations at several blocks. All aggregate3 calls are sent concurrently,
+    so the rewards of up to chunk_size allocations per block take one round trip.
+
+    Parameters
+    -------
+        allocation_ids (list): allocation ids (e.g. df_log['allocation_id'])
+        block_identifiers (list): block numbers or tags
+        reward_manager (str): address of the RewardsManager, defaults to REWARD_MANAGER of the .env
+        chunk_size (int): calls per aggregate3 call
+
+    Returns
+    -------
+    list
+        per block a np.ndarray of the pending rewards in GRT, aligned with allocation_ids (NaN if the call failed)
+    """
+    allocation_ids = list(allocation_ids)
+
+    async def gatherBlocks():
+        return await asyncio.gather(*[asyncGetRewardsArray(allocation_ids, block_identifier, reward_manager,
+                                                           chunk_size=chunk_size)
+                                      for block_identifier in block_identifiers])
+
+    return list(runAsync(gatherBlocks()))
@@ -1,112 +1,74 @@
 from src.subgraph_health_checks import checkMetaSubgraphHealth, createBlacklist
 from src.queries import getFiatPrice, getDataAllocationOptimizer, getGasPrice, getCurrentBlock,getCurrentBlockTestnet
-from src.helpers import getSubgraphIpfsHash, percentageIncrease, initialize_rpc, REWARD_MANAGER, \
-    REWARD_MANAGER_ABI,initialize_rpc_testnet
+from src.helpers import percentageIncrease, REWARD_MANAGER
 from src.script_creation import createAllocationScript
 from src.alerting import alert_to_slack
-import os
+from src.solvers import solveAllocations
+from src.model_input import getIndexingRewardIntervals, createModelInput, calculateRewardUpperBound
+from src.deployment_registry import getIpfsHash, saveDeploymentRegistry
+from src.timings import timingSpan, printTimings
+from src.multicall import getRewardsArrays
+from src.query_cache import printQueryCacheStats
+from src.graphql_client import blockPin
+from src.block_headers import getBlockBefore
+from src.run_store import appendRun, findRunByInputHash
+from src.config import loadConfig
+from src.memoization import hashOptimizerInputs, isPriceDriftMaterial, restoreOptimizedAllocations
 from datetime import datetime
-import json
 import pandas as pd
-import base58
-import pyomo.environ as pyomo
 from eth_utils import to_checksum_address
 from src.automatic_allocation import setIndexingRules, setIndexingRuleQuery
 
 # createAllocationScript(indexer_id, fixed_allocations=, blacklist_parameter=, parallel_allocations=)
 
-def optimizeAllocations(indexer_id, blacklist_parameter=True, parallel_allocations=1, max_percentage=0.2, threshold=20,
-                        subgraph_list_parameter=False, threshold_interval='daily', reserve_stake=0, min_allocation=0,
-                        min_signalled_grt_subgraph=100, min_allocated_grt_subgraph=100, app="script",
-                        slack_alerting=False, network='mainnet',automation=False, ignore_tx_costs=False):
-    """ Runs the main optimization process.
-
-    parameters
-    --------
-        ...
-        ...
-
-    returns
-    --------
-        ...
-    """
-    # Load .env File with Configuration
-
-    # datetime object containing current date and time
-    current_datetime = datetime.now()
-    current_datetime = current_datetime.strftime("%Y-%m-%d-%H:%M")
 
-    # create dict with necessary data for current run
-    optimizer_results = {current_datetime: {}}
-    optimizer_results[current_datetime]['datetime'] = current_datetime
+def getPriceData(timings=None):
+    """Get's the price data (ETH-USD, GRT-USD, GRT-ETH) and the gas price and usage for
+    allocation closing / allocating. The fetching is recorded in the "prices" and "gas" spans of timings.
 
-    ## save parameter configuration for current run
-    optimizer_results[current_datetime]['parameters'] = {}
-    optimizer_results[current_datetime]['parameters']['indexer_id'] = to_checksum_address(indexer_id)
-    optimizer_results[current_datetime]['parameters']['blacklist'] = blacklist_parameter
-    optimizer_results[current_datetime]['parameters']['parallel_allocations'] = parallel_allocations
-    optimizer_results[current_datetime]['parameters']['max_percentage'] = max_percentage
-    optimizer_results[current_datetime]['parameters']['threshold'] = threshold
-    optimizer_results[current_datetime]['parameters']['subgraph_list_parameter'] = subgraph_list_parameter
-    optimizer_results[current_datetime]['parameters']['threshold_interval'] = threshold_interval
-    optimizer_results[current_datetime]['parameters']['reserve_stake'] = reserve_stake
-    optimizer_results[current_datetime]['parameters']['min_allocation'] = min_allocation
-    optimizer_results[current_datetime]['parameters']['min_signalled_grt_subgraph'] = min_signalled_grt_subgraph
-    optimizer_results[current_datetime]['parameters']['min_allocated_grt_subgraph'] = min_allocated_grt_subgraph
-    optimizer_results[current_datetime]['parameters']['app'] = app
-    optimizer_results[current_datetime]['parameters']['slack_alerting'] = slack_alerting
-    optimizer_results[current_datetime]['parameters']['network'] = network
-    optimizer_results[current_datetime]['parameters']['automation'] = automation
-    optimizer_results[current_datetime]['parameters']['ignore_tx_costs'] = ignore_tx_costs
-    print("Script Execution on: ", current_datetime)
-    """
-    # check for metaSubgraphHealth
-    if not checkMetaSubgraphHealth():
-        print('ATTENTION: MAINNET SUBGRAPH IS DOWN, INDEXER AGENT WONT WORK CORRECTLY')
-        if app == 'web':
-            #st.warning("Attention: Mainnet Subgraph is down! Indexer Agent won't work correctly")
-            pass
-        else:
-            input("Press Enter to continue...")
+    Returns
+    -------
+    dict
+        price data for the optimization run
     """
-
-    # update blacklist / create blacklist if desired
-    if network == 'mainnet':
-        if blacklist_parameter:
-            createBlacklist(network = 'mainnet')
-    if network == 'testnet':
-        if blacklist_parameter:
-            createBlacklist(network = 'mainnet')
     # get price data
     # We need ETH-USD, GRT-USD, GRT-ETH
-    try:
-        eth_usd = getFiatPrice('ETH-USD')
-    except:
-        eth_usd = None
-    try:
-        grt_usd = getFiatPrice('GRT-USD')
-    except:
-        grt_usd = None
-    try:
-        grt_eth = getFiatPrice('GRT-ETH')
-    except:
-        grt_eth = None
+    with timingSpan(timings, 'prices'):
+        try:
+            eth_usd = getFiatPrice('ETH-USD')
+        except:
+            eth_usd = None
+        try:
+            grt_usd = getFiatPrice('GRT-USD')
+        except:
+            grt_usd = None
+        try:
+            grt_eth = getFiatPrice('GRT-ETH')
+        except:
+            grt_eth = None
     # Get Gas Price and usage for Allocation Closing / Allocating
     allocation_gas_usage = 270000
-    gas_price_gwei = getGasPrice(speed='fast')
-
-    # save price data for current run
-    optimizer_results[current_datetime]['price_data'] = {}
-    optimizer_results[current_datetime]['price_data']['gas_price_gwei'] = gas_price_gwei
-    optimizer_results[current_datetime]['price_data']['allocation_gas_usage'] = allocation_gas_usage
-    optimizer_results[current_datetime]['price_data']['ETH-USD'] = eth_usd
-    optimizer_results[current_datetime]['price_data']['GRT-USD'] = grt_usd
-    optimizer_results[current_datetime]['price_data']['GRT-ETH'] = grt_eth
-
-    # get all relevant data from mainnet subgraph
-    data = getDataAllocationOptimizer(indexer_id=indexer_id, network=network)
-
-    # Grab global Network Data
+    with timingSpan(timings, 'gas'):
+        gas_price_gwei = getGasPrice(speed='fast')
+
+    price_data = {}
+    price_data['gas_price_gwei'] = gas_price_gwei
+    price_data['allocation_gas_usage'] = allocation_gas_usage
+    price_data['ETH-USD'] = eth_usd
+    price_data['GRT-USD'] = grt_usd
+    price_data['GRT-ETH'] = grt_eth
+    return price_data
+
+
+def getNetworkData(data):
+    """Grabs the global network data from the result of getDataAllocationOptimizer
+
+    Returns
+    -------
+    dict
+        total indexing rewards, total tokens signalled, total supply, total tokens allocated, grt issuance
+        and yearly inflation
+    """
     network_data = data['graphNetworks']
     total_indexing_rewards = int(network_data[0].get('totalIndexingRewards')) / 10 ** 18
     total_tokens_signalled = int(network_data[0].get('totalTokensSignalled')) / 10 ** 18
@@ -118,16 +80,24 @@ def optimizeAllocations(indexer_id, blacklist_parameter=True, parallel_allocatio
     yearly_inflation = (grt_issuance * 10 ** -18)
     yearly_inflation_percentage = yearly_inflation ** (365 * 24 * 60 * 60 / 13)
 
-    # save network data for current run
-    optimizer_results[current_datetime]['network_data'] = {}
-    optimizer_results[current_datetime]['network_data']["total_indexing_rewards"] = total_indexing_rewards
-    optimizer_results[current_datetime]['network_data']["total_tokens_signalled"] = total_tokens_signalled
-    optimizer_results[current_datetime]['network_data']["total_supply"] = total_supply
-    optimizer_results[current_datetime]['network_data']["total_tokens_allocated"] = total_tokens_allocated
-    optimizer_results[current_datetime]['network_data']["grt_issuance"] = grt_issuance
-    optimizer_results[current_datetime]['network_data']["yearly_inflation_percentage"] = yearly_inflation_percentage
-
-    # get indexer statistics (Total Stake, Total Allocated Tokens ...)
+    network = {}
+    network["total_indexing_rewards"] = total_indexing_rewards
+    network["total_tokens_signalled"] = total_tokens_signalled
+    network["total_supply"] = total_supply
+    network["total_tokens_allocated"] = total_tokens_allocated
+    network["grt_issuance"] = grt_issuance
+    network["yearly_inflation_percentage"] = yearly_inflation_percentage
+    return network
+
+
+def getIndexerData(data, network='mainnet'):
+    """Grabs the indexer data from the result of getDataAllocationOptimizer
+
+    Returns
+    -------
+    dict, dict
+        raw indexer data with allocations, indexer statistics (Total Stake, Total Allocated Tokens)
+    """
     if network == 'mainnet':
         indexer_data = data['indexer']
     else:
@@ -136,70 +106,93 @@ def optimizeAllocations(indexer_id, blacklist_parameter=True, parallel_allocatio
 
     indexer_total_allocated_tokens = int(indexer_data.get('allocatedTokens')) * 10 ** -18
 
-    # save indexer global data
-    optimizer_results[current_datetime]['indexer'] = {}
-    optimizer_results[current_datetime]['indexer']["indexer_total_stake"] = indexer_total_stake
-    optimizer_results[current_datetime]['indexer']["indexer_total_allocated_tokens"] = indexer_total_allocated_tokens
+    indexer = {}
+    indexer["indexer_total_stake"] = indexer_total_stake
+    indexer["indexer_total_allocated_tokens"] = indexer_total_allocated_tokens
+    return indexer_data, indexer
 
-    # get all allocations for indexer
-    allocation_list = []
-
-    # check if indexer has allocations
-    if indexer_data.get('allocations'):
-        for allocation in indexer_data.get('allocations'):
-
-            # check if subgraph name is available, else set it to subgraph+index+ipfshash
-            if allocation.get('subgraphDeployment').get('originalName') is None:
-                name = f"Subgraph{indexer_data.get('allocations').index(allocation)}-{getSubgraphIpfsHash(allocation.get('subgraphDeployment').get('id'))}"
-            else:
-                name = allocation.get('subgraphDeployment').get('originalName')
-            # append list of allocation with Id, Name, Allocated Tokens and Rewards to allocation_list
-            sublist = [allocation.get('subgraphDeployment').get('id'),
-                       name,
-                       allocation.get('allocatedTokens'),
-                       allocation.get('indexingRewards'),
-                       allocation.get('id')]
-            allocation_list.append(sublist)
-
-            # create df from allocations
-            df = pd.DataFrame(allocation_list,
-                              columns=['Address', 'Name', 'Allocation', 'IndexingReward', 'allocation_id'])
-            df['Allocation'] = df['Allocation'].astype(float) / 10 ** 18
-            df['IndexingReward'] = df['IndexingReward'].astype(float) / 10 ** 18
-
-            # aggregate possible parallel allocations
-            """
-            df = df.groupby(by=[df.Address, df.Name]).agg({
-                'Allocation': 'sum',
-                'IndexingReward': 'sum'
-            }).reset_index()
-            """
+
+def weiToGrt(values):
+    """Converts a column of token amounts in wei (GraphQL BigInt strings) to GRT."""
+    return pd.Series(values, dtype=object).astype(float).values / 10 ** 18
+
+
+def subgraphNames(names, ipfs_hashes, prefix):
+    """Fills missing subgraph names with prefix + position + ipfs hash."""
+    return [name if name is not None else f"{prefix}{index}-{ipfs_hash}"
+            for index, (name, ipfs_hash) in enumerate(zip(names, ipfs_hashes))]
+
+
+def createAllocationDataFrame(allocations):
+    """Creates the DataFrame of the allocations of the indexer in one pass over the GraphQL result.
+
+    Returns
+    -------
+    pd.DataFrame
+        Address, Name, Allocation, IndexingReward (in GRT), allocation_id per allocation
+    """
     # If no Allocation available, create empty DataFrame with Columns
-    else:
-        df = pd.DataFrame(columns=['Address', 'Name', 'Allocation', 'IndexingReward', 'allocation_id'])
+    if not allocations:
+        return pd.DataFrame(columns=['Address', 'Name', 'Allocation', 'IndexingReward', 'allocation_id'])
+
+    addresses = [allocation['subgraphDeployment']['id'] for allocation in allocations]
+    names = [allocation['subgraphDeployment'].get('originalName') for allocation in allocations]
+    # check if subgraph name is available, else set it to subgraph+index+ipfshash
+    ipfs_hashes = [getIpfsHash(address) if name is None else None for address, name in zip(addresses, names)]
+
+    df = pd.DataFrame({'Address': addresses,
+                       'Name': subgraphNames(names, ipfs_hashes, prefix='Subgraph'),
+                       'Allocation': weiToGrt([allocation.get('allocatedTokens') for allocation in allocations]),
+                       'IndexingReward': weiToGrt([allocation.get('indexingRewards') for allocation in allocations]),
+                       'allocation_id': [allocation.get('id') for allocation in allocations]})
+
+    # aggregate possible parallel allocations
+    """
+    df = df.groupby(by=[df.Address, df.Name]).agg({
+        'Allocation': 'sum',
+        'IndexingReward': 'sum'
+    }).reset_index()
+    """
+    return df
+
+
+def createSubgraphDataFrame(subgraph_data):
+    """Creates the DataFrame of all subgraph deployments in one pass over the GraphQL result.
+
+    Returns
+    -------
+    pd.DataFrame
+        Address, Name, signalledTokensTotal, stakedTokensTotal (in GRT), id (ipfs hash) per subgraph deployment
+    """
+    addresses = [subgraph['id'] for subgraph in subgraph_data]
+    names = [subgraph.get('originalName') for subgraph in subgraph_data]
+    ipfs_hashes = [getIpfsHash(address, name=name) for address, name in zip(addresses, names)]
+
+    return pd.DataFrame({'Address': addresses,
+                         'Name': subgraphNames(names, ipfs_hashes, prefix='Subgraph '),
+                         'signalledTokensTotal': weiToGrt([subgraph.get('signalledTokens') for subgraph in subgraph_data]),
+                         'stakedTokensTotal': weiToGrt([subgraph.get('stakedTokens') for subgraph in subgraph_data]),
+                         'id': ipfs_hashes},
+                        columns=['Address', 'Name', 'signalledTokensTotal', 'stakedTokensTotal', 'id'])
+
+
+def createAllocationDataFrames(data, indexer_data, network_data, subgraph_list_parameter=False,
+                               blacklist_parameter=True, min_signalled_grt_subgraph=100,
+                               min_allocated_grt_subgraph=100, config=None):
+    """Creates the DataFrames of the current allocations (df_log) and of the subgraphs that should be
+    considered in the optimization (df). The blacklist and the indexed subgraphs are taken from config (the
+    config.json if None).
+
+    Returns
+    -------
+    pd.DataFrame, pd.DataFrame
+        df (subgraphs for the optimization), df_log (current allocations with their rewards)
+    """
+    # get all allocations for indexer
+    df = createAllocationDataFrame(indexer_data.get('allocations'))
 
     # Now Grab all subgraphs with "Name","ID","IPFS-Hash", "stakedTokens" and "SignalledTokens"
-    subgraph_data = data['subgraphDeployments']
-    subgraph_list = []
-
-    # iterate through Subgraphs and append all relevant data to a sublist.
-    for subgraph in subgraph_data:
-        subgraph_name = subgraph.get('originalName')
-        if subgraph_name is None:
-            subgraph_name = f"Subgraph {subgraph_data.index(subgraph)}-{getSubgraphIpfsHash(subgraph.get('id'))}"
-        sublist = []
-        sublist = [subgraph.get('id'), subgraph_name, subgraph.get('signalledTokens'),
-                   subgraph.get('stakedTokens'),
-                   base58.b58encode(bytearray.fromhex('1220' + subgraph.get('id')[2:])).decode("utf-8")]
-        subgraph_list.append(sublist)
-
-    # create DataFrame from Subgraph
-    df_subgraphs = pd.DataFrame(subgraph_list,
-                                columns=['Address', 'Name', 'signalledTokensTotal', 'stakedTokensTotal', 'id'])
-
-    # get GRT Values with correct Decimals
-    df_subgraphs['signalledTokensTotal'] = df_subgraphs['signalledTokensTotal'].astype(float) / 10 ** 18
-    df_subgraphs['stakedTokensTotal'] = df_subgraphs['stakedTokensTotal'].astype(float) / 10 ** 18
+    df_subgraphs = createSubgraphDataFrame(data['subgraphDeployments'])
 
     # Merge Allocation Indexer Data with Subgraph Data by Address for Json-Log (Only keep Subgraphs with active allocation)
     df_log = pd.merge(df, df_subgraphs, how='left', on='Address').set_index('id')
@@ -212,16 +205,17 @@ def optimizeAllocations(indexer_id, blacklist_parameter=True, parallel_allocatio
     df = pd.merge(df, df_subgraphs, how='right', on='Address').set_index(['Name_y', 'Address'])
     df.fillna(0, inplace=True)
 
+    if (subgraph_list_parameter or blacklist_parameter) and config is None:
+        config = loadConfig()
+
     # Check if Subgraph List Parameter ist Supplied. Only optimize on selected Subgraphs if Parameter provided
     if subgraph_list_parameter:
-        with open("../config.json", "r") as jsonfile:
-            list_desired_subgraphs = json.load(jsonfile).get('indexed_subgraphs')
+        list_desired_subgraphs = config.get('indexed_subgraphs')
         df = df[df['id'].isin(list_desired_subgraphs)]
 
     # Check if Blacklist Parameter is Supplied. Only optimize on non blacklisted Subgraphs if Parameter Provided
     if blacklist_parameter:
-        with open("../config.json", "r") as jsonfile:
-            blacklisted_subgraphs = json.load(jsonfile).get('blacklist')
+        blacklisted_subgraphs = config.get('blacklist')
         df = df[-df['id'].isin(blacklisted_subgraphs)]
 
     # Check for min_signalled_grt_subgraph and min_allocated_grt_subgraph
@@ -235,51 +229,380 @@ def optimizeAllocations(indexer_id, blacklist_parameter=True, parallel_allocatio
     # Formula for all indexing rewards
     # indexing_reward = sun(((allocations / 10 ** 18) / (int(subgraph_total_stake) / 10 ** 18)) * (
     #            int(subgraph_total_signals) / int(total_tokens_signalled)) * int(total_indexing_rewards))
-
-    indexing_reward_year = 0.03 * total_supply  # Calculate Allocated Indexing Reward Yearly
-    indexing_reward_day = indexing_reward_year / 365  # Daily
-    indexing_reward_week = indexing_reward_year / 52.1429  # Weekly
-    indexing_reward_hour = indexing_reward_year / 8760  # hourly
+    reward_intervals = getIndexingRewardIntervals(network_data)
+    total_tokens_signalled = network_data['total_tokens_signalled']
 
     # Calculate Indexing Reward per Subgraph hourly / daily / weekly / yearly For Json Log
 
     df_log['indexing_reward_hourly'] = (df_log['Allocation'] / df_log['stakedTokensTotal']) * \
                                        (df_log['signalledTokensTotal'] / total_tokens_signalled) * (
-                                           int(indexing_reward_hour))
+                                           int(reward_intervals['indexingRewardHour']))
     df_log['indexing_reward_daily'] = (df_log['Allocation'] / df_log['stakedTokensTotal']) * \
                                       (df_log['signalledTokensTotal'] / total_tokens_signalled) * (
-                                          int(indexing_reward_day))
+                                          int(reward_intervals['indexingRewardDay']))
     df_log['indexing_reward_weekly'] = (df_log['Allocation'] / df_log['stakedTokensTotal']) * \
                                        (df_log['signalledTokensTotal'] / total_tokens_signalled) * (
-                                           int(indexing_reward_week))
+                                           int(reward_intervals['indexingRewardWeek']))
     df_log['indexing_reward_yearly'] = (df_log['Allocation'] / df_log['stakedTokensTotal']) * \
                                        (df_log['signalledTokensTotal'] / total_tokens_signalled) * (
-                                           int(indexing_reward_year))
+                                           int(reward_intervals['indexingRewardYear']))
+    return df, df_log
 
-    # get pending rewards of current allocations
-    if network == 'mainnet':
-        web3 = initialize_rpc()
 
-        abi = json.loads(REWARD_MANAGER_ABI)
-        contract = web3.eth.contract(address=REWARD_MANAGER, abi=abi)
-        pending_rewards = [contract.functions.getRewards(to_checksum_address(str(x))).call() / 10 ** 18 for x in
-                           df_log['allocation_id']]
-        df_log['pending_rewards'] = pending_rewards
-        # check if pending rewards were the same 270 blocks  before - if same, close allocation because it is most likely broken
+def processOptimizedAllocations(model_input, allocations, rewards, max_percentage=0.2, parallel_allocations=1):
+    """Creates the optimizer data and the allocations for the allocation script from the solution of the model.
+
+    Returns
+    -------
+    dict, dict
+        optimizer data (grt per allocation, optimized allocations and rewards per interval),
+        FIXED_ALLOCATION (key: subgraph ipfs hash, value: allocation amount / parallel_allocations * 10 ** 18)
+    """
+    data = model_input['data']
+    sliced_stake = model_input['sliced_stake']
+
+    optimizer = {}
+    optimizer['grt_per_allocation'] = sliced_stake
+    optimizer['allocations_total'] = 1 / max_percentage
+    optimizer['stake_to_allocate'] = model_input['budget']
+
+    # create  dictionary for optimizer run
+    optimizer['optimized_allocations'] = {}
+
+    # list of optimized allocations, formated as key(id): allocation_amount / parallel_allocations * 10** 18
+    # passed to createAllocationScript
+    FIXED_ALLOCATION = dict()
+
+    # iterate through results and print subgraph/ipfsHash/id and Allocation Amount
+    for c in data.keys():
+        # if allocation higher than 0, print subgraph with allocation amount
+        if allocations[c] > 0:
+            print('  ', c, ':', allocations[c], 'allocations, Signal/Allocation Ratio: ',
+                  str(data[c]['signalledTokensTotal'] / (data[c]['stakedTokensTotal'] + sliced_stake)))
+            optimizer['optimized_allocations'][c[-1]] = {}
+            optimizer['optimized_allocations'][c[-1]]['allocation_amount'] = allocations[c]
+            optimizer['optimized_allocations'][c[-1]]['name'] = c[0]
+            optimizer['optimized_allocations'][c[-1]]['address'] = c[1]
+            optimizer['optimized_allocations'][c[-1]]['signal_stake_ratio'] = data[c]['signalledTokensTotal'] / (
+                    data[c]['stakedTokensTotal'] + sliced_stake)
+
+        FIXED_ALLOCATION[data[c]['id']] = allocations[c] / parallel_allocations * 10 ** 18
+
+    # Add optimized Rewards Hourly/Daily/Weekly/Yearly
+    for reward_interval in model_input['reward_intervals']:
+        optimizer['optimized_allocations'][reward_interval] = rewards[reward_interval] / 10 ** 18
+        # print total Allocation GRT and Rewards per Interval
+        print()
+        print('  ', 'Optimizer for Interval = ', reward_interval)
+        print('  ', 'Allocations Total = ', sum(allocations.values()), 'GRT')
+        print('  ', 'Reward = GRT', rewards[reward_interval] / 10 ** 18)
+
+    return optimizer, FIXED_ALLOCATION
+
+
+def calculateOptimizedAllocations(df, network_data, indexer_total_stake, parallel_allocations=1, max_percentage=0.2,
+                                  reserve_stake=0, min_allocation=0, solver='glpk', solver_time_limit=None,
+                                  solver_mip_gap=None, timings=None, config=None):
+    """Runs the optimization of the allocations on the subgraphs in df. The model build and the solve are
+    recorded in the "model_build" and "solve" spans of timings.
+
+    Returns
+    -------
+    dict, dict
+        optimizer data (grt per allocation, optimized allocations and rewards per interval),
+        FIXED_ALLOCATION (key: subgraph ipfs hash, value: allocation amount / parallel_allocations * 10 ** 18)
+    """
+    # Start Optimization with Pyomo
+    print("\n")
+    print('Optimize Allocations:')
+    print(70 * "=")
+
+    with timingSpan(timings, 'model_build'):
+        model_input = createModelInput(df, network_data, indexer_total_stake, max_percentage=max_percentage,
+                                       reserve_stake=reserve_stake, config=config)
+
+    print('\nOptimize Allocations for Intervals: {} and Max Percentage of Stake per Allocation: {}\n'.format(
+        list(model_input['reward_intervals'].keys()),
+        max_percentage))
+    print(70 * "=")
+
+    # solve the model with the selected solver engine
+    with timingSpan(timings, 'solve'):
+        allocations, rewards = solveAllocations(model_input['data'], model_input['reward_intervals'],
+                                                sliced_stake=model_input['sliced_stake'],
+                                                budget=model_input['budget'], lower=min_allocation,
+                                                upper=model_input['max_allocations'], solver=solver,
+                                                time_limit=solver_time_limit, mip_gap=solver_mip_gap,
+                                                group_limits=model_input['group_limits'])
+
+    return processOptimizedAllocations(model_input, allocations, rewards, max_percentage=max_percentage,
+                                       parallel_allocations=parallel_allocations)
+
+
+def createSkippedOptimization(upper_bound, current_rewards, price_data, indexer_total_stake, max_percentage=0.2,
+                              reserve_stake=0):
+    """Creates the optimizer data of a run that skipped the optimization because the threshold is not reachable.
+    The current allocations are kept, the increase in rewards is the increase of the upper bound.
+
+    Returns
+    -------
+    dict, dict
+        optimizer data, empty FIXED_ALLOCATION
+    """
+    optimizer = {}
+    optimizer['grt_per_allocation'] = (indexer_total_stake - reserve_stake) * max_percentage
+    optimizer['allocations_total'] = 1 / max_percentage
+    optimizer['stake_to_allocate'] = indexer_total_stake - reserve_stake
+
+    # rewards stay the current rewards
+    optimizer['optimized_allocations'] = {
+        'indexingRewardHour': current_rewards['indexing_reward_hourly'],
+        'indexingRewardDay': current_rewards['indexing_reward_daily'],
+        'indexingRewardWeek': current_rewards['indexing_reward_weekly'],
+        'indexingRewardYear': current_rewards['indexing_reward_yearly']}
+
+    starting_value = current_rewards['indexing_reward_weekly' if upper_bound['reward_interval'] == 'indexingRewardWeek'
+                                     else 'indexing_reward_daily']
+    gas_costs_eth = (price_data['gas_price_gwei'] * price_data['allocation_gas_usage']) / 1000000000
+    optimizer['gas_costs_allocating_eth'] = gas_costs_eth
+    optimizer['gas_costs_parallel_allocation_new_close_grt'] = upper_bound['gas_costs_grt']
+    optimizer['gas_costs_parallel_allocation_new_close_eth'] = upper_bound['gas_costs_grt'] * price_data['GRT-ETH']
+    optimizer['gas_costs_parallel_allocation_new_close_usd'] = \
+        optimizer['gas_costs_parallel_allocation_new_close_eth'] * price_data['ETH-USD']
+    optimizer['increase_rewards_percentage'] = upper_bound['increase_rewards_percentage']
+    optimizer['increase_rewards_fiat'] = round(((upper_bound['final_value'] - starting_value) * price_data['GRT-USD']), 2)
+    optimizer['increase_rewards_grt'] = round((upper_bound['final_value'] - starting_value), 2)
+    optimizer['threshold_reached'] = False
+    optimizer['skipped'] = 'upper_bound'
+    return optimizer, {}
+
+
+def calculateThreshold(optimizer,current_rewards, price_data, fixed_allocations, parallel_allocations=1,
+                       threshold=20, threshold_interval='daily', ignore_tx_costs=False):
+    """Calculates the transaction costs of the reallocation and the increase in rewards after the optimization,
+    and checks if the threshold is reached. The results are added to the optimizer data.
+
+    Returns
+    -------
+    float, float
+        rewards before the optimization, rewards after the optimization (minus transaction costs)
+    """
+    # NOW STARTS THE THRESHOLD CALCULATION
+    # set interval and calculate threshold based on daily, or weekly rewards
+    if threshold_interval == 'weekly':
+        # Threshold Calculation
+
+        starting_value = current_rewards['indexing_reward_weekly']  # rewards per week before optimization
+        final_value = optimizer['optimized_allocations']['indexingRewardWeek']  # after optimization
+    else:
+        starting_value = current_rewards['indexing_reward_daily']  # rewards per week before optimization
+        final_value = optimizer['optimized_allocations']['indexingRewardDay']  # after optimization
+
+    # Amount of Allocations
+    amount_allocations = [allocation for allocation in fixed_allocations.values() if allocation > 0]
+    # costs for transactions  = (close_allocation and new_allocation) * parallel_allocations
+    gas_costs_eth = (price_data['gas_price_gwei'] * price_data['allocation_gas_usage']) / 1000000000
+    allocation_costs_eth = len(amount_allocations) * (
+            gas_costs_eth * parallel_allocations * 2)  # multiply by 2 for close/new-allocation
+    allocation_costs_fiat = price_data['ETH-USD'] * allocation_costs_eth
+    allocation_costs_grt = allocation_costs_eth * (1 / price_data['GRT-ETH'])
+
+    optimizer['gas_costs_allocating_eth'] = gas_costs_eth
+    optimizer['gas_costs_parallel_allocation_new_close_eth'] = allocation_costs_eth
+    optimizer['gas_costs_parallel_allocation_new_close_usd'] = allocation_costs_fiat
+    optimizer['gas_costs_parallel_allocation_new_close_grt'] = allocation_costs_grt
+
+    # calculate difference in rewards currently vs optimized
+    if ignore_tx_costs == False:
+        final_value = final_value - allocation_costs_grt
+    if ignore_tx_costs == True:
+        final_value = final_value
+    diff_rewards = percentageIncrease(starting_value, final_value)  # Percentage increase in Rewards
+    diff_rewards_fiat = round(((final_value - starting_value) * price_data['GRT-USD']), 2)  # Fiat increase in Rewards
+    diff_rewards_grt = round((final_value - starting_value), 2)
+
+    optimizer['increase_rewards_percentage'] = diff_rewards
+    optimizer['increase_rewards_fiat'] = diff_rewards_fiat
+    optimizer['increase_rewards_grt'] = diff_rewards_grt
+
+    # is the threshold reached?
+    optimizer['threshold_reached'] = bool(diff_rewards >= threshold)
+    return starting_value, final_value
+
+
+def optimizeAllocations(indexer_id, blacklist_parameter=True, parallel_allocations=1, max_percentage=0.2, threshold=20,
+                        subgraph_list_parameter=False, threshold_interval='daily', reserve_stake=0, min_allocation=0,
+                        min_signalled_grt_subgraph=100, min_allocated_grt_subgraph=100, app="script",
+                        slack_alerting=False, network='mainnet',automation=False, ignore_tx_costs=False,
+                        solver='glpk', solver_time_limit=None, solver_mip_gap=None, snapshot=None, memoization=True,
+                        memoization_epsilon=0.05, upper_bound_check=True, data=None, price_data=None,
+                        script_directory=".", pin_block=True, save_registry=True):
+    """ Runs the main optimization process.
+
+    parameters
+    --------
+        ...
+        snapshot : snapshot of the network inputs (src.snapshot.createSnapshot / loadSnapshot). If supplied,
+                   the optimization runs offline on the snapshot without fetching network data
+        memoization : reuse the optimized allocations of the latest run with the same inputs
+        memoization_epsilon : max relative drift of price and gas data to reuse the threshold decision of the
+                              memoized run, else the threshold is recalculated with the current price data
+        upper_bound_check : skip the model build and solve if the upper bound of the rewards after transaction
+                            costs can not reach the threshold
+        data : result of getDataAllocationOptimizer fetched by the caller (e.g. src.batch). The blacklist is
+               not updated, the caller updates it once for all runs
+        price_data : result of getPriceData fetched by the caller
+        script_directory : directory of the script.txt and script_never.txt
+        pin_block : pin all queries of the run to the latest block indexed by the gateway and send the contract
+                    calls at the same block, so all inputs describe the same chain state
+        save_registry : persist the deployments interned in the run. Disabled by the worker processes of src.batch,
+                        the parent process saves the deployments of all runs once
+        ...
+
+    returns
+    --------
+        ...
+    """
+    # Load .env File with Configuration
+
+    # datetime object containing current date and time
+    current_datetime = datetime.now()
+    current_datetime = current_datetime.strftime("%Y-%m-%d-%H:%M")
+
+    # timing spans of the phases of the run
+    timings = {}
+
+    # the network of an offline run is the network of the snapshot
+    if snapshot:
+        network = snapshot['network']
+
+    # create dict with necessary data for current run
+    optimizer_results = {current_datetime: {}}
+    optimizer_results[current_datetime]['datetime'] = current_datetime
+
+    ## save parameter configuration for current run
+    optimizer_results[current_datetime]['parameters'] = {}
+    optimizer_results[current_datetime]['parameters']['indexer_id'] = to_checksum_address(indexer_id)
+    optimizer_results[current_datetime]['parameters']['blacklist'] = blacklist_parameter
+    optimizer_results[current_datetime]['parameters']['parallel_allocations'] = parallel_allocations
+    optimizer_results[current_datetime]['parameters']['max_percentage'] = max_percentage
+    optimizer_results[current_datetime]['parameters']['threshold'] = threshold
+    optimizer_results[current_datetime]['parameters']['subgraph_list_parameter'] = subgraph_list_parameter
+    optimizer_results[current_datetime]['parameters']['threshold_interval'] = threshold_interval
+    optimizer_results[current_datetime]['parameters']['reserve_stake'] = reserve_stake
+    optimizer_results[current_datetime]['parameters']['min_allocation'] = min_allocation
+    optimizer_results[current_datetime]['parameters']['min_signalled_grt_subgraph'] = min_signalled_grt_subgraph
+    optimizer_results[current_datetime]['parameters']['min_allocated_grt_subgraph'] = min_allocated_grt_subgraph
+    optimizer_results[current_datetime]['parameters']['app'] = app
+    optimizer_results[current_datetime]['parameters']['slack_alerting'] = slack_alerting
+    optimizer_results[current_datetime]['parameters']['network'] = network
+    optimizer_results[current_datetime]['parameters']['automation'] = automation
+    optimizer_results[current_datetime]['parameters']['ignore_tx_costs'] = ignore_tx_costs
+    optimizer_results[current_datetime]['parameters']['solver'] = solver
+    optimizer_results[current_datetime]['parameters']['solver_time_limit'] = solver_time_limit
+    optimizer_results[current_datetime]['parameters']['solver_mip_gap'] = solver_mip_gap
+    optimizer_results[current_datetime]['parameters']['snapshot_block'] = snapshot['block'] if snapshot else None
+    optimizer_results[current_datetime]['parameters']['memoization'] = memoization
+    optimizer_results[current_datetime]['parameters']['memoization_epsilon'] = memoization_epsilon
+    optimizer_results[current_datetime]['parameters']['upper_bound_check'] = upper_bound_check
+    optimizer_results[current_datetime]['parameters']['pin_block'] = pin_block
+    print("Script Execution on: ", current_datetime)
+    """
+    # check for metaSubgraphHealth
+    if not checkMetaSubgraphHealth():
+        print('ATTENTION: MAINNET SUBGRAPH IS DOWN, INDEXER AGENT WONT WORK CORRECTLY')
+        if app == 'web':
+            #st.warning("Attention: Mainnet Subgraph is down! Indexer Agent won't work correctly")
+            pass
+        else:
+            input("Press Enter to continue...")
+    """
+
+    # update blacklist / create blacklist if desired (offline runs use the existing blacklist)
+    prefetched = data is not None
+    if snapshot:
+        print("Run on snapshot of block: ", snapshot['block'], "from", snapshot['datetime'])
+    elif prefetched:
+        print("Run on prefetched data of block: ", ((data.get('_meta') or {}).get('block') or {}).get('number'))
+    elif network == 'mainnet':
+        if blacklist_parameter:
+            with timingSpan(timings, 'blacklist'):
+                createBlacklist(network = 'mainnet')
+    elif network == 'testnet':
+        if blacklist_parameter:
+            with timingSpan(timings, 'blacklist'):
+                createBlacklist(network = 'mainnet')
+
+    # save price data for current run
+    if snapshot:
+        price_data = snapshot['price_data']
+    elif price_data is None:
+        price_data = getPriceData(timings=timings)
+    optimizer_results[current_datetime]['price_data'] = price_data
+
+    # get all relevant data from mainnet subgraph
+    if snapshot:
+        data = snapshot['data']
+    elif not prefetched:
+        with timingSpan(timings, 'data_fetch'), blockPin(network, enabled=pin_block):
+            data = getDataAllocationOptimizer(indexer_id=indexer_id, network=network)
+
+    # block of the pinned data (prefetched data are pinned by the caller), the contract calls use the same block
+    pinned_block = ((data.get('_meta') or {}).get('block') or {}).get('number') if pin_block and not snapshot \
+        else None
+    optimizer_results[current_datetime]['parameters']['pinned_block'] = pinned_block
+
+    # save network data for current run
+    network_data = getNetworkData(data)
+    optimizer_results[current_datetime]['network_data'] = network_data
+
+    # get indexer statistics (Total Stake, Total Allocated Tokens ...) and save indexer global data
+    indexer_data, indexer = getIndexerData(data, network=network)
+    indexer_total_stake = indexer['indexer_total_stake']
+    optimizer_results[current_datetime]['indexer'] = indexer
 
-        current_block = getCurrentBlock()
+    # the config.json is read once per run, after the blacklist update
+    config = loadConfig()
 
-        pending_rewards_before = [contract.functions.getRewards(to_checksum_address(str(x))).call(
-            block_identifier=current_block - 270) / 10 ** 18 for x in df_log['allocation_id']]
+    df, df_log = createAllocationDataFrames(data, indexer_data, network_data,
+                                            subgraph_list_parameter=subgraph_list_parameter,
+                                            blacklist_parameter=blacklist_parameter,
+                                            min_signalled_grt_subgraph=min_signalled_grt_subgraph,
+                                            min_allocated_grt_subgraph=min_allocated_grt_subgraph, config=config)
+
+    # get pending rewards of current allocations
+    if network == 'mainnet' and snapshot:
+        df_log['pending_rewards'] = df_log['allocation_id'].map(snapshot['pending_rewards'])
+        current_block = snapshot['block']
+        df_log['rewards_one_hour_ago'] = df_log['allocation_id'].map(snapshot['rewards_one_hour_ago'])
+        df_log['difference_rewards'] = df_log['pending_rewards'] - df_log['rewards_one_hour_ago']
+    elif network == 'mainnet':
+        with timingSpan(timings, 'pending_rewards'):
+            # check if pending rewards were the same one hour before - if same, close allocation because it is most likely broken
+            current_block = pinned_block or getCurrentBlock()
+
+            # the getRewards calls of all allocations are batched with multicall, one call per block
+            pending_rewards, pending_rewards_before = getRewardsArrays(
+                df_log['allocation_id'], [pinned_block or 'latest', getBlockBefore(current_block, 3600)],
+                reward_manager=REWARD_MANAGER)
+            df_log['pending_rewards'] = pending_rewards
         df_log['rewards_one_hour_ago'] = pending_rewards_before
         df_log['difference_rewards'] = df_log['pending_rewards'] - df_log['rewards_one_hour_ago']
 
+    if network == 'mainnet':
+        # allocations whose getRewards call failed (NaN) are never treated as broken
+        df_failed_rewards = df_log[df_log['difference_rewards'].isna()]
+        if len(df_failed_rewards) > 0:
+            print("Pending rewards could not be fetched, not checked for broken subgraphs: ",
+                  df_failed_rewards['allocation_id'].tolist())
+        df_checked = df_log[df_log['difference_rewards'].notna()]
         if automation == True:
-            df_broken_subgraphs = df_log[df_log['difference_rewards'] < 1]
-            for row in df_broken_subgraphs.iterrows():
-                setIndexingRuleQuery(deployment=row[1]['Address'], decision_basis="never")
+            df_broken_subgraphs = df_checked[df_checked['difference_rewards'] < 1]
+            with timingSpan(timings, 'automation'):
+                for row in df_broken_subgraphs.iterrows():
+                    setIndexingRuleQuery(deployment=row[1]['Address'], decision_basis="never")
         else:
-            df_broken_subgraphs = df_log[df_log['difference_rewards'] < 1]
+            df_broken_subgraphs = df_checked[df_checked['difference_rewards'] < 1]
             print()
             print(40 * "-")
             print("BROKEN SUBGRAPHS, DEALLOCATE IMMEDIATELY: ")
@@ -290,8 +613,10 @@ def optimizeAllocations(indexer_id, blacklist_parameter=True, parallel_allocatio
             print()
     if network == 'testnet':
         #@TODO create broken allocation cleaning for testnet
-        web3 = initialize_rpc_testnet()
-        current_block = getCurrentBlockTestnet()
+        if snapshot:
+            current_block = snapshot['block']
+        else:
+            current_block = pinned_block or getCurrentBlockTestnet()
         df_log['rewards_one_hour_ago'] = 0
         df_log['difference_rewards'] = 0
 
@@ -327,171 +652,90 @@ def optimizeAllocations(indexer_id, blacklist_parameter=True, parallel_allocatio
     optimizer_results[current_datetime]['current_rewards']['indexing_reward_yearly'] = df_log[
         'indexing_reward_yearly'].sum()
 
-    # Start Optimization with Pyomo
-    print("\n")
-    print('Optimize Allocations:')
-    print(70 * "=")
-
-    # Start of Optimization, create nested Dictionary from obtained data
-    n = len(df)  # amount of subgraphs
-    set_J = range(0, n)
-
-    # nested dictionary stored in data, key is SubgraphName,Address,ID
-    data = {(df.reset_index()['Name_y'].values[j], df.reset_index()['Address'].values[j], df['id'].values[j]): {
-        'Allocation': df['Allocation'].values[j],
-        'signalledTokensTotal': df['signalledTokensTotal'].values[j],
-        'stakedTokensTotal': df['stakedTokensTotal'].values[j],
-        'SignalledNetwork': int(total_tokens_signalled) / 10 ** 18,
-        'indexingRewardYear': indexing_reward_year,
-        'indexingRewardWeek': indexing_reward_week,
-        'indexingRewardDay': indexing_reward_day,
-        'indexingRewardHour': indexing_reward_hour,
-        'id': df['id'].values[j]} for j in set_J}
-
-    """ 
-    Possibility to add random/test Subgraph Data
-    data['test_subgraph'] = {'Allocation': 2322000.0,
-                                             'signalledTokensTotal': 108735.55395641184,
-                                             'stakedTokensTotal': 2772706893.400638,
-                                             'SignalledNetwork': int(total_tokens_signalled) / 10 ** 18,
-                                             'indexingRewardYear': indexing_reward_year,
-                                             'indexingRewardWeek': indexing_reward_week,
-                                             'indexingRewardDay': indexing_reward_day,
-                                             'indexingRewardHour': indexing_reward_hour,
-
-    """
-    # set sliced stake (how many allocations there should be) -> grt per allocation max
-    sliced_stake = (indexer_total_stake - reserve_stake) * max_percentage
-
-    optimizer_results[current_datetime]['optimizer'] = {}
-    optimizer_results[current_datetime]['optimizer']['grt_per_allocation'] = sliced_stake
-    optimizer_results[current_datetime]['optimizer']['allocations_total'] = 1 / max_percentage
-    optimizer_results[current_datetime]['optimizer']['stake_to_allocate'] = indexer_total_stake - reserve_stake
-
-    # create  dictionary for optimizer run
-    optimizer_results[current_datetime]['optimizer']['optimized_allocations'] = {}
-    # Run the Optimization for Hourly/Daily/Weekly/Yearly Indexing Rewards
-    for reward_interval in ['indexingRewardHour', 'indexingRewardDay', 'indexingRewardWeek', 'indexingRewardYear']:
-        print('\nOptimize Allocations for Interval: {} and Max Percentage of Stake per Allocation: {}\n'.format(
-            reward_interval,
-            max_percentage))
-        print(70 * "=")
-
-        # Initialize Pyomo Variables
-        C = data.keys()  # Name of Subgraphs
-        model = pyomo.ConcreteModel()
-
-        S = len(data)  # amount subgraphs
-        model.Subgraphs = range(S)
-
-        # The Variable (Allocations) that should be changed to optimize rewards
-        model.x = pyomo.Var(C, domain=pyomo.NonNegativeReals)
-
-        # formula and model
-        model.rewards = pyomo.Objective(
-            expr=sum((model.x[c] / (data[c]['stakedTokensTotal'] + sliced_stake)) * (
-                    data[c]['signalledTokensTotal'] / data[c]['SignalledNetwork']) * data[c][reward_interval] for c in
-                     C),  # Indexing Rewards Formula (Daily Rewards)
-            sense=pyomo.maximize)  # maximize Indexing Rewards
-
-        # set constraint that allocations shouldn't be higher than total stake- reserce stake
-        model.vol = pyomo.Constraint(expr=indexer_total_stake - reserve_stake >= sum(
-            model.x[c] for c in C))
-        model.bound_x = pyomo.ConstraintList()
-
-        # iterate through subgraphs and set constraints
-        for c in C:
-            # Allocations per Subgraph should be higher than min_allocation
-            model.bound_x.add(model.x[c] >= min_allocation)
-            # Allocation per Subgraph can't be higher than x % of total Allocations
-            model.bound_x.add(model.x[c] <= max_percentage * indexer_total_stake)
-
-        # set solver to glpk -> In Future this could be changeable
-        solver = pyomo.SolverFactory('glpk')
-        results = solver.solve(model, keepfiles=True)
-
-        # list of optimized allocations, formated as key(id): allocation_amount / parallel_allocations * 10** 18
-        # passed to createAllocationScript
-        FIXED_ALLOCATION = dict()
-
-        # iterate through results and print subgraph/ipfsHash/id and Allocation Amount
-        for c in C:
-            # if allocation higher than 0, print subgraph with allocation amount
-            if model.x[c]() > 0:
-                print('  ', c, ':', model.x[c](), 'allocations, Signal/Allocation Ratio: ',
-                      str(data[c]['signalledTokensTotal'] / (data[c]['stakedTokensTotal'] + sliced_stake)))
-                optimizer_results[current_datetime]['optimizer']['optimized_allocations'][c[-1]] = {}
-                optimizer_results[current_datetime]['optimizer']['optimized_allocations'][c[-1]][
-                    'allocation_amount'] = model.x[c]()
-                optimizer_results[current_datetime]['optimizer']['optimized_allocations'][c[-1]][
-                    'name'] = c[0]
-                optimizer_results[current_datetime]['optimizer']['optimized_allocations'][c[-1]][
-                    'address'] = c[1]
-                optimizer_results[current_datetime]['optimizer']['optimized_allocations'][c[-1]][
-                    'signal_stake_ratio'] = data[c]['signalledTokensTotal'] / (
-                        data[c]['stakedTokensTotal'] + sliced_stake)
-
-            FIXED_ALLOCATION[data[c]['id']] = model.x[c]() / parallel_allocations * 10 ** 18
-        optimizer_results[current_datetime]['optimizer']['optimized_allocations'][
-            reward_interval] = model.rewards() / 10 ** 18
-        # print total Allocation GRT and Rewards per Interval
-        print()
-        print('  ', 'Optimizer for Interval = ', reward_interval)
-        print('  ', 'Allocations Total = ', model.vol(), 'GRT')
-        print('  ', 'Reward = GRT', model.rewards() / 10 ** 18)
-
-        if reward_interval == 'indexingRewardWeek':
-            optimized_reward_weekly = model.rewards() / 10 ** 18
-
-        if reward_interval == 'indexingRewardDay':
-            optimized_reward_daily = model.rewards() / 10 ** 18
-
-    # NOW STARTS THE THRESHOLD CALCULATION
-    # set interval and calculate threshold based on daily, or weekly rewards
-    if threshold_interval == 'weekly':
-        # Threshold Calculation
-
-        starting_value = df_log['indexing_reward_weekly'].sum()  # rewards per week before optimization
-        final_value = optimized_reward_weekly  # after optimization
+    # hash the inputs of the solve and look for a previous run with the same inputs
+    input_hash = hashOptimizerInputs(df, df_log, network_data, indexer_total_stake,
+                                     {'indexer_id': indexer_id.lower(), 'network': network,
+                                      'parallel_allocations': parallel_allocations, 'max_percentage': max_percentage,
+                                      'reserve_stake': reserve_stake, 'min_allocation': min_allocation,
+                                      'solver': solver, 'solver_time_limit': solver_time_limit,
+                                      'solver_mip_gap': solver_mip_gap}, config=config)
+    memoized_run = findRunByInputHash(input_hash) if memoization else None
+    upper_bound = None
+    threshold_price_data = price_data
+    optimizer_results[current_datetime]['memoization'] = {'input_hash': input_hash, 'memoized_from': None,
+                                                          'price_drift_material': None}
+
+    if memoized_run:
+        # reuse the optimized allocations, and the threshold decision if the price data did not drift materially
+        optimizer, FIXED_ALLOCATION = restoreOptimizedAllocations(memoized_run, df['id'].values,
+                                                                  parallel_allocations=parallel_allocations)
+        # compare with the price data of the memoized threshold decision, so small drifts do not add up
+        memoized_price_data = memoized_run.get('memoization', {}).get('threshold_price_data') or \
+                              memoized_run['price_data']
+        price_drift_material = isPriceDriftMaterial(price_data, memoized_price_data, memoization_epsilon)
+        if not price_drift_material:
+            threshold_price_data = memoized_price_data
+        optimizer_results[current_datetime]['memoization']['memoized_from'] = memoized_run['datetime']
+        optimizer_results[current_datetime]['memoization']['price_drift_material'] = price_drift_material
+        print("\nInputs unchanged since the run of {}, reusing the optimized allocations ({})\n".format(
+            memoized_run['datetime'],
+            "price drift above epsilon, threshold recalculated" if price_drift_material else "threshold reused"))
+    elif upper_bound_check:
+        # check if the threshold is reachable at all before building and solving the model
+        with timingSpan(timings, 'upper_bound'):
+            upper_bound = calculateRewardUpperBound(df, network_data, indexer_total_stake,
+                                                    optimizer_results[current_datetime]['current_rewards'],
+                                                    price_data, parallel_allocations=parallel_allocations,
+                                                    max_percentage=max_percentage, reserve_stake=reserve_stake,
+                                                    min_allocation=min_allocation, solver=solver,
+                                                    threshold=threshold, threshold_interval=threshold_interval,
+                                                    ignore_tx_costs=ignore_tx_costs, config=config)
+        optimizer_results[current_datetime]['upper_bound'] = upper_bound
+
+    if not memoized_run and upper_bound and not upper_bound['threshold_reachable']:
+        # the run keeps the current allocations, it is not stored for the memoization
+        optimizer, FIXED_ALLOCATION = createSkippedOptimization(upper_bound,
+                                                                optimizer_results[current_datetime]['current_rewards'],
+                                                                price_data, indexer_total_stake,
+                                                                max_percentage=max_percentage,
+                                                                reserve_stake=reserve_stake)
+        input_hash = None
+        print("\nOptimization skipped: the upper bound of the {} rewards after transaction costs of {} GRT "
+              "({} allocations, {} GRT transaction costs) is an increase of {} Percent, below the threshold of "
+              "{} Percent\n".format(threshold_interval, upper_bound['final_value'], upper_bound['allocations'],
+                                     upper_bound['gas_costs_grt'], upper_bound['increase_rewards_percentage'],
+                                     threshold))
+    elif not memoized_run:
+        # run the optimization
+        optimizer, FIXED_ALLOCATION = calculateOptimizedAllocations(df, network_data, indexer_total_stake,
+                                                                    parallel_allocations=parallel_allocations,
+                                                                    max_percentage=max_percentage,
+                                                                    reserve_stake=reserve_stake,
+                                                                    min_allocation=min_allocation, solver=solver,
+                                                                    solver_time_limit=solver_time_limit,
+                                                                    solver_mip_gap=solver_mip_gap, timings=timings,
+                                                                    config=config)
+    optimizer_results[current_datetime]['optimizer'] = optimizer
+    optimizer_results[current_datetime]['memoization']['threshold_price_data'] = threshold_price_data
+
+    if optimizer.get('skipped'):
+        starting_value = optimizer_results[current_datetime]['current_rewards'][
+            'indexing_reward_weekly' if threshold_interval == 'weekly' else 'indexing_reward_daily']
+        final_value = upper_bound['final_value']
     else:
-        starting_value = df_log['indexing_reward_daily'].sum()  # rewards per week before optimization
-        final_value = optimized_reward_daily  # after optimization
-
-    # Amount of Allocations
-    amount_allocations = [allocation for allocation in FIXED_ALLOCATION.values() if allocation > 0]
-    # costs for transactions  = (close_allocation and new_allocation) * parallel_allocations
-    gas_costs_eth = (gas_price_gwei * allocation_gas_usage) / 1000000000
-    allocation_costs_eth = len(amount_allocations) * (
-            gas_costs_eth * parallel_allocations * 2)  # multiply by 2 for close/new-allocation
-    allocation_costs_fiat = eth_usd * allocation_costs_eth
-    allocation_costs_grt = allocation_costs_eth * (1 / grt_eth)
-
-    optimizer_results[current_datetime]['optimizer']['gas_costs_allocating_eth'] = gas_costs_eth
-    optimizer_results[current_datetime]['optimizer'][
-        'gas_costs_parallel_allocation_new_close_eth'] = allocation_costs_eth
-    optimizer_results[current_datetime]['optimizer'][
-        'gas_costs_parallel_allocation_new_close_usd'] = allocation_costs_fiat
-    optimizer_results[current_datetime]['optimizer'][
-        'gas_costs_parallel_allocation_new_close_grt'] = allocation_costs_grt
-
-    # calculate difference in rewards currently vs optimized
-    if ignore_tx_costs == False:
-        final_value = final_value - allocation_costs_grt
-    if ignore_tx_costs == True:
-        final_value = final_value
-    diff_rewards = percentageIncrease(starting_value, final_value)  # Percentage increase in Rewards
-    diff_rewards_fiat = round(((final_value - starting_value) * grt_usd), 2)  # Fiat increase in Rewards
-    diff_rewards_grt = round((final_value - starting_value), 2)
-
-    optimizer_results[current_datetime]['optimizer'][
-        'increase_rewards_percentage'] = diff_rewards
-    optimizer_results[current_datetime]['optimizer'][
-        'increase_rewards_fiat'] = diff_rewards_fiat
-    optimizer_results[current_datetime]['optimizer'][
-        'increase_rewards_grt'] = diff_rewards_grt
+        starting_value, final_value = calculateThreshold(optimizer,
+                                                         optimizer_results[current_datetime]['current_rewards'],
+                                                         threshold_price_data, FIXED_ALLOCATION,
+                                                         parallel_allocations=parallel_allocations,
+                                                         threshold=threshold, threshold_interval=threshold_interval,
+                                                         ignore_tx_costs=ignore_tx_costs)
+    diff_rewards = optimizer['increase_rewards_percentage']
+    diff_rewards_fiat = optimizer['increase_rewards_fiat']
+    diff_rewards_grt = optimizer['increase_rewards_grt']
+    allocation_costs_fiat = optimizer['gas_costs_parallel_allocation_new_close_usd']
 
     # is the threshold reached?
-    if diff_rewards >= threshold:
+    if optimizer['threshold_reached']:
         # alerting to slack
         if slack_alerting:
             alert_to_slack('threshold_reached', threshold, threshold_interval, starting_value, final_value,
@@ -501,28 +745,32 @@ def optimizeAllocations(indexer_id, blacklist_parameter=True, parallel_allocatio
             print(
                 '\nTHRESHOLD of %s Percent reached. Increase in %s Rewards of %s Percent (%s in USD, %s in GRT) after \
                 subtracting Transaction Costs. Transaction Costs %s USD. \n Before: %s GRT \n After: %s GRT \n \
-                Allocation script CREATED IN ./script.txt created\n' % (
+                Allocation script CREATED IN %s/script.txt created\n' % (
                     threshold, threshold_interval, diff_rewards, diff_rewards_fiat, diff_rewards_grt,
-                    allocation_costs_fiat, starting_value, final_value))
+                    allocation_costs_fiat, starting_value, final_value, script_directory))
         if ignore_tx_costs == True:
             print(
                 '\nTHRESHOLD of %s Percent reached. Increase in %s Rewards of %s Percent (%s in USD, %s in GRT) \n Before: %s GRT \n After: %s GRT \n \
-                Allocation script CREATED IN ./script.txt created\n' % (
+                Allocation script CREATED IN %s/script.txt created\n' % (
                     threshold, threshold_interval, diff_rewards, diff_rewards_fiat, diff_rewards_grt,
-                     starting_value, final_value))
-            
-        optimizer_results[current_datetime]['optimizer'][
-            'threshold_reached'] = True
-        createAllocationScript(indexer_id=indexer_id, fixed_allocations=FIXED_ALLOCATION,
-                               blacklist_parameter=blacklist_parameter, parallel_allocations=parallel_allocations,
-                               network=network)
+                     starting_value, final_value, script_directory))
+
+        # offline, prefetched and pinned runs create the script from the data of the run
+        run_data = snapshot or prefetched or pinned_block
+        with timingSpan(timings, 'script_creation'):
+            createAllocationScript(indexer_id=indexer_id, fixed_allocations=FIXED_ALLOCATION,
+                                   blacklist_parameter=blacklist_parameter, parallel_allocations=parallel_allocations,
+                                   network=network, indexer_data=indexer_data if run_data else None,
+                                   subgraph_data=data['subgraphDeployments'] if run_data else None,
+                                   script_directory=script_directory)
 
         if automation == True:
-            setIndexingRules(FIXED_ALLOCATION, indexer_id = indexer_id,blacklist_parameter=blacklist_parameter, parallel_allocations = parallel_allocations, network = network)
+            with timingSpan(timings, 'automation'):
+                setIndexingRules(FIXED_ALLOCATION, indexer_id = indexer_id,blacklist_parameter=blacklist_parameter, parallel_allocations = parallel_allocations, network = network)
 
 
     # if not reached
-    if diff_rewards < threshold:
+    else:
         if slack_alerting:
             # alerting
             alert_to_slack('threshold_not_reached', threshold, threshold_interval, starting_value, final_value,
@@ -538,22 +786,18 @@ def optimizeAllocations(indexer_id, blacklist_parameter=True, parallel_allocatio
                 '\nTHRESHOLD of %s Percent  NOT REACHED. Increase in %s Rewards of %s Percent (%s in USD, %s in GRT) \n Before: %s GRT \n After: %s GRT \n Allocation script NOT CREATED\n' % (
                     threshold, threshold_interval, diff_rewards, diff_rewards_fiat, diff_rewards_grt,
                      starting_value, final_value))
-        optimizer_results[current_datetime]['optimizer'][
-            'threshold_reached'] = False
-
-    # write results to json:
-    a = []
-    if not os.path.isfile("./data/optimizer_log.json"):
-        a.append(optimizer_results)
-        with open("./data/optimizer_log.json", mode='w') as f:
-            f.write(json.dumps(a, indent=2))
-    else:
-        with open("./data/optimizer_log.json") as feedsjson:
-            feeds = json.load(feedsjson)
 
-        feeds.append(optimizer_results)
-        with open("./data/optimizer_log.json", mode='w') as f:
-            f.write(json.dumps(feeds, indent=2))
+    # save and print the timing spans of the phases
+    optimizer_results[current_datetime]['timings'] = timings
+    printTimings(timings)
+    printQueryCacheStats()
+
+    # append results to the run store
+    appendRun(optimizer_results, input_hash=input_hash)
+
+    # persist the deployments interned in this run
+    if save_registry:
+        saveDeploymentRegistry()
     return optimizer_results
 
 
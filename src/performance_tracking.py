@@ -3,18 +3,38 @@ from eth_utils import to_checksum_address
 import datetime as dt
 from src.queries import getAllAllocations, getActiveAllocations, getClosedAllocations, getAllocationDataById, \
     getCurrentBlock
-from src.helpers import initialize_rpc, initializeRewardManagerContract, ANYBLOCK_ANALYTICS_ID
+from src.helpers import ANYBLOCK_ANALYTICS_ID
+from src.async_client import runAsync, asyncGetRewardsAtBlocks
+from src.block_headers import asyncGetCachedBlockHeaders, saveBlockHeaders, getDailyBlocks
 import pandas as pd
 import numpy as np
+import asyncio
 
 
-def calculateRewardsActiveAllocation(allocation_id, interval=1):
-    # initialize rewardManager Contract
-    reward_manager_contract = initializeRewardManagerContract()
+def sampleRewardsHistory(allocation_id, blocks):
+    """Get's the accumulated rewards of an allocation and the timestamps of the blocks. All blocks are sampled
+    with JSON-RPC batches, the rewards and the headers are fetched concurrently. Cached headers are not fetched.
 
-    # initialize web3 client
-    web3 = initialize_rpc()
+    Parameters
+    -------
+        allocation_id (str): allocation id
+        blocks (list): block numbers
+
+    Returns
+    -------
+    list, list
+        accumulated rewards in GRT per block (0 if the call reverted), unix timestamp per block
+    """
+    async def sample():
+        return await asyncio.gather(asyncGetRewardsAtBlocks(allocation_id, blocks),
+                                    asyncGetCachedBlockHeaders(blocks))
+
+    rewards, headers = runAsync(sample())
+    saveBlockHeaders()
+    return rewards, [header['timestamp'] for header in headers]
 
+
+def calculateRewardsActiveAllocation(allocation_id):
     # Grab allocation data by allocation_id
     allocation = getAllocationDataById(allocation_id)
     current_block = getCurrentBlock()
@@ -48,41 +68,37 @@ def calculateRewardsActiveAllocation(allocation_id, interval=1):
     # get the subgraph IPFS hash
     subgraph_ipfs_hash = allocation['subgraphDeployment']['ipfsHash']
 
-    # Initialize a delta reward between current and previous interval reward
+    # Initialize the accumulated reward and timestamp of the previous sample
     accumulated_reward_minus_interval = 0
+    timestamp_minus_interval = None
 
-    # iterate through the range from allocation creation block to current block +1 in interval steps
-    # we expect 270 Blocks per Hour. interval * 270 = Hour interval in blocks
+    # sample the creation block, the first block of every following UTC day and the current block, the
+    # blocks are resolved from their timestamps
 
     data = []
     temp_data = []
-    for block in range(allocation_creation_block, current_block + 1, (24 * 270)):
-        datetime_block = datetime.utcfromtimestamp(web3.eth.get_block(block).get('timestamp')).strftime(
-            '%Y-%m-%d')
-
-        try:
-            accumulated_reward = reward_manager_contract.functions.getRewards(allocation_id).call(
-                block_identifier=block) / 10 ** 18
-        except:
-            accumulated_reward = 0
-
-        # calculate the difference between the accumulated reward and the reward from last interval and calc
-        # the hourly rewards
-        reward_rate_day = (accumulated_reward - accumulated_reward_minus_interval) / interval
+    # sample all blocks up front
+    blocks, _ = getDailyBlocks(allocation_creation_block, current_block, include_end=True)
+    accumulated_rewards, timestamps = sampleRewardsHistory(allocation_id, blocks)
+    for block, accumulated_reward, timestamp in zip(blocks, accumulated_rewards, timestamps):
+        datetime_block = datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d')
+
+        # calculate the difference between the accumulated reward and the reward of the previous sample and
+        # divide it by the days between the samples (the first and the last day are partial days)
+        days = (timestamp - timestamp_minus_interval) / 86400 if timestamp_minus_interval is not None else 0
+        reward_rate_day = (accumulated_reward - accumulated_reward_minus_interval) / days if days > 0 else 0
         reward_rate_hour = reward_rate_day / 24
         reward_rate_hour_per_token = reward_rate_hour / allocated_tokens
 
         # set the currently accumulated reward fas the previous interval reward for next iteration
         accumulated_reward_minus_interval = accumulated_reward
+        timestamp_minus_interval = timestamp
         earnings_rate_all_indexers = reward_rate_hour / allocated_tokens * subgraph_stake
         try:
             stake_signal_ratio = subgraph_signal / subgraph_stake
         except:
             stake_signal_ratio = 0
 
-        datetime_block = datetime.utcfromtimestamp(web3.eth.get_block(block).get('timestamp')).strftime(
-            '%Y-%m-%d')
-
         # create list with entries
         temp_data.append({
             "datetime": datetime_block,
@@ -106,20 +122,18 @@ def calculateRewardsActiveAllocation(allocation_id, interval=1):
             "allocation_created_timestamp": datetime.utcfromtimestamp(allocation_created_at).strftime('%Y-%m-%d'),
             "allocation_created_epoch": allocation['createdAtEpoch'],
             "allocation_status": "Open",
-            "timestamp": datetime.utcfromtimestamp(
-                web3.eth.get_block(block).get('timestamp')).strftime('%Y-%m-%d'),
+            "timestamp": datetime_block,
         })
         data.append(temp_data)
     df = pd.DataFrame(temp_data)
     return df
 
 
-def calculateRewardsAllActiveAllocations(indexer_id, interval=1):
-    """Calculates the pending rewards in given interval for all active allocation
+def calculateRewardsAllActiveAllocations(indexer_id):
+    """Calculates the daily pending rewards for all active allocation
 
     Parameters
     -------
-        interval (int): supply interval for pending rewards calculation in hours. Standard is 1h
         indexer_id (str) : supply indexer id for reward calculation on all allocations
     """
     # grab all active allocations
@@ -151,7 +165,7 @@ def calculateRewardsAllActiveAllocations(indexer_id, interval=1):
                                    ])
         # append all active allocations to a temp list with allocation ID
         for allocation in active_allocations:
-            df_temp = calculateRewardsActiveAllocation(allocation_id=allocation['id'], interval=interval)
+            df_temp = calculateRewardsActiveAllocation(allocation_id=allocation['id'])
             df = df.append(df_temp)
     else:
         df = pd.DataFrame(columns=["datetime",
@@ -1,5 +1,5 @@
 import json
-import base58
+from src.deployment_registry import getIpfsHash
 from dotenv import load_dotenv
 import os
 import requests
@@ -45,7 +45,7 @@ def getValidPoi(indexerId, subgraphHash, start_epoch):
         # sleep so that the connection is not reset by peer
         time.sleep(0.01)
 
-        subgraphIpfsHash = base58.b58encode(bytearray.fromhex('1220' + subgraphHash[2:])).decode("utf-8")
+        subgraphIpfsHash = getIpfsHash(subgraphHash)
 
         poi = json.loads(getPoiQuery(indexerId, subgraphIpfsHash, blockNumber=startBlock, blockHash=startHash))
         # if no valid POI, return 0x000... POI
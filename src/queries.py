@@ -1,12 +1,12 @@
-import json
-from dotenv import load_dotenv
-import os
 import requests
 from src.helpers import initialize_rpc, initialize_rpc_testnet
+from src.async_client import asyncPostGraphqlQuery, asyncPaginateGraphqlQuery, runAsync
+from src.block_headers import asyncGetCachedBlockHeaders, saveBlockHeaders
+from src.timings import countHttpResponse
+import asyncio
 from pycoingecko import CoinGeckoAPI
 from datetime import datetime, timedelta
 import pandas as pd
-from web3.middleware import geth_poa_middleware
 
 def getFiatPrice(pairs):
     """Get's the Currency Pairs from Coingecko.
@@ -97,7 +97,8 @@ def getGasPrice(speed='fast'):
     """
 
     gas_price_resp = requests.get("https://api.anyblock.tools/latest-minimum-gasprice/",
-                                  headers={'content-type': 'application/json', 'Accept-Charset': 'UTF-8'}).json()
+                                  headers={'content-type': 'application/json', 'Accept-Charset': 'UTF-8'},
+                                  hooks={'response': countHttpResponse}).json()
     gasprice = gas_price_resp.get(speed)
     return gasprice
 
@@ -122,11 +123,9 @@ def getCurrentBlockTestnet():
         Current Active block
     """
     web3 = initialize_rpc_testnet()
-    web3.middleware_onion.inject(geth_poa_middleware, layer=0)
-
     return web3.eth.blockNumber
 
-def getCurrentEpoch():
+async def asyncGetCurrentEpoch():
     """Get's the current active Epoche from the Mainnet Subgraph.
 
     Returns
@@ -134,9 +133,6 @@ def getCurrentEpoch():
     int
         Current Active Epoch
     """
-    # Load .env File with Configuration
-    load_dotenv()
-    API_GATEWAY = os.getenv('API_GATEWAY')
 
     query = """
             {
@@ -147,15 +143,19 @@ def getCurrentEpoch():
             }
             """
     request_json = {'query': query}
-    resp = requests.post(API_GATEWAY, json=request_json)
-    response = json.loads(resp.text)
+    response = await asyncPostGraphqlQuery(request_json, endpoint='mainnet')
 
     current_epoch = response['data']['graphNetworks'][0]['currentEpoch']
 
     return current_epoch
 
 
-def getStartBlockEpoch(epoch):
+def getCurrentEpoch():
+    """Sync wrapper of asyncGetCurrentEpoch."""
+    return runAsync(asyncGetCurrentEpoch())
+
+
+async def asyncGetStartBlockEpoch(epoch):
     """Get's the startBlock for an Epoch from the Mainnet Subgraph.
        And then it get's the Block Hash via RPC Calls.
 
@@ -164,8 +164,6 @@ def getStartBlockEpoch(epoch):
     int,int
         StartBlock of Epoche, StartBlock BlockHash
     """
-    load_dotenv()
-    API_GATEWAY = os.getenv('API_GATEWAY')
 
     query = """
          query get_epoch_block($input: ID!) {
@@ -180,19 +178,24 @@ def getStartBlockEpoch(epoch):
     variables = {'input': epoch}
     request_json['variables'] = variables
 
-    resp = requests.post(API_GATEWAY, json=request_json)
-    response = json.loads(resp.text)
+    response = await asyncPostGraphqlQuery(request_json, endpoint='mainnet')
 
     startBlock = response['data']['epoch']['startBlock']
 
     # get Block-Hash from BlockHeight
-    web3 = initialize_rpc()
-    startBlockHash = web3.eth.getBlock(startBlock)['hash'].hex()
+    startBlockHash = (await asyncGetCachedBlockHeaders([startBlock]))[0]['hash']
 
     return startBlock, startBlockHash
 
 
-def getAllocationDataById(allocation_id, variables=None, ):
+def getStartBlockEpoch(epoch):
+    """Sync wrapper of asyncGetStartBlockEpoch."""
+    start_block = runAsync(asyncGetStartBlockEpoch(epoch=epoch))
+    saveBlockHeaders()
+    return start_block
+
+
+async def asyncGetAllocationDataById(allocation_id, variables=None, ):
     """Get's the data for an allocation by allocation_id
        Dumps the results into a dictionary.
 
@@ -201,8 +204,6 @@ def getAllocationDataById(allocation_id, variables=None, ):
     dict
          Allocation Metadata
     """
-    load_dotenv()
-    API_GATEWAY = os.getenv('API_GATEWAY')
 
     query = """
             query AllocationById($input: ID!){
@@ -233,15 +234,19 @@ def getAllocationDataById(allocation_id, variables=None, ):
     request_json = {'query': query}
     if allocation_id:
         request_json['variables'] = variables
-    resp = requests.post(API_GATEWAY, json=request_json)
-    response = json.loads(resp.text)
+    response = await asyncPostGraphqlQuery(request_json, endpoint='mainnet')
 
     allocations = response['data']['allocation']
 
     return allocations
 
 
-def getActiveAllocations(indexer_id, network='mainnet',variables=None, ):
+def getAllocationDataById(allocation_id, variables=None, ):
+    """Sync wrapper of asyncGetAllocationDataById."""
+    return runAsync(asyncGetAllocationDataById(allocation_id=allocation_id, variables=variables))
+
+
+async def asyncGetActiveAllocations(indexer_id, network='mainnet',variables=None, ):
     """Get's the currently active Allocations for a specific Indexer from the Mainnet Subgraph.
        Dumps the results into a dictionary.
 
@@ -250,11 +255,6 @@ def getActiveAllocations(indexer_id, network='mainnet',variables=None, ):
     dict
         Active Allocations for Indexer
     """
-    load_dotenv()
-    if network == 'mainnet':
-        API_GATEWAY = os.getenv('API_GATEWAY')
-    if network == 'testnet':
-        API_GATEWAY = os.getenv('TESTNET_GATEWAY')
     query = """
         query AllocationsByIndexer($input: ID!) {
             indexer(id: $input) {
@@ -288,15 +288,19 @@ def getActiveAllocations(indexer_id, network='mainnet',variables=None, ):
     request_json = {'query': query}
     if indexer_id:
         request_json['variables'] = variables
-    resp = requests.post(API_GATEWAY, json=request_json)
-    response = json.loads(resp.text)
+    response = await asyncPostGraphqlQuery(request_json, endpoint=network)
 
     allocations = response['data']['indexer']
 
     return allocations
 
 
-def getAllAllocations(indexer_id, variables=None, ):
+def getActiveAllocations(indexer_id, network='mainnet',variables=None, ):
+    """Sync wrapper of asyncGetActiveAllocations."""
+    return runAsync(asyncGetActiveAllocations(indexer_id=indexer_id, network=network, variables=variables))
+
+
+async def asyncGetAllAllocations(indexer_id, variables=None, ):
     """Get's the currently active Allocations for a specific Indexer from the Mainnet Subgraph.
        Dumps the results into a dictionary.
 
@@ -305,8 +309,6 @@ def getAllAllocations(indexer_id, variables=None, ):
     dict
         Active Allocations for Indexer
     """
-    load_dotenv()
-    API_GATEWAY = os.getenv('API_GATEWAY')
 
     query = """
         query AllocationsByIndexer($input: ID!) {
@@ -345,15 +347,19 @@ def getAllAllocations(indexer_id, variables=None, ):
     request_json = {'query': query}
     if indexer_id:
         request_json['variables'] = variables
-    resp = requests.post(API_GATEWAY, json=request_json)
-    response = json.loads(resp.text)
+    response = await asyncPostGraphqlQuery(request_json, endpoint='mainnet')
 
     allocations = response['data']['indexer']
 
     return allocations
 
 
-def getClosedAllocations(indexer_id, variables=None):
+def getAllAllocations(indexer_id, variables=None, ):
+    """Sync wrapper of asyncGetAllAllocations."""
+    return runAsync(asyncGetAllAllocations(indexer_id=indexer_id, variables=variables))
+
+
+async def asyncGetClosedAllocations(indexer_id, variables=None):
     """Get's all closed Allocations for a specific Indexer from the Mainnet Subgraph.
        Dumps the results into a dictionary.
 
@@ -362,8 +368,6 @@ def getClosedAllocations(indexer_id, variables=None):
     dict
         Closed Allocations for Indexer
     """
-    load_dotenv()
-    API_GATEWAY = os.getenv('API_GATEWAY')
     ALLOCATION_DATA = """
 
     query AllocationsByIndexer($input: ID!) {
@@ -398,14 +402,18 @@ def getClosedAllocations(indexer_id, variables=None):
     request_json = {'query': ALLOCATION_DATA}
     if indexer_id:
         request_json['variables'] = variables
-    resp = requests.post(API_GATEWAY, json=request_json)
-    response = json.loads(resp.text)
+    response = await asyncPostGraphqlQuery(request_json, endpoint='mainnet')
     response = response['data']['indexer']
 
     return response
 
 
-def getSubgraphsFromDeveloper(developer_id,network, variables=None, ):
+def getClosedAllocations(indexer_id, variables=None):
+    """Sync wrapper of asyncGetClosedAllocations."""
+    return runAsync(asyncGetClosedAllocations(indexer_id=indexer_id, variables=variables))
+
+
+async def asyncGetSubgraphsFromDeveloper(developer_id,network, variables=None, ):
     """Get's the deployed Subgraphs with the Hashes for a specific Subgraph Developer.
 
     Returns
@@ -413,13 +421,6 @@ def getSubgraphsFromDeveloper(developer_id,network, variables=None, ):
     List
         [SubgraphIpfsHash, ...]
     """
-    # Load .env File with Configuration
-    load_dotenv()
-    if network == 'mainnet':
-        API_GATEWAY = os.getenv('API_GATEWAY')
-
-    if network == 'testnet':
-        API_GATEWAY = os.getenv('TESTNET_GATEWAY')
 
     query = """
             query subgraphDeveloperSubgraphs($input: ID!){
@@ -447,9 +448,9 @@ def getSubgraphsFromDeveloper(developer_id,network, variables=None, ):
     if developer_id:
         request_json['variables'] = variables
 
-    resp = requests.post(API_GATEWAY, json=request_json)
+    resp = await asyncPostGraphqlQuery(request_json, endpoint=network)
     try:
-        subgraphs = json.loads(resp.text)['data']['graphAccount']['subgraphs']
+        subgraphs = resp['data']['graphAccount']['subgraphs']
         subgraphList = []
         for subgraph in subgraphs:
             for version in subgraph['versions']:
@@ -461,7 +462,12 @@ def getSubgraphsFromDeveloper(developer_id,network, variables=None, ):
     return subgraphList
 
 
-def getInactiveSubgraphs(network):
+def getSubgraphsFromDeveloper(developer_id,network, variables=None, ):
+    """Sync wrapper of asyncGetSubgraphsFromDeveloper."""
+    return runAsync(asyncGetSubgraphsFromDeveloper(developer_id=developer_id, network=network, variables=variables))
+
+
+async def asyncGetInactiveSubgraphs(network):
     """Get's all inactive subgraphs with their Hash
 
     Returns
@@ -469,17 +475,13 @@ def getInactiveSubgraphs(network):
     List
         [SubgraphIpfsHash, ...]
     """
-    # Load .env File with Configuration
-    load_dotenv()
 
-    if network == 'mainnet':
-        API_GATEWAY = os.getenv('API_GATEWAY')
-    if network == 'testnet':
-        API_GATEWAY = os.getenv('TESTNET_GATEWAY')
 
     query = """
-            query inactivesubgraphs {
-              subgraphs(where: {active: false}) {
+            query inactivesubgraphs($first: Int, $id_gt: String, $id_lt: String) {
+              subgraphs(first: $first, orderBy: id, orderDirection: asc,
+                        where: {active: false, id_gt: $id_gt, id_lt: $id_lt}) {
+                id
                 versions {
                   subgraphDeployment {
                     id
@@ -491,10 +493,9 @@ def getInactiveSubgraphs(network):
             }
 
             """
-    request_json = {'query': query}
-
-    resp = requests.post(API_GATEWAY, json=request_json)
-    subgraphs = json.loads(resp.text)['data']['subgraphs']
+    subgraphs = sorted([subgraph async for subgraph in asyncPaginateGraphqlQuery(query, 'subgraphs',
+                                                                                 endpoint=network)],
+                       key=lambda subgraph: subgraph['id'])
 
     inactive_subgraph_list = list()
     for subgraph in subgraphs:
@@ -503,7 +504,12 @@ def getInactiveSubgraphs(network):
     return inactive_subgraph_list
 
 
-def getAllSubgraphDeployments(network):
+def getInactiveSubgraphs(network):
+    """Sync wrapper of asyncGetInactiveSubgraphs."""
+    return runAsync(asyncGetInactiveSubgraphs(network=network))
+
+
+async def asyncGetAllSubgraphDeployments(network):
     """Get's all Subgraph Hashes
 
     Returns
@@ -513,26 +519,20 @@ def getAllSubgraphDeployments(network):
         [SubgraphHash1, ...]
 
     """
-    load_dotenv()
-    if network == 'mainnet':
-        API_GATEWAY = os.getenv('API_GATEWAY')
-    if network == 'testnet':
-        API_GATEWAY = os.getenv('TESTNET_GATEWAY')
 
     query = """
-        {
-          subgraphDeployments {
+        query subgraphDeployments($first: Int, $id_gt: String, $id_lt: String) {
+          subgraphDeployments(first: $first, orderBy: id, orderDirection: asc,
+                              where: {id_gt: $id_gt, id_lt: $id_lt}) {
             originalName
             id
             ipfsHash
           }
         }
         """
-    request_json = {'query': query}
-
-    resp = requests.post(API_GATEWAY, json=request_json)
-    data = json.loads(resp.text)
-    subgraph_deployments = data['data']['subgraphDeployments']
+    subgraph_deployments = sorted([subgraph_deployment async for subgraph_deployment
+                                   in asyncPaginateGraphqlQuery(query, 'subgraphDeployments', endpoint=network)],
+                                  key=lambda subgraph_deployment: subgraph_deployment['id'])
 
     # create list with subgraph IpfsHashes
     list_subgraph_hashes = list()
@@ -542,7 +542,12 @@ def getAllSubgraphDeployments(network):
     return list_subgraph_hashes
 
 
-def checkSubgraphStatus(subgraph_id, variables=None, ):
+def getAllSubgraphDeployments(network):
+    """Sync wrapper of asyncGetAllSubgraphDeployments."""
+    return runAsync(asyncGetAllSubgraphDeployments(network=network))
+
+
+async def asyncCheckSubgraphStatus(subgraph_id, variables=None, ):
     """Grabs Subgraph Health Status Data for Subgraph
 
     Returns
@@ -553,7 +558,6 @@ def checkSubgraphStatus(subgraph_id, variables=None, ):
 
     """
 
-    API_GATEWAY = "https://api.thegraph.com/index-node/graphql"
 
     query = """
             query subgraphStatus($input:[String]!){
@@ -579,14 +583,18 @@ def checkSubgraphStatus(subgraph_id, variables=None, ):
     request_json = {'query': query}
     if subgraph_id:
         request_json['variables'] = variables
-    resp = requests.post(API_GATEWAY, json=request_json)
-    data = json.loads(resp.text)
+    data = await asyncPostGraphqlQuery(request_json, endpoint='index_node')
     subgraph_health = data['data']['indexingStatuses']
 
     return subgraph_health
 
 
-def getSpecificSubgraphData(subgraph_ipfs_hash, variables=None, ):
+def checkSubgraphStatus(subgraph_id, variables=None, ):
+    """Sync wrapper of asyncCheckSubgraphStatus."""
+    return runAsync(asyncCheckSubgraphStatus(subgraph_id=subgraph_id, variables=variables))
+
+
+async def asyncGetSpecificSubgraphData(subgraph_ipfs_hash, variables=None, ):
     """Grabs Subgraph Detail Information for Streamlit Dashboard
 
     Returns
@@ -596,9 +604,7 @@ def getSpecificSubgraphData(subgraph_ipfs_hash, variables=None, ):
 
 
     """
-    load_dotenv()
 
-    API_GATEWAY = os.getenv('API_GATEWAY')
 
     query = """
     query subgraphSpecificData($input:String!){
@@ -630,14 +636,88 @@ def getSpecificSubgraphData(subgraph_ipfs_hash, variables=None, ):
     request_json = {'query': query}
     if subgraph_ipfs_hash:
         request_json['variables'] = variables
-    resp = requests.post(API_GATEWAY, json=request_json)
-    data = json.loads(resp.text)
+    data = await asyncPostGraphqlQuery(request_json, endpoint='mainnet')
     subgraph_data = data['data']['subgraphDeployments']
 
     return subgraph_data
 
 
-def getDataAllocationOptimizer(indexer_id, network='mainnet', variables=None, ):
+def getSpecificSubgraphData(subgraph_ipfs_hash, variables=None, ):
+    """Sync wrapper of asyncGetSpecificSubgraphData."""
+    return runAsync(asyncGetSpecificSubgraphData(subgraph_ipfs_hash=subgraph_ipfs_hash, variables=variables))
+
+
+async def asyncGetSubgraphDeploymentsData(network='mainnet'):
+    """Get's all subgraph deployments with name, signal and stake. The deployments are paged concurrently
+    with an id cursor.
+
+    Returns
+    -------
+    list
+        [{'originalName': ..., 'signalledTokens': ..., 'stakedTokens': ..., 'id': ...}, ...] ordered by id
+    """
+    query = """
+        query subgraphDeployments($first: Int, $id_gt: String, $id_lt: String) {
+          subgraphDeployments(first: $first, orderBy: id, orderDirection: asc,
+                              where: {id_gt: $id_gt, id_lt: $id_lt}) {
+            originalName
+            signalledTokens
+            stakedTokens
+            id
+          }
+        }
+        """
+    subgraph_deployments = [subgraph_deployment async for subgraph_deployment
+                            in asyncPaginateGraphqlQuery(query, 'subgraphDeployments', endpoint=network)]
+    return sorted(subgraph_deployments, key=lambda subgraph_deployment: subgraph_deployment['id'])
+
+
+def getSubgraphDeploymentsData(network='mainnet'):
+    """Sync wrapper of asyncGetSubgraphDeploymentsData."""
+    return runAsync(asyncGetSubgraphDeploymentsData(network=network))
+
+
+async def asyncGetIndexerAllocationsData(indexer_ids, network='mainnet'):
+    """Get's all active allocations of the indexers. The allocations are paged concurrently with an id cursor.
+
+    Returns
+    -------
+    dict
+        {indexer_id: [{'allocatedTokens': ..., 'id': ..., 'subgraphDeployment': {...}, 'indexingRewards': ...}]}
+        with the allocations ordered by id
+    """
+    indexer_ids = [indexer_id.lower() for indexer_id in indexer_ids]
+    query = """
+        query allocations($input: [String!], $first: Int, $id_gt: String, $id_lt: String) {
+          allocations(first: $first, orderBy: id, orderDirection: asc,
+                      where: {activeForIndexer_in: $input, id_gt: $id_gt, id_lt: $id_lt}) {
+            allocatedTokens
+            id
+            subgraphDeployment {
+              originalName
+              id
+            }
+            indexingRewards
+            activeForIndexer {
+              id
+            }
+          }
+        }
+        """
+    indexer_allocations = {indexer_id: [] for indexer_id in indexer_ids}
+    async for allocation in asyncPaginateGraphqlQuery(query, 'allocations', variables={'input': indexer_ids}, endpoint=network):
+        indexer_allocations[allocation.pop('activeForIndexer')['id']].append(allocation)
+    for allocations in indexer_allocations.values():
+        allocations.sort(key=lambda allocation: allocation['id'])
+    return indexer_allocations
+
+
+def getIndexerAllocationsData(indexer_ids, network='mainnet'):
+    """Sync wrapper of asyncGetIndexerAllocationsData."""
+    return runAsync(asyncGetIndexerAllocationsData(indexer_ids=indexer_ids, network=network))
+
+
+async def asyncGetDataAllocationOptimizer(indexer_id, network='mainnet', variables=None, ):
     """
     Grabs all relevant Data from the Mainnet Meta Subgraph which are used for the
     Optimizer
@@ -650,33 +730,18 @@ def getDataAllocationOptimizer(indexer_id, network='mainnet', variables=None, ):
 
     Dict with Subgraph Data (All Subgraphs with Name, SignalledTokens, Stakedtokens, Id),
     Indexer Data (Allocated Tokens Total and all Allocations),
-    Graph Network Data (Total Tokens Allocated, total TokensStaked, Total Supply, GRT Issurance)
+    Graph Network Data (Total Tokens Allocated, total TokensStaked, Total Supply, GRT Issurance),
+    Meta Data (Block Number of the Data)
     """
     indexer_id = indexer_id.lower()
-    load_dotenv()
     if network == 'mainnet':
-        API_GATEWAY = os.getenv('API_GATEWAY')
         OPTIMIZATION_DATA = """
             query MyQuery($input: String){
-              subgraphDeployments(first: 1000) {
-                originalName
-                signalledTokens
-                stakedTokens
-                id
-              }
               indexer(id: $input) {
                 tokenCapacity
                 allocatedTokens
                 stakedTokens
-                allocations {
-                  allocatedTokens
-                  id
-                  subgraphDeployment {
-                    originalName
-                    id
-                  }
-                  indexingRewards
-                }
+                delegatedTokens
                 account {
                   defaultName {
                     name
@@ -691,19 +756,17 @@ def getDataAllocationOptimizer(indexer_id, network='mainnet', variables=None, ):
                 totalSupply
                 networkGRTIssuance
               }
+              _meta {
+                block {
+                  number
+                }
+              }
             }
             """
         variables = {'input': indexer_id}
     else:
-        API_GATEWAY = os.getenv('TESTNET_GATEWAY')
         OPTIMIZATION_DATA = """
         query MyQuery($input: String) {
-            subgraphDeployments {
-            originalName
-            signalledTokens
-            stakedTokens
-            id
-          }
           graphNetworks {
             totalTokensAllocated
             totalTokensStaked
@@ -716,15 +779,7 @@ def getDataAllocationOptimizer(indexer_id, network='mainnet', variables=None, ):
             tokenCapacity
             allocatedTokens
             stakedTokens
-            allocations {
-              allocatedTokens
-              id
-              subgraphDeployment {
-                originalName
-                id
-              }
-              indexingRewards
-            }
+            delegatedTokens
             account {
               defaultName {
                 name
@@ -735,6 +790,11 @@ def getDataAllocationOptimizer(indexer_id, network='mainnet', variables=None, ):
               createdAt
             }
           }
+          _meta {
+            block {
+              number
+            }
+          }
           }
         """
         variables = {'input': indexer_id}
@@ -743,10 +803,95 @@ def getDataAllocationOptimizer(indexer_id, network='mainnet', variables=None, ):
     request_json = {'query': OPTIMIZATION_DATA}
     if indexer_id:
         request_json['variables'] = variables
-    resp = requests.post(API_GATEWAY, json=request_json)
-    data = json.loads(resp.text)
+
+    # page the subgraph deployments and the allocations while the indexer and network data are fetched
+    data, subgraph_deployments, allocations = await asyncio.gather(
+        asyncPostGraphqlQuery(request_json, endpoint=network),
+        asyncGetSubgraphDeploymentsData(network),
+        asyncGetIndexerAllocationsData([indexer_id], network))
     data = data['data']
+    data['subgraphDeployments'] = subgraph_deployments
+    indexer_allocations = allocations[indexer_id]
+
+    indexers = [data['indexer']] if network == 'mainnet' else data['indexers']
+    for indexer in indexers:
+        if indexer is not None:
+            indexer['allocations'] = indexer_allocations
 
     return data
 
 
+def getDataAllocationOptimizer(indexer_id, network='mainnet', variables=None, ):
+    """Sync wrapper of asyncGetDataAllocationOptimizer."""
+    return runAsync(asyncGetDataAllocationOptimizer(indexer_id=indexer_id, network=network, variables=variables))
+
+
+async def asyncGetDataAllocationOptimizerBatch(indexer_ids, network='mainnet'):
+    """
+    Grabs the data of getDataAllocationOptimizer for several indexers in one query. The subgraph deployments,
+    the graph network and the block are fetched once, the stake and allocations of all indexers in one
+    batched indexers query.
+
+    Parameter
+    -------
+        indexer_ids : Addresses of the Indexers to get the Data From
+    Returns
+    -------
+
+    Dict with Subgraph Data, Graph Network Data, Meta Data and Indexer Data of the requested indexers
+    (key: lower case indexer id)
+    """
+    indexer_ids = [indexer_id.lower() for indexer_id in indexer_ids]
+    OPTIMIZATION_DATA = """
+        query MyQuery($input: [String!], $amount: Int){
+          indexers(first: $amount, where: {id_in: $input}) {
+            id
+            tokenCapacity
+            allocatedTokens
+            stakedTokens
+            delegatedTokens
+            account {
+              defaultName {
+                name
+              }
+            }
+          }
+          graphNetworks {
+            totalTokensAllocated
+            totalTokensStaked
+            totalIndexingRewards
+            totalTokensSignalled
+            totalSupply
+            networkGRTIssuance
+          }
+          _meta {
+            block {
+              number
+            }
+          }
+        }
+        """
+    variables = {'input': indexer_ids, 'amount': len(indexer_ids)}
+
+    request_json = {'query': OPTIMIZATION_DATA, 'variables': variables}
+
+    # page the subgraph deployments and the allocations of all indexers while the indexer data are fetched
+    data, subgraph_deployments, indexer_allocations = await asyncio.gather(
+        asyncPostGraphqlQuery(request_json, endpoint=network),
+        asyncGetSubgraphDeploymentsData(network),
+        asyncGetIndexerAllocationsData(indexer_ids, network))
+    data = data['data']
+    data['subgraphDeployments'] = subgraph_deployments
+
+    data['indexers'] = {indexer['id']: indexer for indexer in data['indexers']}
+    for indexer_id, indexer in data['indexers'].items():
+        indexer['allocations'] = indexer_allocations[indexer_id]
+
+    return data
+
+
+def getDataAllocationOptimizerBatch(indexer_ids, network='mainnet'):
+    """Sync wrapper of asyncGetDataAllocationOptimizerBatch."""
+    return runAsync(asyncGetDataAllocationOptimizerBatch(indexer_ids=indexer_ids, network=network))
+
+
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from src.config import CONFIG_PATH
+
+# time to live in seconds of a cached response by top-level field of the query. A query with several fields
+# (e.g. indexer, graphNetworks and _meta) is cached with the shortest ttl of its fields, 0 disables the cache
+QUERY_CACHE_TTLS = {'subgraphDeployments': 300,
+                    'subgraphs': 600,
+                    'graphAccount': 600,
+                    'graphNetworks': 300,
+                    'epoch': 86400,
+                    'indexer': 60,
+                    'indexers': 60,
+                    'allocation': 60,
+                    'allocations': 60,
+                    'indexingStatuses': 60,
+                    '_meta': 60}
+QUERY_CACHE_DEFAULT_TTL = 60
+
+# responses of queries pinned to a block number (see graphql_client.blockPin) never change
+PINNED_QUERY_TTL = float('inf')
+
+# endpoints that are never cached, the indexing rules of the indexer agent change with every mutation
+UNCACHED_ENDPOINTS = ['indexer_management']
+
+# max amount of responses in the in-memory tier (least recently used are dropped first)
+QUERY_CACHE_SIZE = 512
+
+# on-disk tier, shared by the processes and reruns of the dashboard. Enabled with {"query_cache": {"disk": true}}
+QUERY_CACHE_PATH = "./data/query_cache.db"
+
+_QUERY_CACHE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        expires REAL NOT NULL,
+        response BLOB NOT NULL
+    );
+"""
+
+# in-memory tier ({key: (expires, response json)}), configuration, hit / miss counters and the connections to the
+# on-disk tier per path, created once per process. Forked worker processes open their own connections, the pid
+# detects a fork. The lock guards the in-memory tier and the connections
+_query_cache = {'entries': OrderedDict(), 'lock': threading.Lock(), 'config': None, 'pid': None, 'connections': {},
+                'stats': {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'uncached': 0}}
+
+
+def getQueryCacheConfig():
+    """Get's the configuration of the query cache, loaded once from the "query_cache" of the config.json, e.g.
+    {"query_cache": {"enabled": true, "disk": true, "size": 1024, "ttls": {"subgraphDeployments": 600}}}
+
+    Returns
+    -------
+    dict
+        enabled, disk, size and ttls of the query cache
+    """
+    if _query_cache['config'] is None:
+        overrides = {}
+        if os.path.isfile(CONFIG_PATH):
+            with open(CONFIG_PATH, "r") as jsonfile:
+                overrides = json.load(jsonfile).get('query_cache', {})
+        _query_cache['config'] = {'enabled': overrides.get('enabled', True),
+                                  'disk': overrides.get('disk', False),
+                                  'size': overrides.get('size', QUERY_CACHE_SIZE),
+                                  'ttls': dict(QUERY_CACHE_TTLS, **overrides.get('ttls', {}))}
+    return _query_cache['config']
+
+
+def topLevelFields(query):
+    """Get's the operation type and the top-level fields of a GraphQL query with their position, arguments are
+    skipped.
+
+    Returns
+    -------
+    str, list
+        "query" or "mutation", (name, index after the name) of the top-level fields
+    """
+    head, _, _ = query.partition('{')
+    operation = 'mutation' if head.strip().startswith('mutation') else 'query'
+    fields, depth, parentheses, name = [], 0, 0, ''
+    for index in range(len(head), len(query)):
+        character = query[index]
+        if character == '(':
+            parentheses += 1
+        elif character == ')':
+            parentheses -= 1
+        elif parentheses:
+            continue
+        elif character == '{':
+            depth += 1
+        elif character == '}':
+            depth -= 1
+        elif depth == 1 and (character.isalnum() or character == '_'):
+            name += character
+            continue
+        elif depth == 1 and character == ':':
+            # alias of the field, the field name follows
+            name = ''
+            continue
+        if name and depth <= 2:
+            fields.append((name, index))
+        name = ''
+    return operation, fields
+
+
+def queryFields(query):
+    """Get's the operation type and the names of the top-level fields of a GraphQL query.
+
+    Returns
+    -------
+    str, list
+        "query" or "mutation", names of the top-level fields
+    """
+    operation, fields = topLevelFields(query)
+    return operation, list(dict.fromkeys(name for name, _ in fields))
+
+
+def queryTtl(request_json, endpoint, pinned=False):
+    """Get's the time to live of the response of a GraphQL request, 0 if the request must not be cached.
+    Requests pinned to a block are cached forever.
+
+    Returns
+    -------
+    float
+        seconds
+    """
+    config = getQueryCacheConfig()
+    if not config['enabled'] or endpoint in UNCACHED_ENDPOINTS:
+        return 0
+    operation, fields = queryFields(request_json['query'])
+    if operation == 'mutation' or not fields:
+        return 0
+    if pinned:
+        return PINNED_QUERY_TTL
+    return min(config['ttls'].get(field, QUERY_CACHE_DEFAULT_TTL) for field in fields)
+
+
+def queryCacheKey(request_json, endpoint):
+    """Get's the cache key of a GraphQL request: hash of the endpoint, the query text and the variables."""
+    key = json.dumps([endpoint, request_json['query'], request_json.get('variables')], sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def connectQueryCache(path=QUERY_CACHE_PATH):
+    """Get's the connection of the process to the on-disk tier of the query cache. It is opened (and the table
+    created) once per process, call while holding _query_cache['lock'].
+
+    Returns
+    -------
+    sqlite3.Connection
+    """
+    if _query_cache['pid'] != os.getpid():
+        _query_cache.update(pid=os.getpid(), connections={})
+    if path not in _query_cache['connections']:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        connection.executescript(_QUERY_CACHE_SCHEMA)
+        _query_cache['connections'][path] = connection
+    return _query_cache['connections'][path]
+
+
+def getCachedQuery(request_json, endpoint, pinned=False):
+    """Looks up the response of a GraphQL request in the in-memory and the on-disk tier.
+
+    Returns
+    -------
+    dict
+        copy of the cached json response, None on a miss or if the request is not cached
+    """
+    if queryTtl(request_json, endpoint, pinned=pinned) <= 0:
+        _countLookup('uncached')
+        return None
+    key = queryCacheKey(request_json, endpoint)
+    now = time.time()
+    with _query_cache['lock']:
+        entry = _query_cache['entries'].get(key)
+        if entry is not None and entry[0] > now:
+            _query_cache['entries'].move_to_end(key)
+            _query_cache['stats']['memory_hits'] += 1
+            return json.loads(entry[1])
+    if getQueryCacheConfig()['disk']:
+        with _query_cache['lock']:
+            row = connectQueryCache().execute("SELECT expires, response FROM responses WHERE key = ? AND expires > ?",
+                                              (key, now)).fetchone()
+        if row is not None:
+            _storeEntry(key, row[0], row[1])
+            _countLookup('disk_hits')
+            return json.loads(row[1])
+    _countLookup('misses')
+    return None
+
+
+def setCachedQuery(request_json, endpoint, response, pinned=False):
+    """Caches the json response of a GraphQL request with the ttl of the query. Responses with errors are not
+    cached."""
+    ttl = queryTtl(request_json, endpoint, pinned=pinned)
+    if ttl <= 0 or 'errors' in response:
+        return
+    key = queryCacheKey(request_json, endpoint)
+    expires = time.time() + ttl
+    # stored as json text, every hit gets its own copy that the callers can modify
+    content = json.dumps(response)
+    _storeEntry(key, expires, content)
+    if getQueryCacheConfig()['disk']:
+        with _query_cache['lock']:
+            # the connection commits the transaction
+            with connectQueryCache() as connection:
+                connection.execute("INSERT OR REPLACE INTO responses (key, expires, response) VALUES (?, ?, ?)",
+                                   (key, expires, content))
+
+
+def _countLookup(counter):
+    with _query_cache['lock']:
+        _query_cache['stats'][counter] += 1
+
+
+def _storeEntry(key, expires, content):
+    with _query_cache['lock']:
+        _query_cache['entries'][key] = (expires, content)
+        _query_cache['entries'].move_to_end(key)
+        while len(_query_cache['entries']) > getQueryCacheConfig()['size']:
+            _query_cache['entries'].popitem(last=False)
+
+
+def clearQueryCache(disk=False):
+    """Drops the in-memory tier and the counters of the query cache, with disk=True also the on-disk tier."""
+    with _query_cache['lock']:
+        _query_cache['entries'].clear()
+        for counter in _query_cache['stats']:
+            _query_cache['stats'][counter] = 0
+    if disk and os.path.isfile(QUERY_CACHE_PATH):
+        with _query_cache['lock'], connectQueryCache() as connection:
+            connection.execute("DELETE FROM responses")
+
+
+def getQueryCacheStats():
+    """Get's the hit and miss counters of the query cache since the start of the process.
+
+    Returns
+    -------
+    dict
+        memory_hits, disk_hits, misses, uncached (requests that are not cached), entries and hit_rate
+    """
+    with _query_cache['lock']:
+        stats = dict(_query_cache['stats'], entries=len(_query_cache['entries']))
+    lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+    stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0
+    return stats
+
+
+def printQueryCacheStats():
+    """Prints the hit and miss counters of the query cache."""
+    stats = getQueryCacheStats()
+    print(f"Query cache: {stats['memory_hits']} memory hits, {stats['disk_hits']} disk hits, {stats['misses']} misses "
+          f"({stats['hit_rate'] * 100:.1f}% hit rate), {stats['uncached']} uncached, {stats['entries']} entries")
@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import threading
+import time
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.middleware import geth_poa_middleware
+from src.timings import countHttpResponse
+
+# json-rpc endpoints, urls from the environment variable (.env). Several urls are separated by commas, e.g.
+# RPC_URL = 'https://primary.example/rpc,https://fallback.example/rpc', the first healthy one is used
+RPC_ENDPOINTS = {'mainnet': 'RPC_URL',
+                 'testnet': 'RPC_URL_TESTNET'}
+
+# networks that need the geth_poa_middleware (extraData of proof of authority blocks)
+POA_NETWORKS = ['testnet']
+
+# (connect, read) timeout in seconds of the requests of the web3 clients
+RPC_TIMEOUT = (5, 60)
+
+# seconds between the health checks of the endpoints of a network and seconds an endpoint that failed is skipped
+RPC_HEALTH_CHECK_INTERVAL = 300
+RPC_FAILURE_COOLDOWN = 60
+
+# an endpoint that is more blocks behind the most recent endpoint is unhealthy
+RPC_MAX_BLOCK_LAG = 10
+
+# web3 client, endpoints and health per network and the contracts per (network, address), created once per process.
+# Forked worker processes create their own pool, the pid detects a fork
+_rpc_pool = {'pid': None, 'networks': {}, 'contracts': {}, 'lock': threading.RLock()}
+
+
+def getRpcUrls(network='mainnet'):
+    """Get's the json-rpc urls of the network, the healthy endpoints first (in the configured order), then the
+    endpoints that failed recently as last resort.
+
+    Returns
+    -------
+    list
+        urls
+    """
+    pool = _getNetworkPool(network)
+    now = time.time()
+    healthy = [url for url in pool['urls'] if pool['down_until'].get(url, 0) <= now]
+    return healthy + sorted((url for url in pool['urls'] if url not in healthy), key=lambda url: pool['down_until'][url])
+
+
+def markRpcUnhealthy(network, url):
+    """Skips a failed endpoint of the network for RPC_FAILURE_COOLDOWN seconds."""
+    pool = _getNetworkPool(network)
+    pool['down_until'][url] = time.time() + RPC_FAILURE_COOLDOWN
+
+
+def checkRpcHealth(network='mainnet'):
+    """Checks the endpoints of the network with eth_blockNumber. Endpoints that fail or lag more than
+    RPC_MAX_BLOCK_LAG blocks behind the most recent endpoint are skipped until the next check.
+
+    Returns
+    -------
+    dict
+        {url: block number, None if the endpoint failed}
+    """
+    pool = _getNetworkPool(network)
+    blocks = {}
+    for url in pool['urls']:
+        try:
+            response = pool['providers'][url].make_request('eth_blockNumber', [])
+            blocks[url] = int(response['result'], 16)
+        except (requests.RequestException, KeyError, ValueError):
+            blocks[url] = None
+    latest = max((block for block in blocks.values() if block is not None), default=None)
+    next_check = time.time() + RPC_HEALTH_CHECK_INTERVAL
+    for url, block in blocks.items():
+        if block is None or latest - block > RPC_MAX_BLOCK_LAG:
+            pool['down_until'][url] = next_check
+        else:
+            pool['down_until'].pop(url, None)
+    pool['checked'] = time.time()
+    return blocks
+
+
+def _getNetworkPool(network):
+    with _rpc_pool['lock']:
+        if _rpc_pool['pid'] != os.getpid():
+            _rpc_pool.update(pid=os.getpid(), networks={}, contracts={})
+        if network not in _rpc_pool['networks']:
+            load_dotenv()
+            urls = [url.strip() for url in (os.getenv(RPC_ENDPOINTS[network]) or '').split(',') if url.strip()]
+            providers = {}
+            for url in urls:
+                # own keep-alive session per endpoint, web3 closes the sessions it evicts from its session cache
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.hooks['response'].append(countHttpResponse)
+                providers[url] = Web3.HTTPProvider(url, request_kwargs={'timeout': RPC_TIMEOUT}, session=session)
+            _rpc_pool['networks'][network] = {'urls': urls, 'providers': providers, 'down_until': {},
+                                              'checked': None, 'web3': None}
+        return _rpc_pool['networks'][network]
+
+
+def failoverMiddleware(network):
+    """Creates the innermost web3 middleware of a network: sends every request to the first healthy endpoint and
+    fails over to the next endpoint on connection errors, timeouts and http errors."""
+    def middleware(make_request, web3):
+        def failover(method, params):
+            urls = getRpcUrls(network)
+            for url in urls:
+                try:
+                    return _getNetworkPool(network)['providers'][url].make_request(method, params)
+                except requests.RequestException:
+                    markRpcUnhealthy(network, url)
+                    if url == urls[-1]:
+                        raise
+        return failover
+    return middleware
+
+
+def getWeb3(network='mainnet'):
+    """Get's the shared web3 client of the network. It is created once per process with keep-alive sessions and
+    failover over the endpoints of the network, the endpoints are health checked every RPC_HEALTH_CHECK_INTERVAL
+    seconds if there are several.
+
+    Parameters
+    -------
+        network (str): "mainnet" or "testnet"
+
+    Returns
+    -------
+    object
+        web3 instance
+    """
+    pool = _getNetworkPool(network)
+    with _rpc_pool['lock']:
+        if pool['web3'] is None:
+            if not pool['urls']:
+                raise ValueError(f"{RPC_ENDPOINTS[network]} is not set")
+            web3 = Web3(pool['providers'][pool['urls'][0]])
+            if network in POA_NETWORKS:
+                web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+            web3.middleware_onion.inject(failoverMiddleware(network), name='failover', layer=0)
+            logging.getLogger("web3.RequestManager").setLevel(logging.WARNING)
+            logging.getLogger("web3.providers.HTTPProvider").setLevel(logging.WARNING)
+            pool['web3'] = web3
+        if len(pool['urls']) > 1 and (pool['checked'] is None
+                                      or time.time() - pool['checked'] > RPC_HEALTH_CHECK_INTERVAL):
+            checkRpcHealth(network)
+    return pool['web3']
+
+
+def getContract(address, abi, network='mainnet'):
+    """Get's the shared contract object of the address on the network, the abi is only parsed when the contract is
+    created.
+
+    Parameters
+    -------
+        address (str): contract address
+        abi (str, list): abi json
+        network (str): "mainnet" or "testnet"
+
+    Returns
+    -------
+    object
+        web3 contract
+    """
+    web3 = getWeb3(network)
+    key = (network, address)
+    with _rpc_pool['lock']:
+        if key not in _rpc_pool['contracts']:
+            _rpc_pool['contracts'][key] = web3.eth.contract(address=Web3.toChecksumAddress(address),
+                                                            abi=json.loads(abi) if isinstance(abi, str) else abi)
+        return _rpc_pool['contracts'][key]
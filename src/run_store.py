@@ -0,0 +1,183 @@
+import os
+import json
+import sqlite3
+import threading
+
+# append-only store of the optimization runs
+RUN_STORE_PATH = "./data/optimizer_log.db"
+
+# json log of the optimization runs before the run store, migrated once into the store
+LEGACY_LOG_PATH = "./data/optimizer_log.json"
+
+_RUN_STORE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        datetime TEXT NOT NULL,
+        indexer_id TEXT,
+        network TEXT,
+        threshold_reached INTEGER,
+        input_hash TEXT,
+        run TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS runs_datetime ON runs (datetime);
+    CREATE INDEX IF NOT EXISTS runs_indexer_id ON runs (indexer_id, datetime);
+    CREATE INDEX IF NOT EXISTS runs_input_hash ON runs (input_hash);
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+"""
+
+# connections to the run stores per path, opened once per process. Forked worker processes (src.batch) open their
+# own connection, the pid detects a fork. The lock serializes the use of a connection by several threads
+_run_store = {'pid': None, 'connections': {}, 'lock': threading.RLock()}
+
+
+def connectRunStore(path=RUN_STORE_PATH, legacy_path=LEGACY_LOG_PATH):
+    """Get's the connection of the process to the run store. The store is opened once per process and path: the
+    tables and indexes are created and the legacy json log is migrated once.
+
+    Returns
+    -------
+    sqlite3.Connection
+        connection to the run store, use it while holding _run_store['lock']
+    """
+    with _run_store['lock']:
+        if _run_store['pid'] != os.getpid():
+            _run_store.update(pid=os.getpid(), connections={})
+        if path not in _run_store['connections']:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            # parallel runs (src.batch) wait for the write lock of each other
+            connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            # stores created before the memoization have no input_hash column
+            columns = [column[1] for column in connection.execute("PRAGMA table_info(runs)")]
+            if columns and 'input_hash' not in columns:
+                connection.execute("ALTER TABLE runs ADD COLUMN input_hash TEXT")
+            connection.executescript(_RUN_STORE_SCHEMA)
+            # the write lock is held from the check to the migration, parallel processes migrate the log once
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                migrated = connection.execute("SELECT value FROM meta WHERE key = 'legacy_log_migrated'").fetchone()
+                if not migrated:
+                    migrateLegacyLog(connection, legacy_path)
+            finally:
+                # commits the migration, a failed migration was rolled back already
+                connection.commit()
+            _run_store['connections'][path] = connection
+        return _run_store['connections'][path]
+
+
+def migrateLegacyLog(connection, legacy_path=LEGACY_LOG_PATH):
+    """Copies the runs of the legacy json log (list of {datetime: run}) into the run store. Runs once per store,
+    the json log is kept as it is."""
+    runs = []
+    if os.path.isfile(legacy_path):
+        with open(legacy_path) as feedsjson:
+            runs = json.load(feedsjson)
+    with connection:
+        for optimizer_results in runs:
+            _insertRun(connection, optimizer_results)
+        connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_log_migrated', ?)",
+                           (str(len(runs)),))
+    if runs:
+        print(f"Migrated {len(runs)} runs from {legacy_path} to the run store")
+
+
+def _insertRun(connection, optimizer_results, input_hash=None):
+    for current_datetime, run in optimizer_results.items():
+        parameters = run.get('parameters', {})
+        threshold_reached = run.get('optimizer', {}).get('threshold_reached')
+        connection.execute(
+            "INSERT INTO runs (datetime, indexer_id, network, threshold_reached, input_hash, run) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (current_datetime, (parameters.get('indexer_id') or '').lower() or None, parameters.get('network'),
+             None if threshold_reached is None else int(threshold_reached), input_hash, json.dumps(run)))
+
+
+def appendRun(optimizer_results, input_hash=None, path=RUN_STORE_PATH):
+    """Appends the results of an optimization run ({datetime: run}) with the hash of its inputs to the run store."""
+    connection = connectRunStore(path)
+    with _run_store['lock'], connection:
+        _insertRun(connection, optimizer_results, input_hash=input_hash)
+
+
+def findRunByInputHash(input_hash, path=RUN_STORE_PATH):
+    """Get's the latest run with the input hash (see src.memoization.hashOptimizerInputs).
+
+    Returns
+    -------
+    dict
+        run or None if there is no run with the input hash
+    """
+    connection = connectRunStore(path)
+    with _run_store['lock']:
+        row = connection.execute("SELECT run FROM runs WHERE input_hash = ? ORDER BY id DESC LIMIT 1",
+                                 (input_hash,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def getRun(current_datetime, indexer_id=None, path=RUN_STORE_PATH):
+    """Get's the latest run at the datetime (optionally of the indexer).
+
+    Returns
+    -------
+    dict
+        {datetime: run} or None if there is no run
+    """
+    connection = connectRunStore(path)
+    query = "SELECT datetime, run FROM runs WHERE datetime = ?"
+    arguments = [current_datetime]
+    if indexer_id:
+        query += " AND indexer_id = ?"
+        arguments.append(indexer_id.lower())
+    with _run_store['lock']:
+        row = connection.execute(query + " ORDER BY id DESC LIMIT 1", arguments).fetchone()
+    return {row[0]: json.loads(row[1])} if row else None
+
+
+def getRunById(run_id, path=RUN_STORE_PATH):
+    """Get's a run by its id in the run store (see listRuns).
+
+    Returns
+    -------
+    dict
+        {datetime: run} or None if there is no run
+    """
+    connection = connectRunStore(path)
+    with _run_store['lock']:
+        row = connection.execute("SELECT datetime, run FROM runs WHERE id = ?", (run_id,)).fetchone()
+    return {row[0]: json.loads(row[1])} if row else None
+
+
+def listRuns(indexer_id=None, limit=20, offset=0, path=RUN_STORE_PATH):
+    """Lists the runs newest first without loading the run data.
+
+    Returns
+    -------
+    list
+        dicts with id, datetime, indexer_id, network and threshold_reached of the runs on the page
+    """
+    connection = connectRunStore(path)
+    query = "SELECT id, datetime, indexer_id, network, threshold_reached FROM runs"
+    arguments = []
+    if indexer_id:
+        query += " WHERE indexer_id = ?"
+        arguments.append(indexer_id.lower())
+    with _run_store['lock']:
+        rows = connection.execute(query + " ORDER BY id DESC LIMIT ? OFFSET ?",
+                                  arguments + [limit, offset]).fetchall()
+    return [{'id': row[0], 'datetime': row[1], 'indexer_id': row[2], 'network': row[3],
+             'threshold_reached': None if row[4] is None else bool(row[4])} for row in rows]
+
+
+def countRuns(indexer_id=None, path=RUN_STORE_PATH):
+    """Counts the runs (optionally of the indexer)."""
+    connection = connectRunStore(path)
+    with _run_store['lock']:
+        if indexer_id:
+            count = connection.execute("SELECT COUNT(*) FROM runs WHERE indexer_id = ?",
+                                       (indexer_id.lower(),)).fetchone()
+        else:
+            count = connection.execute("SELECT COUNT(*) FROM runs").fetchone()
+    return count[0]
@@ -1,9 +1,11 @@
 import json
-import requests
-import base58
+from src.deployment_registry import getIpfsHash
+from src.graphql_client import postGraphqlQuery
+from src.queries import getSubgraphDeploymentsData
 import os
-from dotenv import load_dotenv
-def createAllocationScript(indexer_id, fixed_allocations, blacklist_parameter=True, parallel_allocations=1, network='mainnet'):
+from src.config import CONFIG_PATH
+def createAllocationScript(indexer_id, fixed_allocations, blacklist_parameter=True, parallel_allocations=1, network='mainnet',
+                           indexer_data=None, subgraph_data=None, script_directory="."):
     """ Creates the script.txt file for reallocating based on the inputs of the optimizer
     script.
 
@@ -13,6 +15,9 @@ def createAllocationScript(indexer_id, fixed_allocations, blacklist_parameter=Tr
         fixed_allocation : output set of optimizer
         blacklist_parameter: True/False , filter blacklisted subgraphs
         parallel_allocations : set amount of parallel allocations
+        indexer_data : indexer data (e.g. of a snapshot), fetched from the gateway if not supplied
+        subgraph_data : subgraph deployments (e.g. of a snapshot), fetched from the gateway if not supplied
+        script_directory : directory of the script.txt and script_never.txt
 
 
     returns
@@ -22,14 +27,10 @@ def createAllocationScript(indexer_id, fixed_allocations, blacklist_parameter=Tr
     """
     indexer_id = indexer_id.lower()
 
-    load_dotenv()
-    if network == 'mainnet':
-        API_GATEWAY = os.getenv('API_GATEWAY')
-    else:
-        API_GATEWAY = os.getenv('TESTNET_GATEWAY')
+    endpoint = 'mainnet' if network == 'mainnet' else 'testnet'
     # get blacklisted subgraphs if wanted
     if blacklist_parameter:
-        with open("./config.json", "r") as jsonfile:
+        with open(CONFIG_PATH, "r") as jsonfile:
             INVALID_SUBGRAPHS = json.load(jsonfile).get('blacklist')
     else:
         INVALID_SUBGRAPHS = False
@@ -39,11 +40,12 @@ def createAllocationScript(indexer_id, fixed_allocations, blacklist_parameter=Tr
     fixed_allocation_sum = sum(list(fixed_allocations.values())) * parallel_allocations
 
     # get relevant indexer data
-    indexer_data = requests.post(
-        API_GATEWAY,
-        data='{"query":"{ indexer(id:\\"' + indexer_id + '\\") { account { defaultName { name } } stakedTokens delegatedTokens allocatedTokens tokenCapacity } }"}',
-        headers={'content-type': 'application/json', 'Accept-Charset': 'UTF-8'}
-    ).json()['data']['indexer']
+    if indexer_data is None:
+        indexer_data = postGraphqlQuery(
+            {'query': 'query indexer($input: ID!) { indexer(id: $input) { account { defaultName { name } } '
+                      'stakedTokens delegatedTokens allocatedTokens tokenCapacity } }',
+             'variables': {'input': indexer_id}},
+            endpoint=endpoint)['data']['indexer']
 
     # calculate remaining stake after the fixed_allocation_sum
     remaining_stake = int(indexer_data['tokenCapacity']) - int(fixed_allocation_sum)
@@ -61,11 +63,8 @@ def createAllocationScript(indexer_id, fixed_allocations, blacklist_parameter=Tr
         print("Not enough free stake for fixed allocation. Free to stake first")
         # sys.exit()
 
-    subgraph_data = requests.post(
-        API_GATEWAY,
-        data='{"query":"{ subgraphDeployments(first: 1000) { id originalName stakedTokens signalledTokens } }"}',
-        headers={'content-type': 'application/json', 'Accept-Charset': 'UTF-8'}
-    ).json()['data']['subgraphDeployments']
+    if subgraph_data is None:
+        subgraph_data = getSubgraphDeploymentsData(network=endpoint)
 
     subgraphs = set()
     invalid_subgraphs = set()
@@ -73,7 +72,7 @@ def createAllocationScript(indexer_id, fixed_allocations, blacklist_parameter=Tr
     total_stake = 0
 
     for subgraph_deployment in subgraph_data:
-        subgraph = base58.b58encode(bytearray.fromhex('1220' + subgraph_deployment['id'][2:])).decode("utf-8")
+        subgraph = getIpfsHash(subgraph_deployment['id'], name=subgraph_deployment['originalName'])
         if INVALID_SUBGRAPHS:
             if subgraph in INVALID_SUBGRAPHS:
                 #print(f"    Skipping invalid Subgraph: {subgraph_deployment['originalName']} ({subgraph})")
@@ -112,7 +111,8 @@ def createAllocationScript(indexer_id, fixed_allocations, blacklist_parameter=Tr
     print(f"Dynamic Allocation: {dynamic_allocation / 10 ** 18:,.2f}")
     print('=' * 40)
     print()
-    script_file = open("./script.txt", "w+")
+    os.makedirs(script_directory, exist_ok=True)
+    script_file = open(os.path.join(script_directory, "script.txt"), "w+")
     # print(
     #    "graph indexer rules set global allocationAmount 10.0 parallelAllocations 2 minStake 500.0 decisionBasis rules && \\")
     for subgraph in subgraphs:
@@ -139,7 +139,7 @@ def createAllocationScript(indexer_id, fixed_allocations, blacklist_parameter=Tr
     script_file.close()
 
     # Disable rule -> this is required to "reset" allocations
-    script_never = open("./script_never.txt", "w+")
+    script_never = open(os.path.join(script_directory, "script_never.txt"), "w+")
 
     for subgraph in subgraphs:
         script_never.write(f"graph indexer rules set {subgraph} decisionBasis never && \\\n")
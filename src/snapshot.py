@@ -0,0 +1,198 @@
+from src.optimizer import getPriceData
+from src.queries import getDataAllocationOptimizer, getCurrentBlock, getCurrentBlockTestnet
+from src.multicall import getRewardsArrays
+from src.block_headers import getBlockBefore
+from src.graphql_client import blockPin
+from datetime import datetime
+import json
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# bump if the layout of the snapshot file changes
+SNAPSHOT_VERSION = 1
+
+# columns of the snapshot file. Subgraph deployments and allocations are stored as rows of one table,
+# distinguished by the record column. Token amounts are stored as strings to keep the wei precision
+SNAPSHOT_SCHEMA = pa.schema([
+    ('record', pa.string()),
+    ('id', pa.string()),
+    ('originalName', pa.string()),
+    ('signalledTokens', pa.string()),
+    ('stakedTokens', pa.string()),
+    ('subgraphDeployment', pa.string()),
+    ('allocatedTokens', pa.string()),
+    ('indexingRewards', pa.string()),
+    ('pending_rewards', pa.float64()),
+    ('rewards_one_hour_ago', pa.float64()),
+])
+
+
+def getPendingRewards(allocation_ids, block):
+    """Get's the pending rewards of the allocations at the block and at the first block one hour before it from the
+    RewardsManager contract.
+
+    Parameters
+    -------
+        allocation_ids (list): allocation ids
+        block (int): block number
+
+    Returns
+    -------
+    dict, dict
+        {allocation_id: pending rewards in GRT} at the block and one hour before the block, NaN if the call failed
+    """
+    pending_rewards, rewards_one_hour_ago = getRewardsArrays(allocation_ids, [block, getBlockBefore(block, 3600)])
+    return dict(zip(allocation_ids, pending_rewards.tolist())), dict(zip(allocation_ids, rewards_one_hour_ago.tolist()))
+
+
+def createSnapshot(indexer_id, network='mainnet', pin_block=True):
+    """Captures all network inputs of the optimizer (price data, gas price, subgraph, network and indexer data and
+    the pending rewards of the allocations) at one block. The snapshot can be passed to optimizeAllocations to run
+    the optimization offline.
+
+    Parameters
+    -------
+        indexer_id (str): The Graph Indexer Address
+        network (str): "mainnet" or "testnet"
+        pin_block (bool): pin all queries to the latest block indexed by the gateway (see blockPin)
+
+    Returns
+    -------
+    dict
+        snapshot with datetime, block, network, indexer_id, price_data, data (result of getDataAllocationOptimizer),
+        pending_rewards and rewards_one_hour_ago ({allocation_id: GRT})
+    """
+    # all queries and contract calls of the snapshot describe the block the gateway has indexed
+    with blockPin(network, enabled=pin_block) as pinned_block:
+        price_data = getPriceData()
+        data = getDataAllocationOptimizer(indexer_id=indexer_id, network=network)
+
+        # the block the subgraph data was indexed at, the pending rewards are fetched at the same block
+        if pinned_block is not None:
+            block = pinned_block
+        elif data.get('_meta'):
+            block = data['_meta']['block']['number']
+        elif network == 'mainnet':
+            block = getCurrentBlock()
+        else:
+            block = getCurrentBlockTestnet()
+
+        if network == 'mainnet':
+            allocations = data['indexer'].get('allocations') or []
+            pending_rewards, rewards_one_hour_ago = getPendingRewards(
+                [allocation['id'] for allocation in allocations], block)
+        else:
+            # @TODO pending rewards for testnet, the optimizer does not use them on testnet
+            pending_rewards, rewards_one_hour_ago = {}, {}
+
+    snapshot = {}
+    snapshot['datetime'] = datetime.now().strftime("%Y-%m-%d-%H:%M")
+    snapshot['block'] = block
+    snapshot['network'] = network
+    snapshot['indexer_id'] = indexer_id
+    snapshot['price_data'] = price_data
+    snapshot['data'] = data
+    snapshot['pending_rewards'] = pending_rewards
+    snapshot['rewards_one_hour_ago'] = rewards_one_hour_ago
+    return snapshot
+
+
+def saveSnapshot(snapshot, path):
+    """Saves the snapshot as parquet file. Subgraph deployments and allocations are stored as columns,
+    the price, network and indexer data as json in the file metadata.
+
+    Parameters
+    -------
+        snapshot (dict): snapshot created by createSnapshot
+        path (str): path of the parquet file
+    """
+    data = snapshot['data']
+    indexer_data = data['indexer'] if snapshot['network'] == 'mainnet' else data['indexers'][0]
+    allocations = indexer_data.get('allocations') or []
+
+    columns = {field.name: [] for field in SNAPSHOT_SCHEMA}
+    for subgraph in data['subgraphDeployments']:
+        row = {'record': 'subgraph', 'id': subgraph.get('id'), 'originalName': subgraph.get('originalName'),
+               'signalledTokens': subgraph.get('signalledTokens'), 'stakedTokens': subgraph.get('stakedTokens')}
+        for column in columns:
+            columns[column].append(row.get(column))
+    for allocation in allocations:
+        row = {'record': 'allocation', 'id': allocation.get('id'),
+               'originalName': allocation.get('subgraphDeployment').get('originalName'),
+               'subgraphDeployment': allocation.get('subgraphDeployment').get('id'),
+               'allocatedTokens': allocation.get('allocatedTokens'),
+               'indexingRewards': allocation.get('indexingRewards'),
+               'pending_rewards': snapshot['pending_rewards'].get(allocation.get('id')),
+               'rewards_one_hour_ago': snapshot['rewards_one_hour_ago'].get(allocation.get('id'))}
+        for column in columns:
+            columns[column].append(row.get(column))
+
+    metadata = {'version': SNAPSHOT_VERSION,
+                'datetime': snapshot['datetime'],
+                'block': snapshot['block'],
+                'network': snapshot['network'],
+                'indexer_id': snapshot['indexer_id'],
+                'price_data': snapshot['price_data'],
+                'graphNetworks': data['graphNetworks'],
+                'indexer': {key: value for key, value in indexer_data.items() if key != 'allocations'}}
+
+    table = pa.Table.from_pydict(columns, schema=SNAPSHOT_SCHEMA)
+    table = table.replace_schema_metadata({'snapshot': json.dumps(metadata)})
+    pq.write_table(table, path, compression='zstd')
+
+
+def loadSnapshot(path):
+    """Loads a snapshot saved with saveSnapshot.
+
+    Parameters
+    -------
+        path (str): path of the parquet file
+
+    Returns
+    -------
+    dict
+        snapshot in the same format as createSnapshot
+    """
+    table = pq.read_table(path)
+    metadata = json.loads(table.schema.metadata[b'snapshot'])
+    if metadata['version'] != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {metadata['version']} is not supported, "
+                         f"expected version {SNAPSHOT_VERSION}")
+
+    subgraphs = []
+    allocations = []
+    pending_rewards = {}
+    rewards_one_hour_ago = {}
+    for row in table.to_pylist():
+        if row['record'] == 'subgraph':
+            subgraphs.append({'originalName': row['originalName'], 'signalledTokens': row['signalledTokens'],
+                              'stakedTokens': row['stakedTokens'], 'id': row['id']})
+        else:
+            allocations.append({'allocatedTokens': row['allocatedTokens'], 'id': row['id'],
+                                'subgraphDeployment': {'originalName': row['originalName'],
+                                                       'id': row['subgraphDeployment']},
+                                'indexingRewards': row['indexingRewards']})
+            if row['pending_rewards'] is not None:
+                pending_rewards[row['id']] = row['pending_rewards']
+                rewards_one_hour_ago[row['id']] = row['rewards_one_hour_ago']
+
+    indexer_data = metadata['indexer']
+    indexer_data['allocations'] = allocations
+    data = {'subgraphDeployments': subgraphs,
+            'graphNetworks': metadata['graphNetworks'],
+            '_meta': {'block': {'number': metadata['block']}}}
+    if metadata['network'] == 'mainnet':
+        data['indexer'] = indexer_data
+    else:
+        data['indexers'] = [indexer_data]
+
+    snapshot = {}
+    snapshot['datetime'] = metadata['datetime']
+    snapshot['block'] = metadata['block']
+    snapshot['network'] = metadata['network']
+    snapshot['indexer_id'] = metadata['indexer_id']
+    snapshot['price_data'] = metadata['price_data']
+    snapshot['data'] = data
+    snapshot['pending_rewards'] = pending_rewards
+    snapshot['rewards_one_hour_ago'] = rewards_one_hour_ago
+    return snapshot
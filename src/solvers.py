@@ -0,0 +1,470 @@
+import numpy as np
+import pyomo.environ as pyomo
+
+# Available Solver Engines for the Allocation Optimization
+# glpk -> Pyomo Model solved with the GLPK Solver
+# fast -> closed-form fractional knapsack solution, falls back to glpk if the problem does not fit
+# exact -> maximizes the true diminishing indexing reward x / (stake + x) with water-filling
+# highs -> Pyomo Model solved in memory with the persistent APPSI HiGHS interface (no temp files)
+# linprog -> sparse matrix LP solved with scipy's HiGHS linprog, supports additional group constraints
+SOLVER_ENGINES = ['glpk', 'fast', 'exact', 'highs', 'linprog']
+
+# relative slack of the reward upper bound for the tolerances of the solver engines
+UPPER_BOUND_TOLERANCE = 1e-6
+
+
+def isKnapsackShape(coefficients, budget, lower, upper):
+    """Checks if the optimization problem is a fractional knapsack problem, which can be solved
+    exactly by sorting the objective coefficients.
+
+    Parameters
+    -------
+        coefficients (np.array): objective coefficient per subgraph
+        budget (float): total stake that can be allocated
+        lower (float): min allocation per subgraph
+        upper (float|np.array): max allocation per subgraph
+
+    Returns
+    -------
+    bool
+        True if the closed-form solution is exact for the problem
+    """
+    if not np.all(np.isfinite(coefficients)) or np.any(coefficients < 0):
+        return False
+    if lower < 0 or np.any(lower > upper):
+        return False
+    # the min allocations have to fit into the stake that can be allocated
+    if len(coefficients) * lower > budget:
+        return False
+    return True
+
+
+def solveClosedForm(coefficients, budget, lower, upper):
+    """Solves the linear allocation problem max(sum(coefficients * x)) with sum(x) <= budget and
+    lower <= x <= upper. Every subgraph gets the min allocation, the remaining stake is filled into the
+    subgraphs with the highest coefficients until their max allocation is reached.
+
+    Parameters
+    -------
+        coefficients (np.array): objective coefficient per subgraph
+        budget (float): total stake that can be allocated
+        lower (float): min allocation per subgraph
+        upper (float|np.array): max allocation per subgraph
+
+    Returns
+    -------
+    np.array
+        Optimal allocation per subgraph
+    """
+    coefficients = np.asarray(coefficients, dtype=float)
+    allocations = np.full(len(coefficients), float(lower))
+    remaining_stake = budget - allocations.sum()
+
+    # sort subgraphs descending by coefficient, only subgraphs with a positive coefficient increase the rewards
+    order = np.argsort(-coefficients, kind='stable')
+    order = order[coefficients[order] > 0]
+
+    # fill the subgraphs greedily until the remaining stake is used
+    room = (np.broadcast_to(upper, allocations.shape) - lower)[order]
+    stake_before = np.concatenate(([0.0], np.cumsum(room)[:-1]))
+    allocations[order] += np.clip(remaining_stake - stake_before, 0, room)
+
+    return allocations
+
+
+def rewardUpperBounds(coefficients, max_rewards, budget, upper):
+    """Calculates upper bounds of the objective for every amount of allocations without building or solving
+    the model. The objective is bounded by the fractional knapsack solution (top coefficients filled to their
+    max allocation), and with k allocations also by the sum of the k highest rewards a single subgraph can reach.
+    Min allocations and group limits only restrict the model further, so the bounds hold for every solver engine.
+
+    Parameters
+    -------
+        coefficients (np.array): objective coefficient (or its upper bound) per subgraph, may be np.inf
+        max_rewards (np.array): max objective of a subgraph at its max allocation
+        budget (float): total stake that can be allocated
+        upper (float|np.array): max allocation per subgraph
+
+    Returns
+    -------
+    np.array
+        upper bound of the objective with 1, 2, ..., n allocations
+    """
+    coefficients = np.asarray(coefficients, dtype=float)
+    max_rewards = np.asarray(max_rewards, dtype=float)
+    if len(coefficients) == 0:
+        return np.zeros(0)
+
+    # fractional knapsack bound, infinite if a subgraph without stake has a positive reward
+    finite = np.isfinite(coefficients)
+    if np.any(~finite & (max_rewards > 0)):
+        knapsack_bound = np.inf
+    else:
+        finite_coefficients = np.where(finite, coefficients, 0)
+        knapsack_bound = float(np.dot(finite_coefficients, solveClosedForm(finite_coefficients, budget, 0, upper)))
+
+    # with k allocations at most the k highest single subgraph rewards can be earned
+    return np.minimum(np.cumsum(np.sort(max_rewards)[::-1]), knapsack_bound)
+
+
+def exactRewards(weights, stake, allocations):
+    """Calculates the true indexing rewards per subgraph, where the own allocation dilutes the share
+    of the subgraph rewards: weights * x / (stake + x)
+
+    Parameters
+    -------
+        weights (np.array): indexing rewards of the subgraph in the reward interval
+        stake (np.array): staked tokens on the subgraph
+        allocations (np.array): allocation per subgraph
+
+    Returns
+    -------
+    np.array
+        Indexing rewards per subgraph
+    """
+    return weights * allocations / (stake + allocations)
+
+
+def solveWaterFilling(weights, stake, budget, lower, upper, iterations=100):
+    """Solves the concave allocation problem max(sum(weights * x / (stake + x))) with sum(x) <= budget and
+    lower <= x <= upper. The marginal reward of a subgraph is weights * stake / (stake + x) ** 2, at the optimum
+    every subgraph that is not at a bound has the same marginal reward (lagrange multiplier). The multiplier is
+    found with a bisection over the whole array of subgraphs.
+
+    Parameters
+    -------
+        weights (np.array): indexing rewards of the subgraph in the reward interval
+        stake (np.array): staked tokens on the subgraph, has to be positive
+        budget (float): total stake that can be allocated
+        lower (float): min allocation per subgraph
+        upper (float|np.array): max allocation per subgraph
+        iterations (int): bisection steps
+
+    Returns
+    -------
+    np.array
+        Optimal allocation per subgraph
+    """
+    weights = np.asarray(weights, dtype=float)
+    stake = np.asarray(stake, dtype=float)
+
+    def allocationsForMultiplier(multiplier):
+        # allocation where the marginal reward equals the multiplier, clipped to the bounds
+        return np.clip(np.sqrt(weights * stake / multiplier) - stake, lower, upper)
+
+    if len(weights) == 0:
+        return np.zeros(0)
+
+    # if all subgraphs can get the max allocation the stake constraint is not binding
+    upper = np.broadcast_to(np.asarray(upper, dtype=float), weights.shape)
+    if upper.sum() <= budget:
+        return upper.copy()
+
+    # bracket the multiplier by the marginal rewards at the upper and lower bound
+    multiplier_low = np.min(weights * stake / (stake + upper) ** 2)
+    multiplier_high = np.max(weights * stake / (stake + lower) ** 2)
+    multiplier_low = max(multiplier_low, np.finfo(float).tiny)
+
+    # bisection in log space, the allocated stake is decreasing in the multiplier
+    for _ in range(iterations):
+        multiplier = np.sqrt(multiplier_low * multiplier_high)
+        if allocationsForMultiplier(multiplier).sum() > budget:
+            multiplier_low = multiplier
+        else:
+            multiplier_high = multiplier
+
+    # multiplier_high is always feasible
+    return allocationsForMultiplier(multiplier_high)
+
+
+def objectiveScale(coefficients):
+    """Get's the largest absolute objective coefficient. The coefficients (signal share / stake) are of the
+    magnitude of the reduced cost tolerance of HiGHS and glpk (1e-7), so the LP solvers would stop before the
+    optimum. The objective is divided by this scale before solving.
+
+    Returns
+    -------
+    float
+        scale of the objective, 1 if all coefficients are 0
+    """
+    coefficients = np.abs(np.asarray(coefficients, dtype=float))
+    scale = float(coefficients.max()) if len(coefficients) else 0.0
+    return scale if scale > 0 else 1.0
+
+
+def buildPyomoModel(size):
+    """Builds the Pyomo Model for the allocation optimization. All inputs of the model are mutable Params,
+    so the model can be reused for later solves by updating the Params.
+
+    Parameters
+    -------
+        size (int): amount of subgraphs
+
+    Returns
+    -------
+    pyomo.ConcreteModel
+        allocation model with the Params coefficient, budget, lower and upper (per subgraph)
+    """
+    model = pyomo.ConcreteModel()
+    model.Subgraphs = pyomo.RangeSet(0, size - 1)
+
+    # objective coefficient per subgraph and bounds of the allocations
+    model.coefficient = pyomo.Param(model.Subgraphs, mutable=True, initialize=0)
+    model.budget = pyomo.Param(mutable=True, initialize=0)
+    model.lower = pyomo.Param(mutable=True, initialize=0)
+    model.upper = pyomo.Param(model.Subgraphs, mutable=True, initialize=0)
+
+    # The Variable (Allocations) that should be changed to optimize rewards
+    model.x = pyomo.Var(model.Subgraphs, domain=pyomo.NonNegativeReals)
+
+    # formula and model
+    model.rewards = pyomo.Objective(
+        expr=sum(model.coefficient[i] * model.x[i] for i in model.Subgraphs),
+        sense=pyomo.maximize)  # maximize Indexing Rewards
+
+    # set constraint that allocations shouldn't be higher than total stake- reserce stake
+    model.vol = pyomo.Constraint(expr=model.budget >= sum(model.x[i] for i in model.Subgraphs))
+
+    # Allocations per Subgraph should be higher than min_allocation
+    model.lower_x = pyomo.Constraint(model.Subgraphs, rule=lambda m, i: m.x[i] >= m.lower)
+    # Allocation per Subgraph can't be higher than x % of total Allocations
+    model.upper_x = pyomo.Constraint(model.Subgraphs, rule=lambda m, i: m.x[i] <= m.upper[i])
+    return model
+
+
+# Persistent Pyomo Model, reused as long as the amount of subgraphs doesn't change
+_persistent_model = {'size': None, 'model': None}
+
+# Persistent APPSI Solver, keeps the model and the last solution (basis) of HiGHS in memory
+_persistent_solver = {'model': None, 'solver': None}
+
+
+def getPersistentModel(size):
+    """Returns the persistent Pyomo Model for the amount of subgraphs, builds a new model if
+    the amount of subgraphs changed since the last solve.
+    """
+    if _persistent_model['size'] != size:
+        _persistent_model['model'] = buildPyomoModel(size)
+        _persistent_model['size'] = size
+    return _persistent_model['model']
+
+
+def clearPersistentModel():
+    """Drops the persistent Pyomo Model and APPSI Solver, the next solve builds them again."""
+    _persistent_model.update(size=None, model=None)
+    _persistent_solver.update(model=None, solver=None)
+
+
+def getPersistentSolver(model, warm_start=True):
+    """Returns the persistent APPSI HiGHS Solver for the model. The solver talks to HiGHS in memory and keeps
+    the model between solves, updates of the mutable Params are passed to the solver without rebuilding it.
+
+    Parameters
+    -------
+        model (pyomo.ConcreteModel): persistent allocation model
+        warm_start (bool): reuse the solver instance and last solution of the previous solve
+
+    Returns
+    -------
+    object
+        APPSI Highs solver, None if APPSI or highspy is not available
+    """
+    try:
+        from pyomo.contrib.appsi.solvers import Highs
+    except ImportError:
+        return None
+
+    if not warm_start or _persistent_solver['model'] is not model:
+        solver = Highs()
+        if not solver.available():
+            return None
+        _persistent_solver['solver'] = solver
+        _persistent_solver['model'] = model
+    return _persistent_solver['solver']
+
+
+def solvePyomo(coefficients, budget, lower, upper, solver_name='glpk', time_limit=None, mip_gap=None,
+               warm_start=True):
+    """Updates the Params of the persistent Pyomo Model and solves it with the given solver.
+
+    Parameters
+    -------
+        coefficients (np.array): objective coefficient per subgraph
+        budget (float): total stake that can be allocated
+        lower (float): min allocation per subgraph
+        upper (float|np.array): max allocation per subgraph
+        solver_name (str): 'glpk'|'highs'
+        time_limit (float): time limit of the solver in seconds, no limit if None
+        mip_gap (float): relative mip gap of the solver, solver default if None
+        warm_start (bool): 'highs' only, start from the solution of the previous solve
+
+    Returns
+    -------
+    np.array, float
+        Allocation per subgraph, value of the objective. Raises a ValueError if the solve is not optimal
+    """
+    model = getPersistentModel(len(coefficients))
+
+    # update the mutable Params of the model, the objective is solved with coefficients of magnitude 1
+    scale = objectiveScale(coefficients)
+    upper = np.broadcast_to(upper, np.shape(coefficients))
+    for i, coefficient in enumerate(coefficients):
+        model.coefficient[i] = float(coefficient) / scale
+        model.upper[i] = float(upper[i])
+    model.budget = float(budget)
+    model.lower = float(lower)
+
+    if solver_name == 'highs':
+        solver = getPersistentSolver(model, warm_start=warm_start)
+        if solver is None:
+            print("APPSI HiGHS solver is not available, falling back to glpk")
+            solver_name = 'glpk'
+        else:
+            solver.config.time_limit = time_limit
+            solver.config.mip_gap = mip_gap
+            solver.config.warmstart = warm_start
+            # the solution is only loaded into the model if the solve is optimal
+            solver.config.load_solution = False
+            results = solver.solve(model)
+            termination = results.termination_condition
+            if termination.name != 'optimal':
+                raise ValueError("Optimization failed: {}".format(termination.name))
+            results.solution_loader.load_vars()
+
+    if solver_name == 'glpk':
+        solver = pyomo.SolverFactory('glpk')
+        # glpk options: tmlim -> time limit in seconds, mipgap -> relative mip gap
+        if time_limit is not None:
+            solver.options['tmlim'] = int(time_limit)
+        if mip_gap is not None:
+            solver.options['mipgap'] = mip_gap
+        results = solver.solve(model, load_solutions=False)
+        if (results.solver.status != pyomo.SolverStatus.ok
+                or results.solver.termination_condition != pyomo.TerminationCondition.optimal):
+            raise ValueError("Optimization failed: {} ({})".format(results.solver.termination_condition,
+                                                                   results.solver.status))
+        model.solutions.load_from(results)
+
+    allocations = np.array([model.x[i]() for i in model.Subgraphs], dtype=float)
+    return allocations, pyomo.value(model.rewards) * scale
+
+
+def solveLinprog(coefficients, budget, lower, upper, group_limits=None, time_limit=None):
+    """Solves the linear allocation problem in matrix form with scipy's HiGHS linprog. The objective vector,
+    the sparse constraint matrix and the bounds are built directly from the arrays, so the build time is linear
+    in the amount of subgraphs.
+
+    Parameters
+    -------
+        coefficients (np.array): objective coefficient per subgraph
+        budget (float): total stake that can be allocated
+        lower (float): min allocation per subgraph
+        upper (float|np.array): max allocation per subgraph
+        group_limits (list): additional constraints, list of (subgraph indices, max allocation of the group)
+        time_limit (float): time limit of the solver in seconds, no limit if None
+
+    Returns
+    -------
+    np.array, float
+        Allocation per subgraph, value of the objective
+    """
+    from scipy import sparse
+    from scipy.optimize import linprog
+
+    coefficients = np.asarray(coefficients, dtype=float)
+    size = len(coefficients)
+    if size == 0:
+        return np.zeros(0), 0.0
+
+    # first row: sum of all allocations <= budget, further rows: sum of the allocations of a group <= limit
+    rows = [np.zeros(size, dtype=int)]
+    columns = [np.arange(size)]
+    limits = [budget]
+    for row, (indices, limit) in enumerate(group_limits or [], start=1):
+        indices = np.asarray(indices, dtype=int)
+        rows.append(np.full(len(indices), row))
+        columns.append(indices)
+        limits.append(limit)
+    rows = np.concatenate(rows)
+    columns = np.concatenate(columns)
+    constraint_matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(limits), size))
+
+    bounds = np.column_stack((np.full(size, float(lower)), np.broadcast_to(upper, (size,))))
+
+    options = {}
+    if time_limit is not None:
+        options['time_limit'] = time_limit
+
+    # linprog minimizes, so the coefficients are negated to maximize the rewards. The objective is solved with
+    # coefficients of magnitude 1, see objectiveScale
+    results = linprog(-coefficients / objectiveScale(coefficients), A_ub=constraint_matrix, b_ub=np.array(limits, dtype=float), bounds=bounds,
+                      method='highs', options=options)
+    if results.x is None:
+        raise ValueError("Optimization failed: {}".format(results.message))
+    return results.x, float(np.dot(coefficients, results.x))
+
+
+def solveAllocations(data, reward_intervals, sliced_stake, budget, lower, upper, solver='glpk', time_limit=None,
+                     mip_gap=None, warm_start=True, group_limits=None):
+    """Runs the allocation optimization with the selected solver engine. The objectives of the reward
+    intervals only differ by a positive scalar, so the model is solved once and the rewards of every
+    interval are scaled from that solution.
+
+    Parameters
+    -------
+        data (dict): nested dictionary with the subgraph data, key is (SubgraphName, Address, ID)
+        reward_intervals (dict): indexing rewards of the network per interval,
+            e.g. {'indexingRewardHour': ..., 'indexingRewardDay': ...}
+        sliced_stake (float): grt per allocation
+        budget (float): total stake that can be allocated
+        lower (float): min allocation per subgraph
+        upper (float|np.array): max allocation per subgraph
+        solver (str): solver engine, see SOLVER_ENGINES
+        time_limit (float): time limit of the pyomo solvers in seconds
+        mip_gap (float): relative mip gap of the pyomo solvers
+        warm_start (bool): start the persistent solver from the previous solution
+        group_limits (list): additional constraints, list of (subgraph indices, max allocation of the group).
+            Only supported by the linprog solver engine, every other engine solves with linprog if group limits
+            are set
+
+    Returns
+    -------
+    dict, dict
+        Allocation per subgraph key, value of the objective per reward interval
+    """
+    if solver not in SOLVER_ENGINES:
+        raise ValueError("Unknown solver engine {}. Choose one of {}".format(solver, SOLVER_ENGINES))
+
+    C = list(data.keys())
+    # share of the network signal per subgraph and staked tokens per subgraph
+    signal_share = np.array([data[c]['signalledTokensTotal'] / data[c]['SignalledNetwork'] for c in C], dtype=float)
+    stake = np.array([data[c]['stakedTokensTotal'] for c in C], dtype=float)
+
+    # objective coefficient per subgraph for an indexing reward of 1, same formula as the pyomo objective
+    coefficients = signal_share / (stake + sliced_stake)
+    upper = np.broadcast_to(np.asarray(upper, dtype=float), coefficients.shape)
+
+    if group_limits and solver != 'linprog':
+        print("Group limits are only supported by the linprog solver engine, solving with linprog")
+        solver = 'linprog'
+
+    if solver == 'linprog':
+        x, unit_reward = solveLinprog(coefficients, budget, lower, upper, group_limits=group_limits,
+                                      time_limit=time_limit)
+    elif solver == 'exact':
+        if len(C) * lower > budget or np.any(lower > upper):
+            raise ValueError("Min allocations of {} GRT exceed the stake to allocate".format(len(C) * lower))
+        x = solveWaterFilling(signal_share, stake, budget, lower, upper)
+        unit_reward = float(exactRewards(signal_share, stake, x).sum())
+    elif solver == 'fast' and isKnapsackShape(coefficients, budget, lower, upper):
+        x = solveClosedForm(coefficients, budget, lower, upper)
+        unit_reward = float(np.dot(coefficients, x))
+    else:
+        if solver == 'fast':
+            print("Problem does not fit the closed-form solver, falling back to glpk")
+        x, unit_reward = solvePyomo(coefficients, budget, lower, upper,
+                                    solver_name='highs' if solver == 'highs' else 'glpk',
+                                    time_limit=time_limit, mip_gap=mip_gap, warm_start=warm_start)
+
+    rewards = {reward_interval: unit_reward * reward for reward_interval, reward in reward_intervals.items()}
+    return dict(zip(C, x)), rewards
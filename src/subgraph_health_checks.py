@@ -1,6 +1,7 @@
 import json
 from src.helpers import connectIndexerDatabase
 from src.queries import getSubgraphsFromDeveloper, getInactiveSubgraphs, getAllSubgraphDeployments, checkSubgraphStatus
+from src.config import CONFIG_PATH
 
 
 def getIndexedSubgraphsFromDatabase():
@@ -35,7 +36,7 @@ def fillBlacklistFromDatabaseBySyncAndError():
     rows = getIndexedSubgraphsFromDatabase()
 
     # open config.json and get blacklisted array
-    with open("../config.json", "r") as jsonfile:
+    with open(CONFIG_PATH, "r") as jsonfile:
         config = json.load(jsonfile)
     blacklisted_subgraphs = config.get('blacklist')
 
@@ -54,7 +55,7 @@ def fillBlacklistFromDatabaseBySyncAndError():
     config['blacklist'] = blacklisted_subgraphs
 
     # rewrite config.json file, keeps entrys that are already in there and are not changed by the conditions above
-    with open("../config.json", "w") as f:
+    with open(CONFIG_PATH, "w") as f:
         f.write(json.dumps(config))
         f.close()
 
@@ -69,7 +70,7 @@ def fillBlackListFromBlacklistedDevs(network):
         (Blacklisted Developer: Blacklisted Subgraphs)
     """
     # open config.json and get blacklisted array
-    with open("./config.json", "r") as jsonfile:
+    with open(CONFIG_PATH, "r") as jsonfile:
         config = json.load(jsonfile)
 
     # Get List of Blacklisted Developers from config.json
@@ -89,7 +90,7 @@ def fillBlackListFromBlacklistedDevs(network):
     config['blacklist'] = blacklisted_subgraphs
 
     # rewrite config.json file, keeps entrys that are already in there and are not changed by the conditions above
-    with open("../config.json", "w") as f:
+    with open(CONFIG_PATH, "w") as f:
         f.write(json.dumps(config, indent=4, sort_keys=True))
         f.close()
 
@@ -104,7 +105,7 @@ def fillBlackListFromInactiveSubgraphs(network):
         (Blacklisted Subgraphs)
     """
     # open config.json and get blacklisted array
-    with open("./config.json", "r") as jsonfile:
+    with open(CONFIG_PATH, "r") as jsonfile:
         config = json.load(jsonfile)
 
     # gets the List of Blacklisted Subgraphs from config.json
@@ -122,7 +123,7 @@ def fillBlackListFromInactiveSubgraphs(network):
     config['blacklist'] = blacklisted_subgraphs
 
     # rewrite config.json file, keeps entrys that are already in there and are not changed by the conditions above
-    with open("./config.json", "w") as f:
+    with open(CONFIG_PATH, "w") as f:
         f.write(json.dumps(config, indent=4, sort_keys=True))
         f.close()
 
@@ -174,7 +175,7 @@ def fillBlackListFromSubgraphHealthStatus(network):
     """
 
     # open config.json and get blacklisted array
-    with open("./config.json", "r") as jsonfile:
+    with open(CONFIG_PATH, "r") as jsonfile:
         config = json.load(jsonfile)
 
     # gets the List of Blacklisted Subgraphs from config.json
@@ -198,7 +199,7 @@ def fillBlackListFromSubgraphHealthStatus(network):
     config['blacklist'] = blacklisted_subgraphs
 
     # rewrite config.json file, keeps entrys that are already in there and are not changed by the conditions above
-    with open("./config.json", "w") as f:
+    with open(CONFIG_PATH, "w") as f:
         f.write(json.dumps(config, indent=4, sort_keys=True))
         f.close()
 
@@ -0,0 +1,168 @@
+from src.optimizer import getPriceData, getNetworkData, getIndexerData, createAllocationDataFrames, \
+    calculateOptimizedAllocations, calculateThreshold
+from src.queries import getDataAllocationOptimizer
+from src.subgraph_health_checks import createBlacklist
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import itertools
+import io
+import json
+import os
+import pandas as pd
+
+# parameters of optimizeAllocations that can be swept without refetching the network data
+SWEEP_PARAMETERS = ['max_percentage', 'reserve_stake', 'parallel_allocations', 'min_allocation', 'threshold']
+
+# data shared with the worker processes, set once per process by initializeSweepWorker
+_sweep_data = {}
+
+
+def createParameterGrid(parameter_grid, **default_parameters):
+    """Creates all combinations of the parameter grid. Parameters that are not in the grid are set to their default.
+
+    Parameters
+    -------
+        parameter_grid (dict): {parameter: [value, ...]} for the parameters in SWEEP_PARAMETERS
+        default_parameters: default value for each parameter in SWEEP_PARAMETERS
+
+    Returns
+    -------
+    list
+        list of dicts with one value for every parameter in SWEEP_PARAMETERS
+    """
+    unknown_parameters = set(parameter_grid) - set(SWEEP_PARAMETERS)
+    if unknown_parameters:
+        raise ValueError(f"Parameters {sorted(unknown_parameters)} can not be swept. "
+                         f"Supported parameters: {SWEEP_PARAMETERS}")
+    values = [parameter_grid.get(parameter, [default_parameters[parameter]]) for parameter in SWEEP_PARAMETERS]
+    return [dict(zip(SWEEP_PARAMETERS, combination)) for combination in itertools.product(*values)]
+
+
+def initializeSweepWorker(df, network_data, indexer_total_stake, current_rewards, price_data, options):
+    """Stores the fetched data in the worker process, so it is only transferred once per process."""
+    _sweep_data['df'] = df
+    _sweep_data['network_data'] = network_data
+    _sweep_data['indexer_total_stake'] = indexer_total_stake
+    _sweep_data['current_rewards'] = current_rewards
+    _sweep_data['price_data'] = price_data
+    _sweep_data['options'] = options
+
+
+def runSweepCombination(parameters):
+    """Runs the optimization and threshold calculation for one parameter combination on the fetched data.
+
+    Returns
+    -------
+    dict
+        parameters and results (rewards, gas costs, threshold outcome) of the combination. If the optimization
+        of the combination fails (e.g. the min allocations exceed the stake), the results are missing and error
+        holds the reason
+    """
+    options = _sweep_data['options']
+    result = dict(parameters)
+    try:
+        # the optimizer prints every allocation, keep the output of the workers quiet
+        with contextlib.redirect_stdout(io.StringIO()):
+            optimizer, FIXED_ALLOCATION = calculateOptimizedAllocations(
+                _sweep_data['df'], _sweep_data['network_data'], _sweep_data['indexer_total_stake'],
+                parallel_allocations=parameters['parallel_allocations'], max_percentage=parameters['max_percentage'],
+                reserve_stake=parameters['reserve_stake'], min_allocation=parameters['min_allocation'],
+                solver=options['solver'], solver_time_limit=options['solver_time_limit'],
+                solver_mip_gap=options['solver_mip_gap'])
+            starting_value, final_value = calculateThreshold(
+                optimizer, _sweep_data['current_rewards'], _sweep_data['price_data'], FIXED_ALLOCATION,
+                parallel_allocations=parameters['parallel_allocations'], threshold=parameters['threshold'],
+                threshold_interval=options['threshold_interval'], ignore_tx_costs=options['ignore_tx_costs'])
+    except Exception as error:
+        # one failed combination does not discard the results of the others
+        result['error'] = f"{type(error).__name__}: {error}"
+        return result
+
+    result['error'] = None
+    result['allocations'] = len([allocation for allocation in FIXED_ALLOCATION.values() if allocation > 0])
+    result['current_rewards'] = starting_value
+    result['optimized_rewards'] = final_value
+    result['optimized_reward_daily'] = optimizer['optimized_allocations']['indexingRewardDay']
+    result['optimized_reward_weekly'] = optimizer['optimized_allocations']['indexingRewardWeek']
+    result['gas_costs_eth'] = optimizer['gas_costs_parallel_allocation_new_close_eth']
+    result['gas_costs_usd'] = optimizer['gas_costs_parallel_allocation_new_close_usd']
+    result['gas_costs_grt'] = optimizer['gas_costs_parallel_allocation_new_close_grt']
+    result['increase_rewards_percentage'] = optimizer['increase_rewards_percentage']
+    result['increase_rewards_grt'] = optimizer['increase_rewards_grt']
+    result['increase_rewards_fiat'] = optimizer['increase_rewards_fiat']
+    result['threshold_reached'] = optimizer['threshold_reached']
+    return result
+
+
+def sweepParameters(indexer_id, parameter_grid, blacklist_parameter=True, parallel_allocations=1, max_percentage=0.2,
+                    threshold=20, subgraph_list_parameter=False, threshold_interval='daily', reserve_stake=0,
+                    min_allocation=0, min_signalled_grt_subgraph=100, min_allocated_grt_subgraph=100,
+                    network='mainnet', ignore_tx_costs=False, solver='glpk', solver_time_limit=None,
+                    solver_mip_gap=None, processes=None, snapshot=None):
+    """ Runs the optimization for every combination of the parameter grid. The network data is fetched once and
+    the combinations are optimized in a process pool. No allocation script is created and nothing is automated.
+
+    Parameters
+    -------
+        indexer_id (str): The Graph Indexer Address
+        parameter_grid (dict): {parameter: [value, ...]}, e.g. {"max_percentage": [0.1, 0.2], "reserve_stake": [0, 500]}
+        processes (int): amount of worker processes. Defaults to the amount of cpus
+        snapshot (dict): snapshot of the network inputs (src.snapshot). If supplied, the sweep runs offline
+        remaining parameters: same as optimizeAllocations, used for the parameters not in the grid
+
+    Returns
+    -------
+    pd.DataFrame
+        comparison table with one row per parameter combination
+    """
+    combinations = createParameterGrid(parameter_grid, max_percentage=max_percentage, reserve_stake=reserve_stake,
+                                       parallel_allocations=parallel_allocations, min_allocation=min_allocation,
+                                       threshold=threshold)
+
+    # fetch the data once for all combinations, or take it from the snapshot
+    if snapshot:
+        network = snapshot['network']
+        price_data = snapshot['price_data']
+        data = snapshot['data']
+    else:
+        # update blacklist / create blacklist if desired
+        if blacklist_parameter:
+            createBlacklist(network='mainnet')
+        price_data = getPriceData()
+        data = getDataAllocationOptimizer(indexer_id=indexer_id, network=network)
+    network_data = getNetworkData(data)
+    indexer_data, indexer = getIndexerData(data, network=network)
+    df, df_log = createAllocationDataFrames(data, indexer_data, network_data,
+                                            subgraph_list_parameter=subgraph_list_parameter,
+                                            blacklist_parameter=blacklist_parameter,
+                                            min_signalled_grt_subgraph=min_signalled_grt_subgraph,
+                                            min_allocated_grt_subgraph=min_allocated_grt_subgraph)
+    current_rewards = {'indexing_reward_hourly': df_log['indexing_reward_hourly'].sum(),
+                       'indexing_reward_daily': df_log['indexing_reward_daily'].sum(),
+                       'indexing_reward_weekly': df_log['indexing_reward_weekly'].sum(),
+                       'indexing_reward_yearly': df_log['indexing_reward_yearly'].sum()}
+    options = {'solver': solver, 'solver_time_limit': solver_time_limit, 'solver_mip_gap': solver_mip_gap,
+               'threshold_interval': threshold_interval, 'ignore_tx_costs': ignore_tx_costs}
+
+    print(f"Sweep {len(combinations)} parameter combinations over {len(df)} subgraphs")
+    with ProcessPoolExecutor(max_workers=processes, initializer=initializeSweepWorker,
+                             initargs=(df, network_data, indexer['indexer_total_stake'], current_rewards,
+                                       price_data, options)) as executor:
+        results = list(executor.map(runSweepCombination, combinations))
+
+    df_results = pd.DataFrame(results)
+    failed = df_results['error'].notna().sum() if len(df_results) else 0
+    if failed:
+        print(f"{failed} of {len(combinations)} parameter combinations failed, see the error column")
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None):
+        print(df_results)
+    return df_results
+
+
+def loadParameterGrid(path):
+    """Loads the parameter grid from a json file, e.g. {"max_percentage": [0.1, 0.2], "threshold": [10, 20]}"""
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Parameter grid {path} not found. Pass a json file with --sweep_grid, see "
+                                f"./sweep_grid.json for an example")
+    with open(path, "r") as jsonfile:
+        return json.load(jsonfile)
@@ -0,0 +1,72 @@
+import contextlib
+import contextvars
+import time
+
+# phases of an optimization run in the order of the summary table
+TIMING_PHASES = ['blacklist', 'prices', 'gas', 'data_fetch', 'pending_rewards', 'upper_bound', 'model_build', 'solve',
+                 'script_creation', 'automation']
+
+# spans that are currently running in the context (thread / task), http requests are counted in the innermost span
+_active_spans = contextvars.ContextVar('active_spans', default=())
+
+
+def countHttpCall(bytes_sent, bytes_received):
+    """Counts an http request in the innermost running span."""
+    spans = _active_spans.get()
+    if spans:
+        span = spans[-1]
+        span['calls'] += 1
+        span['bytes_sent'] += bytes_sent
+        span['bytes_received'] += bytes_received
+
+
+def countHttpResponse(response, *args, **kwargs):
+    """Response hook of the requests sessions of the clients, counts the request in the innermost running span."""
+    body = response.request.body or b''
+    countHttpCall(len(body.encode() if isinstance(body, str) else body), len(response.content or b''))
+    return response
+
+
+@contextlib.contextmanager
+def timingSpan(timings, phase):
+    """Records the duration, the http calls and the bytes transferred of a phase in timings[phase].
+    Spans of the same phase are added up. Does nothing if timings is None.
+
+    Parameters
+    -------
+        timings (dict): timings of the run
+        phase (str): name of the phase, see TIMING_PHASES
+    """
+    if timings is None:
+        yield
+        return
+    span = {'seconds': 0.0, 'calls': 0, 'bytes_sent': 0, 'bytes_received': 0, 'count': 1}
+    token = _active_spans.set(_active_spans.get() + (span,))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span['seconds'] = time.perf_counter() - start
+        _active_spans.reset(token)
+        if phase in timings:
+            for key in span:
+                timings[phase][key] += span[key]
+        else:
+            timings[phase] = span
+
+
+def printTimings(timings):
+    """Prints the timings of a run as summary table."""
+    phases = [phase for phase in TIMING_PHASES if phase in timings] + \
+             [phase for phase in timings if phase not in TIMING_PHASES]
+    total_seconds = sum(timings[phase]['seconds'] for phase in phases)
+    print()
+    print(70 * "-")
+    print(f"{'PHASE':<18}{'SECONDS':>10}{'SHARE':>8}{'SPANS':>7}{'CALLS':>7}{'KB SENT':>10}{'KB RECEIVED':>12}")
+    for phase in phases:
+        span = timings[phase]
+        share = span['seconds'] / total_seconds * 100 if total_seconds else 0
+        print(f"{phase:<18}{span['seconds']:>10.3f}{share:>7.1f}%{span['count']:>7}{span['calls']:>7}"
+              f"{span['bytes_sent'] / 1024:>10.1f}{span['bytes_received'] / 1024:>12.1f}")
+    print(f"{'TOTAL':<18}{total_seconds:>10.3f}")
+    print(70 * "-")
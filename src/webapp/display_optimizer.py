@@ -39,7 +39,8 @@ def createOptimizerOutput(parameters):
                                                  slack_alerting=parameters.get('slack_alerting'),
                                                  network = parameters.get('network'),
                                                  automation = parameters.get('automation'),
-                                                 ignore_tx_costs= parameters.get('ignore_tx_costs')
+                                                 ignore_tx_costs= parameters.get('ignore_tx_costs'),
+                                                 solver=parameters.get('solver')
                                                  )
 
         optimizer_key = None
@@ -2,6 +2,7 @@ from src.queries import getFiatPrice, getGasPrice, getHistoricalPriceData
 import streamlit as st
 from millify import millify
 import json
+from src.run_store import countRuns, listRuns, getRunById
 from src.performance_tracking import calculateRewardsAllActiveAllocations, calculateRewardsAllClosedAllocations
 import plotly.express as px
 import pandas as pd
@@ -20,23 +21,19 @@ def createMetricsOutput():
     col3.metric("Gas Price (Gwei)", millify(getGasPrice(speed='fast')))
 
 
-def getPreviousRuns(col):
-    # read optimization log
-    with open("./data/optimizer_log.json") as optimization_log:
-        log = json.load(optimization_log)
-
-    # save all keys in list
-    get_date_data = list()
-    for entry in log:
-        for key, value in entry.items():
-            get_date_data.append(key)
+def getPreviousRuns(col, page_size=20):
+    # count the runs in the run store for the pagination
+    runs_total = countRuns()
 
     with col.expander("Data from Previous Optimizations:"):
-        # selector for key (date) and then show values of optimization run
-        options = st.selectbox(label="Select previous Optimization Data", options=get_date_data)
-        for entry in log:
-            if entry.get(options):
-                st.write(entry)
+        # select page, then key (date) and then show values of optimization run
+        pages = max(1, -(-runs_total // page_size))
+        page = st.number_input(label="Page", min_value=1, max_value=pages, value=1, step=1)
+        runs = listRuns(limit=page_size, offset=(page - 1) * page_size)
+        options = st.selectbox(label="Select previous Optimization Data", options=runs,
+                               format_func=lambda run: f"{run['datetime']} ({run['indexer_id']})")
+        if options:
+            st.write(getRunById(options['id']))
 
 
 @st.cache
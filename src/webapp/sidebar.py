@@ -43,6 +43,7 @@ def createSidebar():
             threshold_interval = st.selectbox(label="Threshold Interval", options=['daily', 'weekly'],
                                               key="threshold_interval")
             ignore_tx_costs = st.selectbox('Ignore TX Gas costs', options= [False,True])
+            solver = st.selectbox('Solver', options=['glpk', 'fast', 'exact', 'highs', 'linprog'], key='solver')
 
             reserve_stake = st.number_input(label="Reserve Stake", min_value=0, value=500, step=100,
                                             key="reserve_stake")
@@ -74,7 +75,8 @@ def createSidebar():
                 'discord_alerting': discord_alerting,
                 'network': network,
                 'automation': automation,
-                'ignore_tx_costs' : ignore_tx_costs
+                'ignore_tx_costs' : ignore_tx_costs,
+                'solver': solver
 
             }
             return return_dict
@@ -7,16 +7,16 @@ from src.queries import getAllAllocations, getActiveAllocations, getClosedAlloca
 from src.helpers import initialize_rpc, initializeRewardManagerContract, ANYBLOCK_ANALYTICS_ID, conntectRedis, \
     get_routes_from_cache, set_routes_to_cache, getLastKeyFromDate
 import pandas as pd
+from src.block_headers import getBlockTimestamp, getDailyBlocks
 import aiohttp
 import asyncio
 
-def cacheCalculateRewardsActiveAllocation(allocation_id, interval=1, initial_run=False):
-    """Calculates the pending rewards in given interval for active allocation and dumps results with more metrics into
+def cacheCalculateRewardsActiveAllocation(allocation_id, initial_run=False):
+    """Calculates the daily pending rewards for active allocation and dumps results with more metrics into
     the redis cache.
 
     Parameters
     -------
-        interval (int): supply interval for pending rewards calculation in hours. Standard is 1h
         allocation (str) : supply allocation id for reward calculation
 
     Returns
@@ -73,28 +73,33 @@ def cacheCalculateRewardsActiveAllocation(allocation_id, interval=1, initial_run
     # get the subgraph IPFS hash
     subgraph_ipfs_hash = allocation['subgraphDeployment']['ipfsHash']
 
-    # Initialize a delta reward between current and previous interval reward
+    # Initialize the accumulated reward and timestamp of the previous sample
     accumulated_reward_minus_interval = 0
+    timestamp_minus_interval = None
 
-    # iterate through the range from allocation creation block to current block +1 in interval steps
-    # we expect 270 Blocks per Hour. interval * 270 = Hour interval in blocks
+    # iterate from the allocation creation block over the first block of every UTC day to the current block. The
+    # current block is stored under the key of the current day, so that sample is refreshed on every run
 
     data = dict()
 
     if initial_run:
 
-        for block in range(current_block if not closed_allocation else allocation_closing_block,
-                           allocation_creation_block - 1, -(24 * 270)):
-            datetime_block = datetime.utcfromtimestamp(web3.eth.get_block(block).get('timestamp')).strftime(
-                '%Y-%m-%d')
+        daily_blocks, daily_timestamps = getDailyBlocks(
+            allocation_creation_block, current_block if not closed_allocation else allocation_closing_block,
+            include_end=True)
+        for block, timestamp in zip(daily_blocks, daily_timestamps):
+            datetime_block = datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d')
 
             # First it looks for the data in redis cache
             allocation_redis_key_hour = datetime_block + "-" + subgraph_ipfs_hash + "-" + allocation_id
             data = get_routes_from_cache(key=allocation_redis_key_hour)
 
-            # If cache is found then serves the data from cache
-            if data is not None:
+            # If cache is found then serves the data from cache, except for the last sample
+            if data is not None and block != daily_blocks[-1]:
                 data = json.loads(data)
+                cached_sample = data[allocation_redis_key_hour][allocation_id]
+                accumulated_reward_minus_interval = cached_sample['accumulated_reward']
+                timestamp_minus_interval = cached_sample['timestamp']
                 data["cache"] = True
                 data = json.dumps(data)
                 state = set_routes_to_cache(key=allocation_redis_key_hour, value=data)
@@ -106,13 +111,15 @@ def cacheCalculateRewardsActiveAllocation(allocation_id, interval=1, initial_run
                 except:
                     accumulated_reward = 0
 
-                # calculate the difference between the accumulated reward and the reward from last interval and calc
-                # the hourly rewards
-                reward_rate_hour = (accumulated_reward - accumulated_reward_minus_interval) / interval
+                # calculate the difference between the accumulated reward and the reward of the previous sample and
+                # divide it by the hours between the samples
+                hours = (timestamp - timestamp_minus_interval) / 3600 if timestamp_minus_interval is not None else 0
+                reward_rate_hour = (accumulated_reward - accumulated_reward_minus_interval) / hours if hours > 0 else 0
                 reward_rate_hour_per_token = reward_rate_hour / allocated_tokens
 
                 # set the currently accumulated reward fas the previous interval reward for next iteration
                 accumulated_reward_minus_interval = accumulated_reward
+                timestamp_minus_interval = timestamp
 
                 """
                 # not sure about this one
@@ -139,7 +146,7 @@ def cacheCalculateRewardsActiveAllocation(allocation_id, interval=1, initial_run
                 data[allocation_redis_key_hour][allocation_id]['allocation_created_epoch'] = allocation[
                     'createdAtEpoch']
                 data[allocation_redis_key_hour][allocation_id]['allocation_status'] = "Closed"
-                data[allocation_redis_key_hour][allocation_id]['timestamp'] = web3.eth.get_block(block).get('timestamp')
+                data[allocation_redis_key_hour][allocation_id]['timestamp'] = timestamp
                 data[allocation_redis_key_hour][allocation_id]['accumulated_reward'] = accumulated_reward
                 data[allocation_redis_key_hour][allocation_id]['reward_rate_hour'] = reward_rate_hour
                 data[allocation_redis_key_hour][allocation_id][
@@ -154,7 +161,7 @@ def cacheCalculateRewardsActiveAllocation(allocation_id, interval=1, initial_run
     else:
         # grab the most current key for the latest datetime and get the block number
         if closed_allocation:
-            last_date_key = datetime.utcfromtimestamp(web3.eth.get_block(allocation_closing_block).get('timestamp'))
+            last_date_key = datetime.utcfromtimestamp(getBlockTimestamp(allocation_closing_block))
         else:
             last_date_key = datetime.now()
         # get latest key, if non is found return None
@@ -172,20 +179,25 @@ def cacheCalculateRewardsActiveAllocation(allocation_id, interval=1, initial_run
         if not latest_key:
             latest_block_with_data = allocation_creation_block
 
-        for block in range(current_block if not closed_allocation else allocation_closing_block,
-                           latest_block_with_data - 1, -(24 * 270)):
+        daily_blocks, daily_timestamps = getDailyBlocks(
+            latest_block_with_data, current_block if not closed_allocation else allocation_closing_block,
+            include_end=True)
+        for block, timestamp in zip(daily_blocks, daily_timestamps):
             if (closed_allocation):
                 if latest_block_with_data == allocation_closing_block:
                     break
-            datetime_block = datetime.utcfromtimestamp(web3.eth.get_block(block).get('timestamp')).strftime('%Y-%m-%d')
+            datetime_block = datetime.utcfromtimestamp(timestamp).strftime('%Y-%m-%d')
 
             # First it looks for the data in redis cache
             allocation_redis_key_hour = datetime_block + "-" + subgraph_ipfs_hash + "-" + allocation_id
             data = get_routes_from_cache(key=allocation_redis_key_hour)
 
-            # If cache is found then serves the data from cache
-            if data is not None:
+            # If cache is found then serves the data from cache, except for the last sample
+            if data is not None and block != daily_blocks[-1]:
                 data = json.loads(data)
+                cached_sample = data[allocation_redis_key_hour][allocation_id]
+                accumulated_reward_minus_interval = cached_sample['accumulated_reward']
+                timestamp_minus_interval = cached_sample['timestamp']
                 data["cache"] = True
                 data = json.dumps(data)
                 state = set_routes_to_cache(key=allocation_redis_key_hour, value=data)
@@ -197,13 +209,15 @@ def cacheCalculateRewardsActiveAllocation(allocation_id, interval=1, initial_run
                 except web3.exceptions.ContractLogicError:
                     accumulated_reward = 0
 
-                # calculate the difference between the accumulated reward and the reward from last interval and calc
-                # the hourly rewards
-                reward_rate_hour = (accumulated_reward - accumulated_reward_minus_interval) / interval
+                # calculate the difference between the accumulated reward and the reward of the previous sample and
+                # divide it by the hours between the samples
+                hours = (timestamp - timestamp_minus_interval) / 3600 if timestamp_minus_interval is not None else 0
+                reward_rate_hour = (accumulated_reward - accumulated_reward_minus_interval) / hours if hours > 0 else 0
                 reward_rate_hour_per_token = reward_rate_hour / allocated_tokens
 
                 # set the currently accumulated reward fas the previous interval reward for next iteration
                 accumulated_reward_minus_interval = accumulated_reward
+                timestamp_minus_interval = timestamp
 
                 """
                 # not sure about this one
@@ -227,7 +241,7 @@ def cacheCalculateRewardsActiveAllocation(allocation_id, interval=1, initial_run
                 data[allocation_redis_key_hour][allocation_id]['allocation_created_epoch'] = allocation[
                     'createdAtEpoch']
                 data[allocation_redis_key_hour][allocation_id]['allocation_status'] = "Closed"
-                data[allocation_redis_key_hour][allocation_id]['timestamp'] = web3.eth.get_block(block).get('timestamp')
+                data[allocation_redis_key_hour][allocation_id]['timestamp'] = timestamp
                 data[allocation_redis_key_hour][allocation_id]['accumulated_reward'] = accumulated_reward
                 data[allocation_redis_key_hour][allocation_id]['reward_rate_hour'] = reward_rate_hour
                 data[allocation_redis_key_hour][allocation_id][
@@ -242,12 +256,11 @@ def cacheCalculateRewardsActiveAllocation(allocation_id, interval=1, initial_run
     return data
 
 
-def cacheCalculateRewardsAllActiveAllocations(indexer_id, interval=1, initial_run=False):
-    """Calculates the pending rewards in given interval for all active allocation
+def cacheCalculateRewardsAllActiveAllocations(indexer_id, initial_run=False):
+    """Calculates the daily pending rewards for all active allocation
 
     Parameters
     -------
-        interval (int): supply interval for pending rewards calculation in hours. Standard is 1h
         indexer_id (str) : supply indexer id for reward calculation on all allocations
     """
     redis = conntectRedis()
@@ -262,12 +275,11 @@ def cacheCalculateRewardsAllActiveAllocations(indexer_id, interval=1, initial_ru
 
     # append all active allocations to a temp list with allocation ID
     for allocation in active_allocations:
-        # calculateRewardsActiveAllocation(allocation_id=allocation['id'], interval=1)
         allocation_id_temp_list.append(to_checksum_address(allocation['id']))
 
     # iterate through all allocations and calculate rewards
     for allocation in all_allocations:
-        calculateRewardsActiveAllocation(allocation_id=allocation['id'], interval=1, initial_run=initial_run)
+        cacheCalculateRewardsActiveAllocation(allocation_id=allocation['id'], initial_run=initial_run)
 
     # iterate through all keys and check if allocation id is in key, if yes it is an active allocation
     # if it is an active allocation, set status of allocation_status to "Active"
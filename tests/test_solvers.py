@@ -0,0 +1,325 @@
+from itertools import combinations
+
+import numpy as np
+import pyomo.environ as pyomo
+import pytest
+from scipy.optimize import minimize
+
+from src.solvers import isKnapsackShape, solveClosedForm, rewardUpperBounds, exactRewards, solveWaterFilling, \
+    solvePyomo, solveLinprog, solveAllocations, clearPersistentModel, objectiveScale
+
+
+def highsAvailable():
+    try:
+        from pyomo.contrib.appsi.solvers import Highs
+        return bool(Highs().available())
+    except ImportError:
+        return False
+
+
+requires_highs = pytest.mark.skipif(not highsAvailable(), reason="APPSI HiGHS (highspy) is not available")
+requires_glpk = pytest.mark.skipif(not pyomo.SolverFactory('glpk').available(exception_flag=False),
+                                   reason="glpk is not installed")
+
+SEEDS = range(8)
+
+
+@pytest.fixture(autouse=True)
+def persistentModel():
+    # every test builds its own persistent model and solver
+    clearPersistentModel()
+    yield
+    clearPersistentModel()
+
+
+def randomProblem(seed, size=6, max_percentage=0.3, min_allocation=0.0):
+    """Small allocation problem with the shapes of the optimizer: signal share, stake per subgraph and the
+    objective coefficient signal_share / (stake + sliced_stake)."""
+    rng = np.random.default_rng(seed)
+    signal_share = rng.uniform(0.001, 0.1, size)
+    stake = rng.uniform(1e3, 1e6, size)
+    budget = float(rng.uniform(1e5, 1e6))
+    sliced_stake = budget * max_percentage
+    coefficients = signal_share / (stake + sliced_stake)
+    upper = np.full(size, max_percentage * budget)
+    return {'signal_share': signal_share, 'stake': stake, 'budget': budget, 'lower': min_allocation,
+            'upper': upper, 'coefficients': coefficients}
+
+
+def solvePyomoReference(coefficients, budget, lower, upper, group_limits=()):
+    """Plain Pyomo model of the linear allocation problem with group limits, solved with APPSI HiGHS. The
+    coefficients are scaled to a max of 1, HiGHS treats reduced costs below 1e-7 as zero."""
+    from pyomo.contrib.appsi.solvers import Highs
+
+    size = len(coefficients)
+    scale = np.abs(coefficients).max()
+    model = pyomo.ConcreteModel()
+    model.x = pyomo.Var(range(size), bounds=lambda m, i: (lower, upper[i]))
+    model.rewards = pyomo.Objective(expr=sum(coefficients[i] / scale * model.x[i] for i in range(size)),
+                                    sense=pyomo.maximize)
+    model.vol = pyomo.Constraint(expr=sum(model.x[i] for i in range(size)) <= budget)
+    model.groups = pyomo.ConstraintList()
+    for indices, limit in group_limits:
+        model.groups.add(sum(model.x[i] for i in indices) <= limit)
+    Highs().solve(model)
+    return np.array([model.x[i]() for i in range(size)]), pyomo.value(model.rewards) * scale
+
+
+def solveExactReference(weights, stake, budget, lower, upper):
+    """Maximizes sum(weights * x / (stake + x)) with SLSQP, starting from the feasible uniform allocation."""
+    start = np.clip(np.full(len(weights), budget / len(weights)), lower, upper)
+    scale = budget
+    results = minimize(lambda y: -exactRewards(weights, stake, y * scale).sum(), start / scale, method='SLSQP',
+                       bounds=[(lower / scale, cap / scale) for cap in upper],
+                       constraints=[{'type': 'ineq', 'fun': lambda y: 1 - y.sum()}],
+                       options={'ftol': 1e-15, 'maxiter': 1000})
+    return results.x * scale, -results.fun
+
+
+def closedFormObjective(coefficients, budget, lower, upper):
+    return float(np.dot(coefficients, solveClosedForm(coefficients, budget, lower, upper)))
+
+
+def assertFeasible(x, budget, lower, upper, group_limits=()):
+    tolerance = 1e-6 * budget
+    assert x.sum() <= budget + tolerance
+    assert np.all(x >= lower - tolerance)
+    assert np.all(x <= upper + tolerance)
+    for indices, limit in group_limits:
+        assert x[list(indices)].sum() <= limit + tolerance
+
+
+def test_closed_form_fills_the_highest_coefficients():
+    x = solveClosedForm(np.array([1.0, 3.0, 2.0]), budget=10, lower=1, upper=5)
+    np.testing.assert_allclose(x, [1, 5, 4])
+
+
+def test_closed_form_leaves_stake_unallocated_without_positive_coefficients():
+    x = solveClosedForm(np.array([0.0, -1.0]), budget=10, lower=1, upper=5)
+    np.testing.assert_allclose(x, [1, 1])
+
+
+def test_knapsack_shape_rejects_min_allocations_above_the_budget():
+    assert isKnapsackShape(np.ones(3), budget=10, lower=3, upper=5)
+    assert not isKnapsackShape(np.ones(3), budget=8, lower=3, upper=5)
+    assert not isKnapsackShape(np.array([1.0, np.nan]), budget=10, lower=0, upper=5)
+
+
+@requires_highs
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('max_percentage, min_allocation', [(0.3, 0.0), (0.1, 0.0), (0.3, 1e4)])
+def test_fast_matches_pyomo(seed, max_percentage, min_allocation):
+    problem = randomProblem(seed, max_percentage=max_percentage, min_allocation=min_allocation)
+    args = (problem['coefficients'], problem['budget'], problem['lower'], problem['upper'])
+    x = solveClosedForm(*args)
+    _, objective = solvePyomoReference(*args)
+    assertFeasible(x, *args[1:])
+    assert np.dot(problem['coefficients'], x) == pytest.approx(objective, rel=1e-9)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_max_percentage_cap_is_binding(seed):
+    # 6 subgraphs with a cap of 10% of the stake can not use the whole stake, every subgraph gets the cap
+    problem = randomProblem(seed, max_percentage=0.1)
+    args = (problem['coefficients'], problem['budget'], problem['lower'], problem['upper'])
+    for x in [solveClosedForm(*args), solveLinprog(*args)[0]]:
+        np.testing.assert_allclose(x, problem['upper'], rtol=1e-9)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('max_percentage, min_allocation', [(0.3, 0.0), (0.1, 0.0), (0.3, 1e4)])
+def test_water_filling_matches_slsqp(seed, max_percentage, min_allocation):
+    problem = randomProblem(seed, max_percentage=max_percentage, min_allocation=min_allocation)
+    args = (problem['signal_share'], problem['stake'], problem['budget'], problem['lower'], problem['upper'])
+    x = solveWaterFilling(*args)
+    assertFeasible(x, *args[2:])
+    _, reference = solveExactReference(*args)
+    objective = exactRewards(problem['signal_share'], problem['stake'], x).sum()
+    assert objective >= reference * (1 - 1e-9)
+    assert objective == pytest.approx(reference, rel=1e-6)
+
+
+def test_water_filling_equalizes_the_marginal_rewards():
+    problem = randomProblem(1, max_percentage=0.5)
+    x = solveWaterFilling(problem['signal_share'], problem['stake'], problem['budget'], 0, problem['upper'])
+    marginal = problem['signal_share'] * problem['stake'] / (problem['stake'] + x) ** 2
+    interior = (x > 1e-6) & (x < problem['upper'] - 1e-6)
+    assert interior.any()
+    np.testing.assert_allclose(marginal[interior], marginal[interior].max(), rtol=1e-6)
+    # subgraphs at the lower bound have a smaller and at the cap a larger marginal reward
+    assert np.all(marginal[x <= 1e-6] <= marginal[interior].max() * (1 + 1e-6))
+    assert np.all(marginal[x >= problem['upper'] - 1e-6] >= marginal[interior].max() * (1 - 1e-6))
+
+
+def test_water_filling_gives_every_subgraph_the_cap_if_the_stake_suffices():
+    problem = randomProblem(3, max_percentage=0.1)
+    x = solveWaterFilling(problem['signal_share'], problem['stake'], problem['budget'], 0, problem['upper'])
+    np.testing.assert_allclose(x, problem['upper'])
+
+
+def allocationData(problem):
+    """Subgraph data of solveAllocations for the problem, the network signal is 1e6."""
+    return {('name', 'address', f'Qm{i}'): {'signalledTokensTotal': signal * 1e6, 'SignalledNetwork': 1e6,
+                                            'stakedTokensTotal': stake}
+            for i, (signal, stake) in enumerate(zip(problem['signal_share'], problem['stake']))}
+
+
+@pytest.mark.parametrize('solver', ['fast', 'exact', 'linprog', pytest.param('highs', marks=requires_highs)])
+def test_solve_allocations_scales_the_reward_intervals(solver):
+    problem = randomProblem(2)
+    reward_intervals = {'indexingRewardDay': 1e4, 'indexingRewardWeek': 7e4}
+    allocations, rewards = solveAllocations(allocationData(problem), reward_intervals,
+                                            sliced_stake=problem['budget'] * 0.3, budget=problem['budget'],
+                                            lower=problem['lower'], upper=problem['upper'], solver=solver)
+    x = np.array(list(allocations.values()))
+    assertFeasible(x, problem['budget'], problem['lower'], problem['upper'])
+    if solver == 'exact':
+        unit_reward = exactRewards(problem['signal_share'], problem['stake'], x).sum()
+    else:
+        unit_reward = closedFormObjective(problem['coefficients'], problem['budget'], problem['lower'],
+                                          problem['upper'])
+    # the model is solved once, the rewards of the intervals are the unit reward times the interval reward
+    assert rewards['indexingRewardDay'] == pytest.approx(1e4 * unit_reward, rel=1e-9)
+    assert rewards['indexingRewardWeek'] == pytest.approx(7 * rewards['indexingRewardDay'], rel=1e-12)
+
+
+def test_objective_scale():
+    assert objectiveScale(np.array([1e-8, -3e-8])) == pytest.approx(3e-8)
+    assert objectiveScale(np.zeros(2)) == 1.0
+    assert objectiveScale(np.zeros(0)) == 1.0
+
+
+@requires_highs
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('max_percentage, min_allocation', [(0.3, 0.0), (0.1, 0.0), (0.3, 1e4)])
+def test_highs_matches_the_closed_form(seed, max_percentage, min_allocation):
+    problem = randomProblem(seed, max_percentage=max_percentage, min_allocation=min_allocation)
+    args = (problem['coefficients'], problem['budget'], problem['lower'], problem['upper'])
+    x, objective = solvePyomo(*args, solver_name='highs')
+    assertFeasible(x, *args[1:])
+    assert objective == pytest.approx(closedFormObjective(*args), rel=1e-9)
+    assert objective == pytest.approx(np.dot(problem['coefficients'], x), rel=1e-9)
+
+
+@requires_highs
+def test_highs_reuses_the_persistent_model():
+    problem = randomProblem(0)
+    args = (problem['coefficients'], problem['budget'], problem['lower'])
+    _, objective = solvePyomo(*args, problem['upper'], solver_name='highs')
+    # a second solve only updates the mutable Params
+    _, objective_capped = solvePyomo(*args, problem['upper'] / 3, solver_name='highs')
+    assert objective_capped == pytest.approx(closedFormObjective(*args, problem['upper'] / 3), rel=1e-9)
+    assert objective_capped < objective
+
+
+@requires_glpk
+@pytest.mark.parametrize('seed', SEEDS)
+def test_glpk_matches_the_closed_form(seed):
+    problem = randomProblem(seed)
+    args = (problem['coefficients'], problem['budget'], problem['lower'], problem['upper'])
+    _, objective = solvePyomo(*args, solver_name='glpk')
+    assert objective == pytest.approx(closedFormObjective(*args), rel=1e-6)
+
+
+@pytest.mark.parametrize('solver_name', [pytest.param('highs', marks=requires_highs),
+                                         pytest.param('glpk', marks=requires_glpk)])
+def test_pyomo_raises_on_infeasible_problem(solver_name):
+    with pytest.raises(ValueError, match="Optimization failed"):
+        solvePyomo(np.ones(3), budget=10, lower=5, upper=np.full(3, 6.0), solver_name=solver_name)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('max_percentage, min_allocation', [(0.3, 0.0), (0.1, 0.0), (0.3, 1e4)])
+def test_linprog_matches_the_closed_form(seed, max_percentage, min_allocation):
+    problem = randomProblem(seed, max_percentage=max_percentage, min_allocation=min_allocation)
+    args = (problem['coefficients'], problem['budget'], problem['lower'], problem['upper'])
+    x, objective = solveLinprog(*args)
+    assertFeasible(x, *args[1:])
+    assert objective == pytest.approx(closedFormObjective(*args), rel=1e-9)
+
+
+def test_linprog_raises_on_infeasible_problem():
+    with pytest.raises(ValueError, match="Optimization failed"):
+        solveLinprog(np.ones(3), budget=10, lower=5, upper=np.full(3, 6.0))
+
+
+def test_linprog_group_limit():
+    # subgraphs 0 and 1 share a limit of 6, the rest of the stake goes to subgraph 2
+    x, objective = solveLinprog(np.array([3.0, 2.0, 1.0]), budget=10, lower=0, upper=np.full(3, 5.0),
+                                group_limits=[([0, 1], 6)])
+    np.testing.assert_allclose(x, [5, 1, 4], atol=1e-9)
+    assert objective == pytest.approx(21)
+
+
+@requires_highs
+@pytest.mark.parametrize('seed', SEEDS)
+def test_linprog_group_limits_match_pyomo(seed):
+    problem = randomProblem(seed, size=8)
+    order = np.argsort(-problem['coefficients'])
+    # the best subgraphs share a limit below their caps, so the group limits are binding
+    group_limits = [(order[:3].tolist(), problem['upper'][0]), (order[3:5].tolist(), problem['upper'][0] / 2)]
+    args = (problem['coefficients'], problem['budget'], problem['lower'], problem['upper'])
+    x, objective = solveLinprog(*args, group_limits=group_limits)
+    _, reference = solvePyomoReference(*args, group_limits=group_limits)
+    assertFeasible(x, *args[1:], group_limits=group_limits)
+    assert objective == pytest.approx(reference, rel=1e-9)
+    assert objective < closedFormObjective(*args)
+
+
+@pytest.mark.parametrize('solver', ['fast', 'exact', 'linprog'])
+def test_solve_allocations_solves_group_limits_with_linprog(solver):
+    data = {('name', 'address', f'Qm{i}'): {'signalledTokensTotal': signal, 'SignalledNetwork': 1.0,
+                                            'stakedTokensTotal': 0.0}
+            for i, signal in enumerate([3.0, 2.0, 1.0])}
+    allocations, rewards = solveAllocations(data, {'indexingRewardDay': 1.0}, sliced_stake=1.0, budget=10,
+                                            lower=0, upper=5, solver=solver, group_limits=[([0, 1], 6)])
+    np.testing.assert_allclose(list(allocations.values()), [5, 1, 4], atol=1e-9)
+    assert rewards['indexingRewardDay'] == pytest.approx(21)
+
+
+def test_solve_allocations_rejects_unknown_engines():
+    with pytest.raises(ValueError, match="Unknown solver engine"):
+        solveAllocations({}, {}, 0, 0, 0, 0, solver='cplex')
+
+
+def bestRewardsPerAmount(size, solve):
+    """Best objective with exactly k allocated subgraphs for k = 1..size, by enumerating the subsets."""
+    return np.array([max(solve(list(subset)) for subset in combinations(range(size), k))
+                     for k in range(1, size + 1)])
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('max_percentage', [0.1, 0.3, 1.0])
+def test_upper_bounds_hold_for_the_linear_objective(seed, max_percentage):
+    problem = randomProblem(seed, max_percentage=max_percentage)
+    coefficients, budget, upper = problem['coefficients'], problem['budget'], problem['upper']
+    bounds = rewardUpperBounds(coefficients, coefficients * upper, budget, upper)
+
+    def solve(subset):
+        return np.dot(coefficients[subset], solveClosedForm(coefficients[subset], budget, 0, upper[subset]))
+
+    best = bestRewardsPerAmount(len(coefficients), solve)
+    assert np.all(bounds >= best * (1 - 1e-12))
+    # with every subgraph the bound is the optimum
+    assert bounds[-1] == pytest.approx(solveLinprog(coefficients, budget, 0, upper)[1], rel=1e-9)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('max_percentage', [0.1, 0.3, 1.0])
+def test_upper_bounds_hold_for_the_exact_objective(seed, max_percentage):
+    problem = randomProblem(seed, max_percentage=max_percentage)
+    weights, stake, budget, upper = problem['signal_share'], problem['stake'], problem['budget'], problem['upper']
+    # same bound as the optimizer: the tangent weights / stake and the reward at the cap
+    bounds = rewardUpperBounds(weights / stake, exactRewards(weights, stake, upper), budget, upper)
+
+    def solve(subset):
+        x = solveWaterFilling(weights[subset], stake[subset], budget, 0, upper[subset])
+        return exactRewards(weights[subset], stake[subset], x).sum()
+
+    assert np.all(bounds >= bestRewardsPerAmount(len(weights), solve) * (1 - 1e-12))
+
+
+def test_upper_bounds_without_stake():
+    # a subgraph without stake has an infinite coefficient, only the single subgraph rewards bound the objective
+    bounds = rewardUpperBounds(np.array([np.inf, 1.0]), np.array([2.0, 3.0]), budget=10, upper=np.full(2, 5.0))
+    np.testing.assert_allclose(bounds, [3, 5])
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.model_input import calculateRewardUpperBound, createModelInput, getIndexingRewardIntervals
+from src.solvers import solveAllocations, clearPersistentModel
+
+PRICE_DATA = {'gas_price_gwei': 50, 'allocation_gas_usage': 270000, 'GRT-ETH': 0.0003}
+
+# no subgraph caps or group limits, independent of the config.json of the repository
+CONFIG = {}
+
+
+@pytest.fixture(autouse=True)
+def persistentModel():
+    clearPersistentModel()
+
+
+def subgraphFrame(seed, size=6):
+    rng = np.random.default_rng(seed)
+    index = pd.MultiIndex.from_arrays([['subgraph{}'.format(i) for i in range(size)], ['0x0'] * size],
+                                      names=['Name_y', 'Address'])
+    return pd.DataFrame({'id': ['QmTest{}'.format(i) for i in range(size)],
+                         'Allocation': np.zeros(size),
+                         'signalledTokensTotal': rng.uniform(1e3, 1e5, size),
+                         'stakedTokensTotal': rng.uniform(1e4, 1e7, size)}, index=index)
+
+
+def networkData(df):
+    return {'total_tokens_signalled': str(int(df['signalledTokensTotal'].sum() * 4 * 10 ** 18)),
+            'total_supply': 10 ** 10 * 10 ** 18}
+
+
+def optimize(df, network_data, indexer_total_stake, max_percentage, min_allocation, solver):
+    model_input = createModelInput(df, network_data, indexer_total_stake, max_percentage=max_percentage, config=CONFIG)
+    allocations, rewards = solveAllocations(model_input['data'], model_input['reward_intervals'],
+                                            sliced_stake=model_input['sliced_stake'], budget=model_input['budget'],
+                                            lower=min_allocation, upper=model_input['max_allocations'],
+                                            solver=solver)
+    amount_allocations = sum(allocation > 1e-6 for allocation in allocations.values())
+    return rewards['indexingRewardDay'] / 10 ** 18, amount_allocations
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('solver', ['fast', 'exact', 'linprog'])
+@pytest.mark.parametrize('max_percentage, min_allocation', [(0.1, 0), (0.3, 0), (0.3, 1000)])
+def test_upper_bound_is_above_the_optimized_rewards(seed, solver, max_percentage, min_allocation):
+    df = subgraphFrame(seed)
+    network_data = networkData(df)
+    indexer_total_stake = 1e6
+    current_rewards = {'indexing_reward_daily': 0, 'indexing_reward_weekly': 0}
+    upper_bound = calculateRewardUpperBound(df, network_data, indexer_total_stake, current_rewards, PRICE_DATA,
+                                            max_percentage=max_percentage, min_allocation=min_allocation,
+                                            solver=solver, threshold=20, config=CONFIG)
+    rewards, amount_allocations = optimize(df, network_data, indexer_total_stake, max_percentage, min_allocation,
+                                           solver)
+
+    # the bound after transaction costs is above the optimized rewards after transaction costs
+    allocation_costs = upper_bound['gas_costs_grt'] / max(upper_bound['allocations'], 1)
+    if min_allocation == 0 and upper_bound['allocations'] > 0:
+        assert upper_bound['final_value'] >= rewards - amount_allocations * allocation_costs
+    else:
+        assert upper_bound['rewards'] >= rewards
+
+    without_costs = calculateRewardUpperBound(df, network_data, indexer_total_stake, current_rewards, PRICE_DATA,
+                                              max_percentage=max_percentage, min_allocation=min_allocation,
+                                              solver=solver, ignore_tx_costs=True, config=CONFIG)
+    assert without_costs['rewards'] >= rewards
+    assert without_costs['final_value'] == without_costs['rewards']
+
+
+@pytest.mark.parametrize('solver', ['fast', 'exact', 'linprog'])
+def test_upper_bound_skips_unreachable_thresholds(solver):
+    df = subgraphFrame(0)
+    network_data = networkData(df)
+    rewards, _ = optimize(df, network_data, 1e6, 0.2, 0, solver)
+
+    # current rewards just below the optimum, the optimization can reach a small increase but not 1000%
+    current_rewards = {'indexing_reward_daily': rewards * 0.9, 'indexing_reward_weekly': rewards * 0.9 * 7}
+    reachable = calculateRewardUpperBound(df, network_data, 1e6, current_rewards, PRICE_DATA, solver=solver,
+                                          threshold=5, ignore_tx_costs=True, config=CONFIG)
+    unreachable = calculateRewardUpperBound(df, network_data, 1e6, current_rewards, PRICE_DATA, solver=solver,
+                                            threshold=1000, ignore_tx_costs=True, config=CONFIG)
+    assert reachable['threshold_reachable']
+    assert not unreachable['threshold_reachable']
+    assert reachable['reward_interval'] == 'indexingRewardDay'
+
+
+def test_upper_bound_uses_the_weekly_interval():
+    df = subgraphFrame(1)
+    network_data = networkData(df)
+    current_rewards = {'indexing_reward_daily': 0, 'indexing_reward_weekly': 0}
+    daily = calculateRewardUpperBound(df, network_data, 1e6, current_rewards, PRICE_DATA, ignore_tx_costs=True,
+                                      config=CONFIG)
+    weekly = calculateRewardUpperBound(df, network_data, 1e6, current_rewards, PRICE_DATA, ignore_tx_costs=True,
+                                       threshold_interval='weekly', config=CONFIG)
+    intervals = getIndexingRewardIntervals(network_data)
+    assert weekly['reward_interval'] == 'indexingRewardWeek'
+    assert weekly['rewards'] == pytest.approx(
+        daily['rewards'] * intervals['indexingRewardWeek'] / intervals['indexingRewardDay'])